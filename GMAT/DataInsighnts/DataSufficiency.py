@@ -1,7 +1,17 @@
+import argparse
 import json
+import os
 import re
+import sys
 import time
-from g4f.client import Client
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from evalkit.datasets import open_dataset
+from evalkit.journal import Journal
+from evalkit.lazy import lazy_import
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 def normalize_answer(answer):
     """Normalize answers for consistent comparison"""
@@ -44,18 +54,21 @@ def extract_answer(response):
     
     return ""
 
-# 1. 加载 JSON 文件，并提取 "Allquestions" 列表（只处理前50题）
-json_file = "/home/ltang24/Education/GMAT/DataInsighnts/DataSufficiency.json"
-with open(json_file, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-all_questions = []
-if isinstance(data, dict) and "Allquestions" in data:
-    all_questions = data["Allquestions"]
-else:
-    all_questions = data if isinstance(data, list) else list(data.values())
+# 先解析参数：--help 和参数错误不会加载题库或创建 g4f 客户端
+# 每次调用结果都写入 journal，中断后可用 --resume 继续
+parser = argparse.ArgumentParser(description="GMAT Data Sufficiency multi-model evaluation")
+parser.add_argument("--journal", default="multi_model_results_data_sufficiency.journal.jsonl",
+                    help="JSONL checkpoint written as each call finishes")
+parser.add_argument("--resume", action="store_true",
+                    help="Reuse responses already in --journal instead of calling the model again")
+args = parser.parse_args()
+journal = Journal(args.journal, resume=args.resume and os.path.exists(args.journal))
+if len(journal):
+    print(f"Resuming from {args.journal} ({len(journal)} results already journaled)")
 
-questions = all_questions[:50].copy()
+# 1. 通过共享题库索引加载题目（只处理前50题）
+json_file = "/home/ltang24/Education/GMAT/DataInsighnts/DataSufficiency.json"
+questions = [q.raw for q in open_dataset(json_file).head(50)]
 
 # 2. 定义模型列表和 prompting 策略
 models = [
@@ -214,20 +227,26 @@ for model in models:
             runtime = None
             
             try:
-                start_time = time.perf_counter()
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    timeout=120,
-                    temperature=0.3
-                ).choices[0].message.content.strip()
-                runtime = round(time.perf_counter() - start_time, 2)
+                if journal.is_done(model, strategy, question_id):
+                    entry = journal.get(model, strategy, question_id)
+                    response, runtime = entry["response"], entry["runtime"]
+                else:
+                    start_time = time.perf_counter()
+                    response = client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        timeout=120,
+                        temperature=0.3
+                    ).choices[0].message.content.strip()
+                    runtime = round(time.perf_counter() - start_time, 2)
+                    journal.record(model, strategy, question_id, response, runtime)
                 
                 answer_extracted = extract_answer(response)
                 if answer_extracted:
                     answer_found = True
                     best_response = response
             except Exception as e:
+                journal.record(model, strategy, question_id, None, None, error=str(e))
                 print(f"Model {model} with strategy {strategy} error on question {question_id}: {e}")
             
             if answer_found:
@@ -270,6 +289,8 @@ for model in models:
         for diff, stats in difficulty_accuracies.items():
             print(f"Difficulty '{diff}': Accuracy: {stats['accuracy']:.2%} (Correct: {stats['correct']}/{stats['total']})")
 
+journal.close()
+
 # 保存综合结果到 JSON 文件
 output_file = "multi_model_results_data_sufficiency.json"
 with open(output_file, "w", encoding="utf-8") as f:
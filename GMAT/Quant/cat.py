@@ -0,0 +1,393 @@
+"""
+Computerized adaptive testing on the GMAT Quant Problem Solving questions.
+
+The per-model scripts in this folder ask every question under every strategy.
+This one fits an item response theory bank from their result files
+(``*_result.json``) and then asks each (model, strategy) only the questions
+that are most informative at its current ability estimate, stopping once the
+estimate's standard error reaches --target_se.  The prompts are the ones the
+per-model scripts use, so the calibrated parameters apply unchanged.
+"""
+
+import os
+import sys
+import re
+import json
+import glob
+import argparse
+from functools import lru_cache
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from evalkit.cache import DEFAULT_CACHE_PATH, CachedClient, ResponseCache
+from evalkit.datasets import open_dataset
+from evalkit.engine import WorkItem, run_items, user_message
+from evalkit.irt import AdaptiveTest, ItemBank, default_bank_path, load_responses, run_adaptive
+from evalkit.lazy import lazy_import
+from evalkit.prompts import LAYOUTS, PromptParts
+from evalkit.ratelimit import RateLimiter
+from evalkit.streaming import AnswerWatcher, StreamingClient, timing_fields
+from evalkit.templates import PromptTemplate, option_lines, static
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Result file written by each per-model script -> the model it ran
+HISTORY_NAMES = {
+    "gpt4": "gpt-4",
+    "gpt4o": "gpt-4o",
+    "gpt4o-mini": "gpt-4o-mini",
+    "gemini-1.5-flash": "gemini-1.5-flash",
+    "llama-8b": "llama-3.1-8b",
+    "llama-70b": "llama-3.1-70b",
+    "llama-405b": "llama-3.1-405b"
+}
+
+def normalize_answer(answer):
+    """Normalize an answer (string or numeric) for consistent comparison."""
+    if isinstance(answer, str):
+        return re.sub(r'\s+', '', answer.strip().lower())
+    return str(answer).strip().lower()
+
+def extract_answer(response):
+    """
+    Extract answer from response.
+    对于Quant题目，通常只需返回答案字母（或数字）即可。
+    如果答案中包含 "Final Answer:" 等前缀，则提取后面的答案字母。
+    """
+    match = re.search(r"final\s*answer\s*[:：]?\s*([A-Ea-e])", response, flags=re.IGNORECASE)
+    if match:
+        return match.group(1).strip().upper()
+    return response.strip().upper()
+
+def answer_watcher():
+    """--stop_at_answer 只在 "Final Answer: X" 独占一行、且 extract_answer 对已收到的部分已给出 X 时截断"""
+    return AnswerWatcher(extract_answer)
+
+# 针对Problem Solving题目的prompt生成函数（零样本）
+def generate_zero_shot_prompt_PS(item):
+    return render_prompt_PS("zero-shot", item)
+
+# 针对Problem Solving题目的prompt生成函数（五样本提示）
+def five_shot_examples_PS():
+    examples = [
+        {
+            "question": "Example: A city’s population increased and its GDP changed accordingly. What is the percent change in per capita GDP?",
+            "options": {
+                "A": "10% decrease",
+                "B": "15% increase",
+                "C": "20% increase",
+                "D": "25% increase",
+                "E": "30% increase"
+            },
+            "final_answer": "C"
+        },
+        {
+            "question": "Example: A box contains red and blue balls. What is the probability of drawing one red and one blue?",
+            "options": {
+                "A": "1/20",
+                "B": "1/10",
+                "C": "3/10",
+                "D": "1/2",
+                "E": "3/5"
+            },
+            "final_answer": "D"
+        },
+        {
+            "question": "Example: Solve the equation 4m + n = 20 for integers m and n. How many solutions exist?",
+            "options": {
+                "A": "Five",
+                "B": "Six",
+                "C": "Ten",
+                "D": "Eleven",
+                "E": "Forty-one"
+            },
+            "final_answer": "D"
+        },
+        {
+            "question": "Example: Company sales and cost data lead to a profit calculation. What is the profit?",
+            "options": {
+                "A": "$2,250 loss",
+                "B": "$750 loss",
+                "C": "No profit or loss",
+                "D": "$2,250 profit",
+                "E": "$18,000 profit"
+            },
+            "final_answer": "D"
+        },
+        {
+            "question": "Example: In a parallelogram with sides in ratio 1:2 and given area, find the area of the inscribed rectangle.",
+            "options": {
+                "A": "36",
+                "B": "36√2",
+                "C": "72",
+                "D": "96",
+                "E": "144"
+            },
+            "final_answer": "C"
+        }
+    ]
+    return examples
+
+@lru_cache(maxsize=None)
+def format_examples_PS():
+    prompt = ""
+    for idx, ex in enumerate(five_shot_examples_PS(), start=1):
+        prompt += f"Example {idx}:\n"
+        prompt += f"Question: {ex['question']}\nOptions:\n"
+        for letter, opt in ex['options'].items():
+            prompt += f"{letter}: {opt}\n"
+        prompt += f"Final Answer: {ex['final_answer']}\n\n"
+    return prompt
+
+def format_question_PS(item):
+    return f"Question: {item.get('question','')}\nOptions:\n" + option_lines(item.get("options", {}))
+
+# 每个（策略，题型）的提示模板只编译一次，题型和五个示例已渲染在模板中
+@lru_cache(maxsize=None)
+def prompt_template_PS(strategy, qtype):
+    qtype = static(qtype)
+    if strategy == "five-shot":
+        return PromptTemplate(
+            f"Below are five examples of GRE Quantitative Reasoning Problem Solving questions of type '{qtype}':\n\n"
+            + static(format_examples_PS())
+            + "Now, solve the following question and provide only the final answer in EXACT format as shown in the examples.\n\n"
+            + "Question: {question}\nOptions:\n{options}"
+        )
+    if strategy == "chain-of-thought":
+        return PromptTemplate(
+            f"Please solve the following GRE Quantitative Reasoning Problem Solving question of type '{qtype}' "
+            "using a detailed Chain of Thought. Show your complete reasoning process and then provide only the final answer (a single letter).\n\n"
+            "Question: {question}\nOptions:\n{options}"
+            "\nPlease clearly mark your final answer, for example:Final Answer: A"
+        )
+    return PromptTemplate(
+        f"Please solve the following GRE Quantitative Reasoning Problem Solving question "
+        f"of type '{qtype}' and provide only the SINGLE BEST letter answer (A/B/C/D/E).\n\n"
+        "Question: {question}\nOptions:\n{options}"
+        "\nImportant: Answer with ONLY the selected letter."
+    )
+
+def render_prompt_PS(strategy, item):
+    return prompt_template_PS(strategy, item.get("subtype-type", "")).render(
+        question=item.get("question", ""),
+        options=option_lines(item.get("options", {}))
+    )
+
+def generate_five_shot_prompt_PS(item):
+    return render_prompt_PS("five-shot", item)
+
+# 针对Problem Solving题目的prompt生成函数（Chain-of-Thought）
+def generate_cot_prompt_PS(item):
+    return render_prompt_PS("chain-of-thought", item)
+
+# --layout stable：与题目无关的说明和示例在前，题型和题目在后，便于服务端复用提示前缀缓存
+def generate_prompt_parts_PS(item, strategy):
+    qtype = f"The following question is of type '{item.get('subtype-type', '')}'."
+    if strategy == "five-shot":
+        return PromptParts(
+            instructions="Below are five examples of GRE Quantitative Reasoning Problem Solving questions. Then solve the "
+                         "new question and provide only the final answer in EXACT format as shown in the examples.",
+            examples=format_examples_PS(),
+            passage=qtype,
+            question=format_question_PS(item)
+        )
+    if strategy == "chain-of-thought":
+        return PromptParts(
+            instructions="Please solve the following GRE Quantitative Reasoning Problem Solving question using a detailed "
+                         "Chain of Thought. Show your complete reasoning process and then provide only the final answer "
+                         "(a single letter).\nPlease clearly mark your final answer, for example:Final Answer: A",
+            passage=qtype,
+            question=format_question_PS(item)
+        )
+    return PromptParts(
+        instructions="Please solve the following GRE Quantitative Reasoning Problem Solving question and provide only "
+                     "the SINGLE BEST letter answer (A/B/C/D/E).\nImportant: Answer with ONLY the selected letter.",
+        passage=qtype,
+        question=format_question_PS(item)
+    )
+
+def build_messages(item, strategy, layout="legacy"):
+    """The messages for a question in the per-model scripts' layout, or the prefix-stable one"""
+    if layout == "stable":
+        return generate_prompt_parts_PS(item, strategy).messages()
+    return user_message(build_prompt(item, strategy))
+
+def build_prompt(item, strategy):
+    """The prompt the per-model scripts send for a question under a strategy"""
+    if strategy == "five-shot":
+        return generate_five_shot_prompt_PS(item)
+    if strategy == "chain-of-thought":
+        return generate_cot_prompt_PS(item)
+    return generate_zero_shot_prompt_PS(item)
+
+def grade(completion):
+    """Per-question detail in the per-model scripts' format, or None when no answer came back"""
+    if not completion.ok:
+        return None
+    item = completion.item.meta["question"]
+    response = completion.response.strip()
+    answer_extracted = extract_answer(response)
+    if not answer_extracted:
+        return None
+    expected = str(item.get("correct_answer", "")).strip().upper()
+    return {
+        "question_id": item.get("question_id", ""),
+        "expected": expected,
+        "model_answer": answer_extracted,
+        "model_response": response,
+        "runtime": completion.runtime,
+        **timing_fields(completion),
+        "correct": normalize_answer(answer_extracted) == normalize_answer(expected)
+    }
+
+def load_bank(args, dataset):
+    """The calibrated item bank, fitted from the per-model result files when missing or with --calibrate"""
+    bank_path = args.bank or default_bank_path(args.input)
+    if os.path.exists(bank_path) and not args.calibrate:
+        print(f"Using item bank {bank_path}")
+        return ItemBank.load(bank_path)
+    history = args.history or sorted(glob.glob(os.path.join(HERE, "*_result.json")))
+    print(f"Calibrating item bank from {len(history)} result files")
+    responses = load_responses(history, model_from="file", names=HISTORY_NAMES)
+    labels = {question.qid: question.difficulty for question in dataset.all()}
+    bank = ItemBank.calibrate(responses, labels, model=args.irt_model)
+    print(bank.format_report())
+    print(f"Item bank saved to {bank.save(bank_path)}")
+    return bank
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive (IRT) evaluation on GMAT Quant Problem Solving questions")
+    parser.add_argument("--input", default="/home/ltang24/Education/GMAT/Quant/ProblemSolving.json",
+                        help="Path to input JSON file with questions")
+    parser.add_argument("--output", default="cat_results", help="Output directory for results")
+    parser.add_argument("--models", nargs="+", default=["gpt-4o"], help="List of models to evaluate")
+    parser.add_argument("--strategies", nargs="+", default=["zero-shot", "five-shot", "chain-of-thought"],
+                        help="List of prompting strategies to use")
+    parser.add_argument("--bank", default=None,
+                        help="Calibrated item bank (default: .cache/irt/<input>.json, fitted on first use)")
+    parser.add_argument("--calibrate", action="store_true", help="Refit the item bank even if it exists")
+    parser.add_argument("--history", nargs="+", default=None,
+                        help="Result files to calibrate from (default: the *_result.json files next to this script)")
+    parser.add_argument("--irt_model", choices=["1pl", "2pl"], default="2pl", help="Item response model to fit")
+    parser.add_argument("--target_se", type=float, default=0.3,
+                        help="Stop a test once the ability estimate's standard error is at most this")
+    parser.add_argument("--min_items", type=int, default=5, help="Questions every test asks at least")
+    parser.add_argument("--max_items", type=int, default=30, help="Questions every test asks at most")
+    parser.add_argument("--timeout", type=int, default=120, help="Timeout in seconds for model responses")
+    parser.add_argument("--temp", type=float, default=0.3, help="Temperature setting for model calls")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Maximum number of model calls in flight at once")
+    parser.add_argument("--max_retries", type=int, default=3,
+                        help="Attempts per question when a call errors or is rate limited")
+    parser.add_argument("--rpm", type=float, default=0,
+                        help="Requests per minute allowed per model (0 = no cap, cooldowns still apply)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="Response cache shared by all drivers; unchanged prompts are answered from it")
+    parser.add_argument("--no_cache", action="store_true", help="Always call the models, bypassing the cache")
+    parser.add_argument("--layout", choices=LAYOUTS, default="legacy",
+                        help="Prompt layout: one user prompt as in the per-model scripts (legacy), or instructions and "
+                             "examples first in a system message and the question last (stable)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream every call and record time to first token and time to answer")
+    parser.add_argument("--stop_at_answer", action="store_true",
+                        help="Close each stream right after its 'Final Answer: X' line (implies --stream); letter-only "
+                             "prompts never write one and are read to the end, bound those with an output budget "
+                             "(evalkit/budgets.py)")
+    args = parser.parse_args()
+    
+    os.makedirs(args.output, exist_ok=True)
+    dataset = open_dataset(args.input)
+    questions = {question.qid: question.raw for question in dataset.all()}
+    print(f"Loaded {len(questions)} questions from {args.input}")
+    bank = load_bank(args, dataset)
+    
+    tests = {
+        (model, strategy): AdaptiveTest(bank, items=list(questions), target_se=args.target_se,
+                                        min_items=args.min_items, max_items=args.max_items)
+        for model in args.models for strategy in args.strategies
+    }
+    
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    streaming = StreamingClient(Client(), watcher=answer_watcher) if args.stream or args.stop_at_answer else None
+    client = streaming or Client()
+    if cache is not None:
+        client = CachedClient(client, cache)
+    params = {"timeout": args.timeout, "temperature": args.temp}
+    if args.stop_at_answer:
+        params["stop_at_answer"] = True
+    limiter = RateLimiter(default_rpm=args.rpm)
+    
+    def make_item(key, qid):
+        model, strategy = key
+        return WorkItem(
+            model=model,
+            strategy=strategy,
+            key=qid,
+            messages=build_messages(questions[qid], strategy, args.layout),
+            params=params,
+            meta={"question": questions[qid]}
+        )
+    
+    def run_batch(batch):
+        return run_items(client, batch, max_in_flight=args.concurrency, limiter=limiter, max_retries=args.max_retries)
+    
+    def outcome(completion):
+        detail = grade(completion)
+        test = tests[(completion.item.model, completion.item.strategy)]
+        status = "no answer" if detail is None else ("Correct" if detail["correct"] else "Incorrect")
+        print(f"{completion.item.model} / {completion.item.strategy}: question {completion.item.key} {status} "
+              f"(asked {test.asked}, ability {test.theta:+.2f} +/- {test.se:.2f})")
+        return None if detail is None else detail["correct"]
+    
+    completions = run_adaptive(tests, make_item, run_batch, outcome)
+    
+    # Results keep the per-model scripts' details, so they can be fed back into calibration
+    all_results = {}
+    for model in args.models:
+        all_results[model] = {}
+        for strategy in args.strategies:
+            test = tests[(model, strategy)]
+            details = [detail for detail in (grade(completion) for completion in completions
+                                             if (completion.item.model, completion.item.strategy) == (model, strategy))
+                       if detail is not None]
+            result = test.result()
+            calibration_theta = bank.abilities.get(f"{model} / {strategy}")
+            if calibration_theta is not None:
+                result["calibration_theta"] = calibration_theta
+                result["calibration_expected_accuracy"] = round(bank.expected_accuracy(calibration_theta), 4)
+            result["details"] = details
+            all_results[model][strategy] = result
+            print(f"\n{model} / {strategy}: ability {result['theta']:+.2f} +/- {result['se']:.2f} after "
+                  f"{result['calls']}/{result['bank_size']} questions ({result['stop_reason']}); expected accuracy "
+                  f"{result['expected_accuracy']:.1%} [{result['accuracy_low']:.1%}, {result['accuracy_high']:.1%}]")
+    
+    calls = sum(test.asked for test in tests.values())
+    print(f"\n{calls} calls instead of {len(questions) * len(tests)} for a full sweep")
+    if streaming is not None:
+        print(streaming.format_report())
+    if cache is not None:
+        print(cache.format_report())
+        cache.close()
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result_file = os.path.join(args.output, f"cat_results_{timestamp}.json")
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(all_results, f, ensure_ascii=False, indent=4)
+    print(f"All results saved to {result_file}")
+    
+    csv_file = os.path.join(args.output, f"cat_summary_{timestamp}.csv")
+    with open(csv_file, "w", encoding="utf-8") as f:
+        f.write("Model,Strategy,Questions,Ability,SE,Expected Accuracy,Low,High,Stop Reason\n")
+        for model in args.models:
+            for strategy in args.strategies:
+                result = all_results[model][strategy]
+                f.write(f"{model},{strategy},{result['calls']},{result['theta']:.3f},{result['se']:.3f},"
+                        f"{result['expected_accuracy']:.2%},{result['accuracy_low']:.2%},{result['accuracy_high']:.2%},"
+                        f"{result['stop_reason']}\n")
+    print(f"CSV summary saved to {csv_file}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import os
 import re
+import sys
 import json
 import time
-from g4f.client import Client
-from PIL import Image
+import argparse
 import base64
 import io
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from evalkit.hedging import Hedger, LatencyTracker
+from evalkit.lazy import lazy_import
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
+
 def encode_image_to_base64(image_path):
     """Encode an image to base64 string format"""
     with open(image_path, "rb") as image_file:
@@ -124,6 +131,15 @@ def classify_question_type(response):
     # Default to single answer
     return "Single answer"
 
+parser = argparse.ArgumentParser(description="Evaluate GRE Math (medium) image questions with a backup-model chain")
+parser.add_argument("--hedge", action="store_true",
+                    help="Race the backup models instead of waiting for each model to fail in turn")
+parser.add_argument("--hedge_percentile", type=float, default=90,
+                    help="Fire the next model once a call runs longer than this latency percentile")
+parser.add_argument("--hedge_delay", type=float, default=30.0,
+                    help="Hedge delay in seconds until enough latencies have been observed")
+args = parser.parse_args()
+
 # Set up the directory and answer file
 image_dir = "/home/ltang24/Education/GRE Math Medium"
 answer_file = "/home/ltang24/Education/GRE Math Medium.txt"
@@ -141,9 +157,12 @@ backup_models = ["gpt-4-vision-preview", "claude-3-opus-20240229"]  # Other visi
 
 # Initialize client
 client = Client()
+hedger = Hedger(client, LatencyTracker(args.hedge_percentile, args.hedge_delay)) if args.hedge else None
 
 print(f"Main model: {main_model}")
 print(f"Backup models: {', '.join(backup_models)}")
+if hedger is not None:
+    print(f"Hedging: next model after the p{args.hedge_percentile:g} latency (initially {args.hedge_delay:g}s)")
 print(f"Processing {len(answers)} GRE Math questions from images...")
 print("-" * 100)
 
@@ -222,30 +241,42 @@ for i in range(1, len(answers) + 1):
     best_model = ""
     runtime = 0
     
-    # Try each model
+    def evaluate(model, response):
+        """Extract the answer; only a correct one ends the model chain"""
+        answer = extract_answer(response, question_type)
+        if not answer:
+            return answer, False
+        # For multiple answers, we need to compare sets of answers
+        if question_type == "Multiple answers":
+            return answer, set(answer.split(",")) == set(expected_answer.split(","))
+        return answer, normalize_answer(answer) == normalize_answer(expected_answer)
+    
     available_models = [main_model] + backup_models
-    for model in available_models:
-        models_tried.append(model)
-        
-        start_time = time.perf_counter()
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=solving_prompt,
-                timeout=120
-            ).choices[0].message.content.strip()
+    hedge = None
+    if hedger is not None:
+        hedge = hedger.call(available_models, solving_prompt, evaluate, timeout=120)
+        for attempt in hedge.attempts:
+            if attempt.error:
+                print(f"  Error with {attempt.model} on question {question_number}: {attempt.error}")
+        models_tried = hedge.models_tried
+        best_model, best_answer, best_response = hedge.model, hedge.answer, hedge.response
+        is_correct = hedge.accepted
+        runtime = hedge.runtime
+    else:
+        # Try each model
+        for model in available_models:
+            models_tried.append(model)
             
-            # Extract answer
-            answer = extract_answer(response, question_type)
-            
-            if answer:
-                # For multiple answers, we need to compare sets of answers
-                if question_type == "Multiple answers":
-                    answer_set = set(answer.split(","))
-                    expected_set = set(expected_answer.split(","))
-                    current_is_correct = answer_set == expected_set
-                else:
-                    current_is_correct = normalize_answer(answer) == normalize_answer(expected_answer)
+            start_time = time.perf_counter()
+            try:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=solving_prompt,
+                    timeout=120
+                ).choices[0].message.content.strip()
+                
+                # Extract answer
+                answer, current_is_correct = evaluate(model, response)
                 
                 if current_is_correct:
                     is_correct = True
@@ -254,16 +285,16 @@ for i in range(1, len(answers) + 1):
                     best_model = model
                     runtime = time.perf_counter() - start_time
                     break
-                elif not best_answer:
+                elif answer and not best_answer:
                     # If we haven't found any answers yet, store this as the best so far
                     best_answer = answer
                     best_response = response
                     best_model = model
+                
+            except Exception as e:
+                print(f"  Error with {model} on question {question_number}: {e}")
             
-        except Exception as e:
-            print(f"  Error with {model} on question {question_number}: {e}")
-        
-        runtime = time.perf_counter() - start_time
+            runtime = time.perf_counter() - start_time
     
     if is_correct:
         results["correct_count"] += 1
@@ -282,6 +313,9 @@ for i in range(1, len(answers) + 1):
         "correct": is_correct,
         "image_path": image_path
     }
+    if hedge is not None:
+        # Which model won the race and what happened to the others
+        question_result["hedge_attempts"] = [attempt.as_dict() for attempt in hedge.attempts]
     
     results["questions"].append(question_result)
     
@@ -296,6 +330,10 @@ results["accuracy"] = final_accuracy
 
 print(f"Overall Accuracy: {final_accuracy:.2%}")
 print(f"Correct answers: {results['correct_count']}/{results['total_questions']}")
+if hedger is not None:
+    print(hedger.format_report())
+    results["hedging"] = hedger.summary()
+    hedger.close()
 print("-" * 100)
 
 # Save results
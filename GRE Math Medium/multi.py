@@ -1,10 +1,20 @@
 import os
 import re
-import json
+import sys
 import time
 import base64
-from g4f.client import Client
-from PIL import Image
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from evalkit.datasets import load_questions
+from evalkit.engine import WorkItem
+from evalkit.estimate import LatencyHistory, SweepEstimate
+from evalkit.journal import Journal
+from evalkit.lazy import lazy_import
+from evalkit.records import ResultTable, dump_json
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 # ----- Helper Functions -----
 
@@ -209,25 +219,79 @@ def get_prompt_messages(prompt_style, qtype, base64_image):
         }
     ]
 
+def plan_items(questions_data, models, prompt_styles):
+    """Every (model, prompt style, question) request the main loop would send, for --dry_run"""
+    for q in questions_data:
+        if not isinstance(q, dict):
+            continue
+        question_number = q.get("question_number")
+        image_path = f"/home/ltang24/Education/GRE Math Medium/{question_number}.png"
+        if not os.path.exists(image_path):
+            continue
+        base64_image = encode_image_to_base64(image_path)
+        for model in models:
+            for prompt_style in prompt_styles:
+                yield WorkItem(model, prompt_style, str(question_number),
+                               get_prompt_messages(prompt_style, q.get("question_type"), base64_image))
+
+def question_results(table):
+    """Yield the per-question result dicts of the results file from the table"""
+    for question_number, rows in table.grouped_rows("question").items():
+        yield {
+            "question_number": question_number,
+            "question_type": table.value("skill", rows[0]),
+            "expected": table.value("expected", rows[0]),
+            "results": [
+                {
+                    "model": table.value("model", row),
+                    "prompt_style": table.value("strategy", row),
+                    "response": table.response(row),
+                    "extracted_answer": table.value("answer", row),
+                    "correct": bool(table.correct[row]),
+                    "runtime": table.runtime_of(row)
+                }
+                for row in rows
+            ]
+        }
+
 # ----- Main Process -----
 
 def main():
+    parser = argparse.ArgumentParser(description="GRE Math Medium multi-model evaluation")
+    parser.add_argument("--journal", default="/home/ltang24/Education/GRE Math Medium/GRE_Math_Medium_results.journal.jsonl",
+                        help="JSONL checkpoint written as each call finishes")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reuse responses already in --journal instead of calling the model again")
+    parser.add_argument("--dry_run", action="store_true",
+                        help="Encode every image, build every prompt and print calls, tokens and a predicted schedule without calling any model")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Calls in flight assumed by --dry_run (this script itself sends one at a time)")
+    args = parser.parse_args()
+    
     # Define models and prompt styles to test
     models = ["gpt-4", "gpt-4o", "gpt-4o-mini", "llama-3.1-8b", "llama-3.1-70b", "llama-3.1-405b", "gemini-1.5-flash", "command r"]
     prompt_styles = ["zeroshot", "cot", "fiveshot"]
     
-    client = Client()
-    
     # Load question data
     json_file = "/home/ltang24/Education/GRE Math Medium/gre_math_categorized.json"
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        questions_data = data["GRE Math Medium.json"]
+    questions_data = [q.raw for q in load_questions(json_file)]
+    
+    if args.dry_run:
+        print(SweepEstimate.from_items(plan_items(questions_data, models, prompt_styles), LatencyHistory.load())
+              .format_report(concurrency=args.concurrency))
+        return
     
-    # Initialize results structure
+    client = Client()
+    journal = Journal(args.journal, resume=args.resume and os.path.exists(args.journal))
+    if len(journal):
+        print(f"Resuming from {args.journal} ({len(journal)} results already journaled)")
+    
+    # Per-call results live in a compact table; the per-question dicts are
+    # only rebuilt while the results file is written
+    table = ResultTable()
     results = {
         "total_questions": len(questions_data),
-        "questions": [],
+        "questions": lambda: question_results(table),
         "accuracy": {}
     }
     
@@ -268,13 +332,6 @@ def main():
             print(f"  Error encoding image: {e}")
             continue
     
-        question_result = {
-            "question_number": question_number,
-            "question_type": qtype,
-            "expected": expected_answer,
-            "results": []
-        }
-    
         for model in models:
             for prompt_style in prompt_styles:
                 prompt_messages = get_prompt_messages(prompt_style, qtype, base64_image)
@@ -282,12 +339,17 @@ def main():
                 response_text = ""
                 extracted_answer = ""
                 correct = False
+                call_error = None
+                entry = journal.get(model, prompt_style, str(question_number)) if journal.is_done(model, prompt_style, str(question_number)) else None
                 try:
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=prompt_messages,
-                        timeout=120
-                    ).choices[0].message.content.strip()
+                    if entry is not None:
+                        response = entry["response"]
+                    else:
+                        response = client.chat.completions.create(
+                            model=model,
+                            messages=prompt_messages,
+                            timeout=120
+                        ).choices[0].message.content.strip()
                     response_text = response
                     extracted_answer = extract_answer(response_text, qtype)
                     
@@ -300,17 +362,19 @@ def main():
                     print(f"  Normalized: Extracted '{norm_extracted}', Expected '{norm_expected}'")
                 except Exception as e:
                     response_text = f"Error: {e}"
+                    call_error = str(e)
                 
                 runtime = round(time.perf_counter() - start_time, 2)
-                single_result = {
-                    "model": model,
-                    "prompt_style": prompt_style,
-                    "response": response_text,
-                    "extracted_answer": extracted_answer,
-                    "correct": correct,
-                    "runtime": runtime
-                }
-                question_result["results"].append(single_result)
+                if entry is not None:
+                    runtime = entry["runtime"]
+                elif call_error is not None:
+                    journal.record(model, prompt_style, str(question_number), None, runtime, error=call_error)
+                else:
+                    journal.record(model, prompt_style, str(question_number), response_text, runtime)
+                table.append(
+                    model, prompt_style, question_number, correct, runtime, response_text,
+                    answer=extracted_answer, expected=expected_answer, skill=qtype
+                )
                 
                 results["accuracy"][qtype][model][prompt_style]["total"] += 1
                 if correct:
@@ -318,9 +382,10 @@ def main():
                 
                 print(f"  Model: {model}, Prompt: {prompt_style}, Answer: {extracted_answer}, Expected: {expected_answer}, Correct: {correct}, Time: {runtime}s")
         
-        results["questions"].append(question_result)
         print("-" * 50)
     
+    journal.close()
+    
     # Calculate accuracy percentages
     for qtype in results["accuracy"]:
         for model in results["accuracy"][qtype]:
@@ -350,7 +415,7 @@ def main():
     # Save results to file
     output_file = "/home/ltang24/Education/GRE Math Medium/GRE_Math_Medium_results.json"
     with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=4)
+        dump_json(results, f, ensure_ascii=False, indent=4)
     
     # Print overall results
     print("\n" + "=" * 100)
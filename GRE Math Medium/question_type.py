@@ -1,13 +1,19 @@
 import os
 import json
-import easyocr
 import re
 
 # Define directories
 source_dir = "/home/ltang24/Education/GRE Math Medium/"
 
-# Initialize the OCR reader
-reader = easyocr.Reader(['en'])
+# The OCR reader loads its model weights, so it is only created for an actual run
+_reader = None
+
+def get_reader():
+    global _reader
+    if _reader is None:
+        import easyocr
+        _reader = easyocr.Reader(['en'])
+    return _reader
 
 def determine_question_type(text):
     # Join all text pieces into a single string for easier analysis
@@ -51,49 +57,56 @@ def determine_question_type(text):
     print("No answer choices found, classifying as numeric entry")
     return "numeric_entry"
 
-# Load existing JSON data
-json_data = None
-with open(os.path.join(source_dir, '/home/ltang24/Education/GRE Math Medium/GRE Math Medium.json'), 'r') as f:
-    json_data = json.loads(f.read())
+def main():
+    # Set up OCR before anything is read or written, so a missing easyocr aborts the run
+    reader = get_reader()
+
+    # Load existing JSON data
+    json_data = None
+    with open(os.path.join(source_dir, '/home/ltang24/Education/GRE Math Medium/GRE Math Medium.json'), 'r') as f:
+        json_data = json.loads(f.read())
 
-# Create a list of PNG files to process
-png_files = [f for f in os.listdir(source_dir) if f.endswith(".png")]
-total_files = len(png_files)
+    # Create a list of PNG files to process
+    png_files = [f for f in os.listdir(source_dir) if f.endswith(".png")]
+    total_files = len(png_files)
 
-# Dictionary to store categorizations
-categorizations = {}
+    # Dictionary to store categorizations
+    categorizations = {}
 
-# Process each image file
-for i, filename in enumerate(png_files):
-    file_path = os.path.join(source_dir, filename)
+    # Process each image file
+    for i, filename in enumerate(png_files):
+        file_path = os.path.join(source_dir, filename)
     
-    print(f"\nProcessing {filename} ({i+1}/{total_files})")
+        print(f"\nProcessing {filename} ({i+1}/{total_files})")
     
-    question_number = filename.split('.')[0]  # Extract number from filename
+        question_number = filename.split('.')[0]  # Extract number from filename
     
-    # Extract text from image
-    try:
-        result = reader.readtext(file_path, detail=0)
+        # Extract text from image
+        try:
+            result = reader.readtext(file_path, detail=0)
         
-        # Determine question type
-        question_type = determine_question_type(result)
+            # Determine question type
+            question_type = determine_question_type(result)
         
-        # Store the categorization
-        categorizations[question_number] = question_type
-        print(f"Classified {filename} as {question_type}")
-    except Exception as e:
-        print(f"Error processing {filename}: {e}")
-        categorizations[question_number] = "error"
+            # Store the categorization
+            categorizations[question_number] = question_type
+            print(f"Classified {filename} as {question_type}")
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            categorizations[question_number] = "error"
+
+    # Add categorization to the JSON data
+    for item in json_data["GRE Math Medium.json"]:
+        question_number = item["question_number"]
+        if question_number in categorizations:
+            item["question_type"] = categorizations[question_number]
 
-# Add categorization to the JSON data
-for item in json_data["GRE Math Medium.json"]:
-    question_number = item["question_number"]
-    if question_number in categorizations:
-        item["question_type"] = categorizations[question_number]
+    # Save the updated JSON data
+    output_json_path = os.path.join(source_dir, "gre_math_categorized.json")
+    with open(output_json_path, 'w') as f:
+        json.dump(json_data, f, indent=4)
 
-# Save the updated JSON data
-output_json_path = os.path.join(source_dir, "gre_math_categorized.json")
-with open(output_json_path, 'w') as f:
-    json.dump(json_data, f, indent=4)
+    print(f"\nClassification complete! Results saved to {output_json_path}")
 
-print(f"\nClassification complete! Results saved to {output_json_path}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
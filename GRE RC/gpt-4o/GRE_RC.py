@@ -1,7 +1,16 @@
 import re
+import os
+import sys
 import json
 import time
-from g4f.client import Client
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from evalkit.hedging import Hedger, LatencyTracker
+from evalkit.lazy import lazy_import
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 def normalize_answer(answer):
     """Normalize answers for consistent comparison"""
@@ -83,6 +92,15 @@ def extract_select_in_passage_answer(response, valid_sentences):
     
     return ""
 
+parser = argparse.ArgumentParser(description="Evaluate GRE reading comprehension with a backup-model chain")
+parser.add_argument("--hedge", action="store_true",
+                    help="Race the backup models instead of waiting for each model to fail in turn")
+parser.add_argument("--hedge_percentile", type=float, default=90,
+                    help="Fire the next model once a call runs longer than this latency percentile")
+parser.add_argument("--hedge_delay", type=float, default=30.0,
+                    help="Hedge delay in seconds until enough latencies have been observed")
+args = parser.parse_args()
+
 # 1. Load JSON file
 json_file = "/home/ltang24/Education/GRE_RC_questions.json"
 with open(json_file, "r", encoding="utf-8") as f:
@@ -94,6 +112,7 @@ backup_models = ["gpt-4", "gpt-4o-mini"]
 
 # 3. Initialize client
 client = Client()
+hedger = Hedger(client, LatencyTracker(args.hedge_percentile, args.hedge_delay)) if args.hedge else None
 
 # 4. Limit to first 50 passages
 passage_limit = 50
@@ -101,6 +120,8 @@ passages = data["passages"][:passage_limit]
 
 print(f"Main model: {main_model}")
 print(f"Backup models: {', '.join(backup_models)}")
+if hedger is not None:
+    print(f"Hedging: next model after the p{args.hedge_percentile:g} latency (initially {args.hedge_delay:g}s)")
 print(f"Processing the first {len(passages)} passages...")
 print("-" * 100)
 
@@ -185,65 +206,61 @@ for passage in passages:
             valid_sentences = re.split(r'(?<=[.!?])\s+', passage_content)
             valid_sentences = [s.strip() for s in valid_sentences if s.strip()]
         
-        # Try each model
+        def evaluate(model, response):
+            """Extract the answer; only a correct one ends the model chain"""
+            if "Multiple-choice" in question_type:
+                answer = extract_mc_answer(response)
+                return answer, bool(answer) and normalize_answer(answer) == normalize_answer(correct_answer)
+            answer = extract_select_in_passage_answer(response, valid_sentences)
+            # For select-in-passage, we need to check if the selected sentence matches the correct answer
+            answer_clean = re.sub(r'\s+', ' ', answer).strip()
+            correct_clean = re.sub(r'\s+', ' ', correct_answer).strip()
+            return answer, bool(answer) and answer_clean == correct_clean
+        
         available_models = [main_model] + backup_models
-        for model in available_models:
-            models_tried.append(model)
+        hedge = None
+        if hedger is not None:
+            hedge = hedger.call(available_models, messages, evaluate, timeout=120)
+            for attempt in hedge.attempts:
+                if attempt.error:
+                    print(f"  Error with {attempt.model} on question {question_number}: {attempt.error}")
+            models_tried = hedge.models_tried
+            best_model, best_answer, best_response = hedge.model, hedge.answer, hedge.response
+            is_correct = hedge.accepted
+            runtime = hedge.runtime
+        else:
+            # Try each model
+            for model in available_models:
+                models_tried.append(model)
             
-            start_time = time.perf_counter()
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    timeout=120  # Longer timeout for reading comprehension
-                ).choices[0].message.content.strip()
+                start_time = time.perf_counter()
+                try:
+                    response = client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        timeout=120  # Longer timeout for reading comprehension
+                    ).choices[0].message.content.strip()
                 
-                # Extract answer based on question type
-                if "Multiple-choice" in question_type:
-                    answer = extract_mc_answer(response)
-                    
-                    if answer:
-                        current_is_correct = normalize_answer(answer) == normalize_answer(correct_answer)
-                        
-                        if current_is_correct:
-                            is_correct = True
-                            best_answer = answer
-                            best_response = response
-                            best_model = model
-                            runtime = time.perf_counter() - start_time
-                            break
-                        elif not best_answer:
-                            # If we haven't found any answers yet, store this as the best so far
-                            best_answer = answer
-                            best_response = response
-                            best_model = model
+                    # Extract answer based on question type
+                    answer, current_is_correct = evaluate(model, response)
                 
-                elif "Select-in-Passage" in question_type:
-                    answer = extract_select_in_passage_answer(response, valid_sentences)
-                    
-                    if answer:
-                        # For select-in-passage, we need to check if the selected sentence matches the correct answer
-                        answer_clean = re.sub(r'\s+', ' ', answer).strip()
-                        correct_clean = re.sub(r'\s+', ' ', correct_answer).strip()
-                        current_is_correct = (answer_clean == correct_clean)
-                        
-                        if current_is_correct:
-                            is_correct = True
-                            best_answer = answer
-                            best_response = response
-                            best_model = model
-                            runtime = time.perf_counter() - start_time
-                            break
-                        elif not best_answer:
-                            # If we haven't found any answers yet, store this as the best so far
-                            best_answer = answer
-                            best_response = response
-                            best_model = model
+                    if current_is_correct:
+                        is_correct = True
+                        best_answer = answer
+                        best_response = response
+                        best_model = model
+                        runtime = time.perf_counter() - start_time
+                        break
+                    elif answer and not best_answer:
+                        # If we haven't found any answers yet, store this as the best so far
+                        best_answer = answer
+                        best_response = response
+                        best_model = model
                 
-            except Exception as e:
-                print(f"  Error with {model} on question {question_number}: {e}")
+                except Exception as e:
+                    print(f"  Error with {model} on question {question_number}: {e}")
             
-            runtime = time.perf_counter() - start_time
+                runtime = time.perf_counter() - start_time
         
         if is_correct:
             correct_count += 1
@@ -261,6 +278,9 @@ for passage in passages:
             "runtime": round(runtime, 2),
             "correct": is_correct
         }
+        if hedge is not None:
+            # Which model won the race and what happened to the others
+            question_result["hedge_attempts"] = [attempt.as_dict() for attempt in hedge.attempts]
         
         passage_results["questions"].append(question_result)
     
@@ -274,6 +294,10 @@ results["accuracy"] = accuracy
 
 print(f"Overall Accuracy: {accuracy:.2%}")
 print(f"Correct answers: {correct_count}/{total_questions}")
+if hedger is not None:
+    print(hedger.format_report())
+    results["hedging"] = hedger.summary()
+    hedger.close()
 print("-" * 100)
 
 # Save results
@@ -4,12 +4,18 @@ import time
 import os
 import random
 import argparse
+import sys
 from datetime import datetime
-from g4f.client import Client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from evalkit.lazy import lazy_import
+from evalkit.ratelimit import RateLimiter, is_rate_limited_response
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 # Constants
 MAX_RETRIES = 3
-RATE_LIMIT_KEYWORD = "限流"  # Rate limit keyword in Chinese
 
 def extract_answer(response: str) -> str:
     """Extract the answer letter (A-D) from the model's response."""
@@ -210,6 +216,10 @@ def main():
         "--verbose", action="store_true",
         help="Enable verbose output with full model responses"
     )
+    parser.add_argument(
+        "--rpm", type=float, default=0,
+        help="Requests per minute allowed per model (0 = no cap, cooldowns still apply)"
+    )
     args = parser.parse_args()
 
     # Create output directory if it doesn't exist
@@ -217,6 +227,7 @@ def main():
     
     # Initialize client
     client = Client()
+    limiter = RateLimiter(default_rpm=args.rpm)
 
     # Load questions
     print(f"Loading questions from {args.input}")
@@ -326,9 +337,10 @@ def main():
                     else:  # chain-of-thought
                         prompt = generate_cot_prompt(q)
 
-                    # Call model with retries
+                    # Call model with retries; throttling only pauses this model's provider
                     resp = None
                     for attempt in range(1, MAX_RETRIES+1):
+                        limiter.acquire(model_name)
                         try:
                             t0 = time.time()
                             content = client.chat.completions.create(
@@ -338,22 +350,24 @@ def main():
                                 temperature=args.temp
                             ).choices[0].message.content.strip()
                             rt = round(time.time() - t0, 2)
-                            
-                            # Check for rate limiting
-                            if RATE_LIMIT_KEYWORD in content:
-                                print(f"  [Attempt {attempt}/{MAX_RETRIES}] Rate limit detected, waiting 120s...")
-                                time.sleep(120)
-                                continue
-                                
-                            # Print full response in verbose mode
-                            if args.verbose:
-                                print(f"Full response:\n{content}\n")
-                                
-                            resp = content
-                            break
                         except Exception as e:
-                            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Error: {e}")
-                            time.sleep(5)
+                            wait = limiter.report_error(model_name, e)
+                            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Error: {e} (retrying in {wait:.1f}s)")
+                            continue
+                        
+                        # Check for rate limiting
+                        if is_rate_limited_response(content):
+                            wait = limiter.report_rate_limit(model_name)
+                            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Rate limit detected, cooling down {model_name} for {wait:.0f}s...")
+                            continue
+                        limiter.report_success(model_name)
+                            
+                        # Print full response in verbose mode
+                        if args.verbose:
+                            print(f"Full response:\n{content}\n")
+                            
+                        resp = content
+                        break
                     else:
                         # All retries failed
                         print(f"  Question {num} failed after multiple retries, skipping\n")
@@ -481,6 +495,7 @@ def main():
                     f.write("\n")
     
     print(f"CSV summary saved to {csv_path}")
+    print(limiter.format_report())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,9 +5,16 @@ import os
 from datetime import datetime
 import sys
 import argparse
-from g4f.client import Client
 import logging
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from evalkit.cache import DEFAULT_CACHE_PATH, CachedClient, ResponseCache
+from evalkit.datasets import open_dataset
+from evalkit.lazy import lazy_import
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
+
 class SATAlgebraSolver:
     def __init__(self, client=None, logger=None):
         self.client = client or Client()
@@ -196,6 +203,8 @@ class SATAlgebraSolver:
             )
             response = resp.choices[0].message.content.strip()
             duration = round(time.time() - start, 2)
+            if getattr(resp, "cached", False) and resp.cached_runtime is not None:
+                duration = resp.cached_runtime
 
             model_ans = self.extract_answer(response)
             norm_model = self.normalize_answer(model_ans)
@@ -238,16 +247,19 @@ def main():
     parser.add_argument("--limit", type=int, default=None, help="Limit number of questions")
     parser.add_argument("--timeout", type=int, default=120, help="Response timeout (s)")
     parser.add_argument("--temp", type=float, default=0.3, help="Model temperature")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="Response cache shared by all drivers; unchanged prompts are answered from it")
+    parser.add_argument("--no_cache", action="store_true", help="Always call the models, bypassing the cache")
+    parser.add_argument("--replay_only", action="store_true",
+                        help="Serve every call from the cache and treat misses as errors instead of calling the models")
     args = parser.parse_args()
 
     os.makedirs(args.output, exist_ok=True)
-    solver = SATAlgebraSolver()
+    cache = None if args.no_cache else ResponseCache(args.cache, replay_only=args.replay_only)
+    solver = SATAlgebraSolver(client=Client() if cache is None else CachedClient(Client(), cache))
     solver.logger.info(f"Loading questions from {args.input}")
     try:
-        with open(args.input, "r", encoding="utf-8") as f:
-            questions = json.load(f)
-        if args.limit:
-            questions = questions[:args.limit]
+        questions = [q.raw for q in open_dataset(args.input).head(args.limit)]
         solver.logger.info(f"Loaded {len(questions)} questions")
     except Exception as e:
         solver.logger.error(f"Error loading questions: {e}")
@@ -324,6 +336,9 @@ def main():
     with open(out_file, "w", encoding="utf-8") as f:
         json.dump(all_results, f, indent=2)
     solver.logger.info(f"All results saved to {out_file}")
+    if cache is not None:
+        solver.logger.info(cache.format_report())
+        cache.close()
 
 if __name__ == "__main__":
     main()
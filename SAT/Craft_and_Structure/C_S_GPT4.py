@@ -2,11 +2,33 @@ import json
 import re
 import time
 import os
+import random
 from datetime import datetime
 import sys
 import argparse
-from g4f.client import Client
-import random
+from functools import lru_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from evalkit.budgets import BudgetPolicy, budget_rows, format_budget_report, write_budget_csv
+from evalkit.cache import DEFAULT_CACHE_PATH, CachedClient, ResponseCache
+from evalkit.concurrency import AdaptiveConcurrency
+from evalkit.datasets import open_dataset
+from evalkit.engine import WorkItem, completion_from_entry, completions_from_journal, run_items, user_message
+from evalkit.estimate import LatencyHistory, SweepEstimate
+from evalkit.journal import Journal, compact_journal
+from evalkit.lazy import lazy_import
+from evalkit.prompts import (LAYOUTS, PromptParts, compare_layouts, format_layout_report, format_prefix_reuse,
+                             prefix_reuse, write_layout_csv)
+from evalkit.ratelimit import RateLimiter
+from evalkit.records import ResultTable, dump_json
+from evalkit.scheduler import PriorityScheduler
+from evalkit.sequential import StoppingRule, format_decisions, run_sequential, sequential_decisions
+from evalkit.streaming import AnswerWatcher, StreamingClient
+from evalkit.templates import PromptTemplate, option_lines, static
+from evalkit.workqueue import WorkQueue
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 # Add this dictionary with correct answers for Words in Context questions
 words_in_context_answers = {
@@ -153,44 +175,43 @@ def extract_answer(response):
     
     return ""
 
+# extract_answer's first pattern as a whole line: a stream cut there is graded as the full reply would be
+FINAL_ANSWER_LINE = re.compile(r"^[ \t*_#>]*FINAL ANSWER[:：\s]*([A-D])(?=\W)", re.IGNORECASE | re.MULTILINE)
+
+def answer_watcher():
+    """Watch a streamed reply for the point where extract_answer can no longer change"""
+    return AnswerWatcher(extract_answer, FINAL_ANSWER_LINE)
+
 # Generate zero-shot prompt
-def generate_zero_shot_prompt(question_data):
-    """Generate a simple direct prompt asking for the answer"""
+def zero_shot_texts(question_data):
+    """The text(s) of a question as the zero-shot prompt shows them"""
     text1 = question_data.get("text1", "")
     text2 = question_data.get("text2", "")
-    question = question_data.get("question", "")
-    options = question_data.get("options", {})
-    
-    prompt = (
-        "Please solve the following reading comprehension question and select the single best answer (A/B/C/D).\n\n"
-    )
-    
+    texts = ""
+
     # Check if it's a Cross-Text Connections question (has both text1 and text2)
     if text1 and text2:
-        prompt += f"Text 1:\n{text1}\n\n"
-        prompt += f"Text 2:\n{text2}\n\n"
+        texts += f"Text 1:\n{text1}\n\n"
+        texts += f"Text 2:\n{text2}\n\n"
     # Check if it's a single text question
     elif text1 or text2:
-        prompt += f"Text:\n{text1 or text2}\n\n"
-    
+        texts += f"Text:\n{text1 or text2}\n\n"
+
     # Add the passage if it exists (for Text Structure and Purpose or Words in Context questions)
     if "passage" in question_data and question_data["passage"]:
-        prompt += f"Text:\n{question_data['passage']}\n\n"
+        texts += f"Text:\n{question_data['passage']}\n\n"
     elif "text" in question_data and question_data["text"]:
-        prompt += f"Text:\n{question_data['text']}\n\n"
-    
-    prompt += f"Question: {question}\n\n"
-    prompt += "Options:\n"
-    for letter in sorted(options.keys()):
-        prompt += f"{letter}: {options[letter]}\n"
-    
-    prompt += "\nImportant: Provide ONLY the letter of your answer (A, B, C, or D)."
-    return prompt
+        texts += f"Text:\n{question_data['text']}\n\n"
+    return texts
+
+def generate_zero_shot_prompt(question_data):
+    """Generate a simple direct prompt asking for the answer"""
+    return render_prompt("zero-shot", None, question_data, zero_shot_texts(question_data))
 
 # Generate five-shot prompt with examples - other functions omitted for brevity
-# Generate five-shot prompt with examples
-def generate_five_shot_prompt(question_data, question_type):
-    """Generate a prompt with five examples of the same type followed by the question"""
+# Five worked examples per question type
+def five_shot_examples(question_type):
+    """The examples shown to the five-shot strategy for a question type"""
     # Define examples based on the question type
     examples = []
     
@@ -373,172 +394,322 @@ def generate_five_shot_prompt(question_data, question_type):
                 "answer": "B"
             }
         ]
-    
-    prompt = f"I'll show you five examples of {question_type} questions and their answers, then ask you a new question.\n\n"
-    
+    return examples
+
+def format_texts(question_data, question_type):
+    """The text(s) of a question or example, as the five-shot and chain-of-thought prompts show them"""
+    prompt = ""
+    if question_type == "Cross-Text Connections":
+        prompt += f"Text 1: {question_data.get('text1', '')}\n\n"
+        prompt += f"Text 2: {question_data.get('text2', '')}\n\n"
+    elif question_type == "Text Structure and Purpose" or question_type == "Words in Context":
+        if "text" in question_data:
+            prompt += f"Text: {question_data['text']}\n\n"
+        elif "passage" in question_data:
+            prompt += f"Text: {question_data['passage']}\n\n"
+    return prompt
+
+def format_examples(examples, question_type):
+    """The worked examples block of the five-shot prompt"""
+    prompt = ""
     for i, ex in enumerate(examples):
         prompt += f"Example {i+1}:\n"
-        
-        # Format based on question type
-        if question_type == "Cross-Text Connections":
-            prompt += f"Text 1: {ex['text1']}\n\n"
-            prompt += f"Text 2: {ex['text2']}\n\n"
-        elif question_type == "Text Structure and Purpose" or question_type == "Words in Context":
-            if "text" in ex:
-                prompt += f"Text: {ex['text']}\n\n"
-            elif "passage" in ex:
-                prompt += f"Text: {ex['passage']}\n\n"
-        
+        prompt += format_texts(ex, question_type)
         prompt += f"Question: {ex['question']}\n"
         prompt += "Options:\n"
         for letter in sorted(ex['options'].keys()):
             prompt += f"{letter}: {ex['options'][letter]}\n"
         prompt += f"Answer: {ex['answer']}\n\n"
-    
-    # Add the actual question
-    prompt += "Now, please answer this new question:\n\n"
-    
-    # Format based on question type
-    if question_type == "Cross-Text Connections":
-        text1 = question_data.get("text1", "")
-        text2 = question_data.get("text2", "")
-        prompt += f"Text 1: {text1}\n\n"
-        prompt += f"Text 2: {text2}\n\n"
-    elif question_type == "Text Structure and Purpose" or question_type == "Words in Context":
-        if "text" in question_data:
-            prompt += f"Text: {question_data['text']}\n\n"
-        elif "passage" in question_data:
-            prompt += f"Text: {question_data['passage']}\n\n"
-    
-    question = question_data.get("question", "")
-    options = question_data.get("options", {})
-    
-    prompt += f"Question: {question}\n"
-    prompt += "Options:\n"
-    for letter in sorted(options.keys()):
-        prompt += f"{letter}: {options[letter]}\n"
-    prompt += "\nProvide ONLY the letter of your answer (A, B, C, or D)."
-    
     return prompt
 
+@lru_cache(maxsize=None)
+def five_shot_block(question_type):
+    """The rendered examples of a question type, built once per type instead of once per call"""
+    return format_examples(five_shot_examples(question_type), question_type)
+
+# Generate five-shot prompt with examples
+def generate_five_shot_prompt(question_data, question_type):
+    """Generate a prompt with five examples of the same type followed by the question"""
+    return render_prompt("five-shot", question_type, question_data, format_texts(question_data, question_type))
+
 # Generate chain-of-thought prompt
 def generate_cot_prompt(question_data, question_type):
     """Generate a prompt that encourages step-by-step reasoning"""
-    prompt = (
-        f"Please solve the following {question_type} question using step-by-step reasoning.\n\n"
-    )
-    
-    # Format based on question type
-    if question_type == "Cross-Text Connections":
-        text1 = question_data.get("text1", "")
-        text2 = question_data.get("text2", "")
-        prompt += f"Text 1: {text1}\n\n"
-        prompt += f"Text 2: {text2}\n\n"
-    elif question_type == "Text Structure and Purpose" or question_type == "Words in Context":
-        if "text" in question_data:
-            prompt += f"Text: {question_data['text']}\n\n"
-        elif "passage" in question_data:
-            prompt += f"Text: {question_data['passage']}\n\n"
-    
-    question = question_data.get("question", "")
-    options = question_data.get("options", {})
-    
-    prompt += f"Question: {question}\n\n"
-    prompt += "Options:\n"
-    for letter in sorted(options.keys()):
-        prompt += f"{letter}: {options[letter]}\n"
-    
-    prompt += "\nPlease think through this problem carefully using the following steps:\n"
-    
+    return render_prompt("chain-of-thought", question_type, question_data, format_texts(question_data, question_type))
+
+@lru_cache(maxsize=None)
+def cot_steps(question_type):
+    """The reasoning steps the chain-of-thought prompt asks for, by question type"""
+    steps = ""
     if question_type == "Cross-Text Connections":
-        prompt += "1. Understand what the question is asking\n"
-        prompt += "2. Analyze key information from Text 1\n"
-        prompt += "3. Analyze key information from Text 2\n"
-        prompt += "4. Identify connections or contrasts between the two texts\n"
+        steps += "1. Understand what the question is asking\n"
+        steps += "2. Analyze key information from Text 1\n"
+        steps += "3. Analyze key information from Text 2\n"
+        steps += "4. Identify connections or contrasts between the two texts\n"
     elif question_type == "Text Structure and Purpose":
-        prompt += "1. Understand what the question is asking\n"
-        prompt += "2. Examine the structure and purpose of the text\n"
-        prompt += "3. Identify how different parts of the text function\n"
+        steps += "1. Understand what the question is asking\n"
+        steps += "2. Examine the structure and purpose of the text\n"
+        steps += "3. Identify how different parts of the text function\n"
     elif question_type == "Words in Context":
-        prompt += "1. Understand what the question is asking\n"
-        prompt += "2. Analyze the context in which the word or phrase is used\n"
-        prompt += "3. Consider the meaning and nuance of each option\n"
-    
-    prompt += "4. Evaluate each option carefully\n"
-    prompt += "5. Explain your reasoning for selecting or rejecting each option\n"
-    prompt += "6. Conclude with your final answer\n\n"
-    prompt += "After your analysis, clearly indicate your final answer with 'Final Answer: [letter]'"
-    
-    return prompt
-def main():
-    parser = argparse.ArgumentParser(description="Evaluate LLM performance on reading comprehension questions by skill type")
-    parser.add_argument("--input", default="/home/ltang24/Education/SAT/Craft_and_Structure.json", 
-                        help="Path to input JSON file with questions")
-    parser.add_argument("--output", default="results", help="Output directory for results")
-    parser.add_argument("--models", nargs="+", default=["gpt-4"],
-                        help="List of models to evaluate")
-    parser.add_argument("--strategies", nargs="+", default=["zero-shot", "five-shot", "chain-of-thought"],
-                        help="List of prompting strategies to use")
-    parser.add_argument("--questions_per_type", type=int, default=20, 
-                        help="Number of questions to test per skill type")
-    parser.add_argument("--timeout", type=int, default=120, help="Timeout in seconds for model responses")
-    parser.add_argument("--temp", type=float, default=0.3, help="Temperature setting for model calls")
-    args = parser.parse_args()
-    
-    # Create output directory if it doesn't exist
-    os.makedirs(args.output, exist_ok=True)
-    
-    # Initialize G4F client
-    client = Client()
-    
-    # Load questions
-    print(f"Loading questions from {args.input}")
-    try:
-        with open(args.input, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            
-        # Extract questions depending on JSON structure
-        if isinstance(data, dict) and "questions" in data:
-            questions = data["questions"]
-        else:
-            questions = data
-            
-        print(f"Loaded {len(questions)} total questions")
-    except Exception as e:
-        print(f"Error loading questions: {e}")
-        return
-    
-    # Group questions by skill type
-    questions_by_skill = {}
-    for question in questions:
-        skill = question.get("skill", "Unknown")
-        if skill not in questions_by_skill:
-            questions_by_skill[skill] = []
-        questions_by_skill[skill].append(question)
-    
-    skill_types = ["Cross-Text Connections", "Text Structure and Purpose", "Words in Context"]
+        steps += "1. Understand what the question is asking\n"
+        steps += "2. Analyze the context in which the word or phrase is used\n"
+        steps += "3. Consider the meaning and nuance of each option\n"
+
+    steps += "4. Evaluate each option carefully\n"
+    steps += "5. Explain your reasoning for selecting or rejecting each option\n"
+    steps += "6. Conclude with your final answer\n"
+    return steps
+
+@lru_cache(maxsize=None)
+def prompt_template(strategy, question_type):
+    """A strategy's prompt for a question type, compiled once with its examples and steps rendered in"""
+    if strategy == "five-shot":
+        return PromptTemplate(
+            static(f"I'll show you five examples of {question_type} questions and their answers, then ask you a new question.\n\n")
+            + static(five_shot_block(question_type))
+            + "Now, please answer this new question:\n\n{texts}Question: {question}\nOptions:\n{options}"
+            + "\nProvide ONLY the letter of your answer (A, B, C, or D)."
+        )
+    if strategy == "chain-of-thought":
+        return PromptTemplate(
+            static(f"Please solve the following {question_type} question using step-by-step reasoning.\n\n")
+            + "{texts}Question: {question}\n\nOptions:\n{options}"
+            + "\nPlease think through this problem carefully using the following steps:\n"
+            + static(cot_steps(question_type)) + "\n"
+            + "After your analysis, clearly indicate your final answer with 'Final Answer: [letter]'"
+        )
+    return PromptTemplate(
+        "Please solve the following reading comprehension question and select the single best answer (A/B/C/D).\n\n"
+        "{texts}Question: {question}\n\nOptions:\n{options}"
+        "\nImportant: Provide ONLY the letter of your answer (A, B, C, or D)."
+    )
+
+def render_prompt(strategy, question_type, question_data, texts):
+    """Fill a compiled prompt with one question's text(s), question and options"""
+    return prompt_template(strategy, question_type).render(
+        texts=texts,
+        question=question_data.get("question", ""),
+        options=option_lines(question_data.get("options", {}), sort=True)
+    )
+
+# Generate the --layout stable prompt
+def generate_prompt_parts(question_data, question_type, strategy):
+    """
+    The same question with the segments every question of a type shares (instructions,
+    examples, reasoning steps) first and the question's own text last, so a provider's
+    prompt cache can reuse the shared prefix
+    """
+    question_block = (f"Question: {question_data.get('question', '')}\nOptions:\n"
+                      + option_lines(question_data.get("options", {}), sort=True))
+
+    if strategy == "five-shot":
+        return PromptParts(
+            instructions="I'll show you five example questions and their answers, then ask you a new question of the same type. "
+                         "Provide ONLY the letter of your answer (A, B, C, or D).",
+            examples=f"Examples of {question_type} questions:\n\n" + five_shot_block(question_type),
+            passage="Now, please answer this new question:\n\n" + format_texts(question_data, question_type),
+            question=question_block
+        )
+    if strategy == "chain-of-thought":
+        return PromptParts(
+            instructions="Please solve the following question using step-by-step reasoning. "
+                         "After your analysis, clearly indicate your final answer with 'Final Answer: [letter]'",
+            examples=f"This is a {question_type} question. Please think through it carefully using the following steps:\n"
+                     + cot_steps(question_type),
+            passage=format_texts(question_data, question_type),
+            question=question_block
+        )
+    return PromptParts(
+        instructions="Please solve the following reading comprehension question and select the single best answer (A/B/C/D). "
+                     "Provide ONLY the letter of your answer (A, B, C, or D).",
+        passage=format_texts(question_data, question_type),
+        question=question_block
+    )
+
+def build_messages(question, skill_type, strategy, layout="legacy"):
+    """The messages of one call, in the original single-prompt layout or the prefix-stable one"""
+    if layout == "stable":
+        return generate_prompt_parts(question, skill_type, strategy).messages()
+    if strategy == "zero-shot":
+        prompt = generate_zero_shot_prompt(question)
+    elif strategy == "five-shot":
+        prompt = generate_five_shot_prompt(question, skill_type)
+    else:  # chain-of-thought
+        prompt = generate_cot_prompt(question, skill_type)
+    return user_message(prompt)
+SKILL_TYPES = ["Cross-Text Connections", "Text Structure and Purpose", "Words in Context"]
+
+def get_correct_answer(question, skill_type):
+    """Correct answer for a question - use our hardcoded answers dictionary for Words in Context"""
+    question_num = question.get("number", 0)
+    if skill_type == "Words in Context" and question_num in words_in_context_answers:
+        return words_in_context_answers[question_num]
+    return question.get("correctAnswer", "").strip().upper()
+
+# Driver options the plan hooks read, besides timeout/temp/verbose (evalkit.plan.DEFAULT_ARGS)
+PLAN_ARGS = ("questions_per_type", "layout")
+
+def select_questions(dataset, args, selection=None):
+    """Sample questions_per_type questions per skill type, or reuse a journaled selection"""
+    skill_counts = dataset.groups("skill")
     
     # Verify that each skill type has enough questions
-    for skill in skill_types:
-        if skill not in questions_by_skill:
+    questions_by_skill = {}
+    for skill in SKILL_TYPES:
+        if skill not in skill_counts:
             print(f"Warning: No questions found for skill type: {skill}")
             questions_by_skill[skill] = []
+        elif selection:
+            # Reuse the sample drawn by the run being resumed or rescored
+            questions_by_skill[skill] = [q.raw for q in dataset.by_ids(selection[skill])]
+            print(f"Reusing {len(questions_by_skill[skill])} journaled questions for skill type: {skill}")
         else:
-            print(f"Found {len(questions_by_skill[skill])} questions for skill type: {skill}")
+            print(f"Found {skill_counts[skill]} questions for skill type: {skill}")
             # Randomly select questions_per_type questions if there are more
-            if len(questions_by_skill[skill]) > args.questions_per_type:
-                questions_by_skill[skill] = random.sample(questions_by_skill[skill], args.questions_per_type)
+            questions_by_skill[skill] = [q.raw for q in dataset.sample(args.questions_per_type, skill=skill)]
+            if getattr(args, "sequential", None):
+                # A sequential cell stops on a prefix of its questions, so the order has to be random too
+                random.shuffle(questions_by_skill[skill])
+    return questions_by_skill
+
+def build_work_items(questions_by_skill, args, layout=None, budgets=None):
+    """
+    Build one work item per (model, strategy, skill, question), in the order the results are reported,
+    bounded by the --budgets policy unless another one is given
+    """
+    layout = layout or getattr(args, "layout", "legacy")
+    budgets = getattr(args, "budget_policy", None) if budgets is None else budgets
+    items = []
+    for model_name in args.models:
+        for strategy in args.strategies:
+            for skill_type in SKILL_TYPES:
+                for question in questions_by_skill[skill_type]:
+                    question_num = question.get("number", 0)
+                    correct_answer = get_correct_answer(question, skill_type)
+                    if not correct_answer:
+                        print(f"  WARNING: Missing correct answer for question {question_num}")
+                        continue  # Skip questions with missing answers
+
+                    items.append(WorkItem(
+                        model=model_name,
+                        strategy=strategy,
+                        key=f"{skill_type}#{question_num}",
+                        messages=build_messages(question, skill_type, strategy, layout),
+                        params={
+                            "timeout": args.timeout,
+                            "temperature": args.temp,
+                            **(budgets.params(model_name, strategy, skill_type) if budgets else {})
+                        },
+                        meta={
+                            "skill": skill_type,
+                            "question": question,
+                            "difficulty": question.get("questionDifficulty", "Medium"),
+                            "correct_answer": correct_answer
+                        }
+                    ))
+    return items
+
+def grade_completion(completion):
+    """Turn a finished model call into the per-question result dict"""
+    meta = completion.item.meta
+    question = meta["question"]
+    result_detail = {
+        "question_number": question.get("number", 0),
+        "skill": meta["skill"],
+        "question_text": question.get("question", ""),
+        "difficulty": meta["difficulty"],
+        "correct_answer": meta["correct_answer"]
+    }
     
-    # Store all results
-    all_results = {}
+    if not completion.ok:
+        result_detail.update({
+            "model_answer": None,
+            "is_correct": False,
+            "error": completion.error
+        })
+        return result_detail
     
-    # Test each model and strategy
-    for model_name in args.models:
+    response = completion.response
+    model_answer = extract_answer(response)
+    result_detail.update({
+        "model_answer": model_answer,
+        "is_correct": model_answer == meta["correct_answer"],
+        "runtime": completion.runtime,
+        "full_response": response[:1000] + "..." if len(response) > 1000 else response
+    })
+    return result_detail
+
+def skill_cell(item):
+    """The (model, strategy, skill) cell a work item belongs to"""
+    return (item.model, item.strategy, item.meta["skill"])
+
+def answer_outcome(completion):
+    """Whether a finished call answered correctly, or None if it errored"""
+    return grade_completion(completion)["is_correct"] if completion.ok else None
+
+def stopping_rule(args):
+    """The --sequential stopping rule, or None when every sampled question is asked"""
+    if not getattr(args, "sequential", None):
+        return None
+    return StoppingRule(
+        args.sequential,
+        ci_width=args.ci_width,
+        confidence=args.confidence,
+        min_questions=args.min_questions,
+        threshold=args.sprt_threshold,
+        delta=args.sprt_delta
+    )
+
+def run_cells(items, run_batch, args):
+    """Run every item, or with --sequential only as many per cell as its stopping rule needs"""
+    rule = stopping_rule(args)
+    if rule is None:
+        return run_batch(items)
+    return run_sequential(items, run_batch, rule, skill_cell, answer_outcome, batch=args.sequential_batch)
+
+def detail_from_row(table, row):
+    """Rebuild the per-question result dict of grade_completion from a result table row"""
+    result_detail = {
+        "question_number": table.value("question", row),
+        "skill": table.value("skill", row),
+        "question_text": table.value("text", row),
+        "difficulty": table.value("difficulty", row),
+        "correct_answer": table.value("expected", row)
+    }
+    error = table.error(row)
+    if error is not None:
+        result_detail.update({
+            "model_answer": None,
+            "is_correct": False,
+            "error": error
+        })
+    else:
+        result_detail.update({
+            "model_answer": table.value("answer", row),
+            "is_correct": bool(table.correct[row]),
+            "runtime": table.runtime_of(row),
+            "full_response": table.response(row)
+        })
+    return result_detail
+
+def aggregate_results(completions, models, strategies, skill_types):
+    """
+    Fold graded completions into the all_results structure (model -> strategy -> stats).
+    Per-question details are kept in a compact ResultTable and only rebuilt as
+    dicts when the results file is written (see dump_json).
+    """
+    table = ResultTable()
+    by_cell = {}
+    for completion in completions:
+        by_cell.setdefault((completion.item.model, completion.item.strategy), []).append(completion)
+    
+    all_results = {}
+    for model_name in models:
         all_results[model_name] = {}
         
-        for strategy in args.strategies:
+        for strategy in strategies:
             print(f"\n{'-'*80}")
-            print(f"Testing model: {model_name} with strategy: {strategy}")
+            print(f"Results for model: {model_name} with strategy: {strategy}")
             print(f"{'-'*80}")
             
             strategy_results = {
@@ -547,125 +718,69 @@ def main():
                 "accuracy": 0,
                 "by_skill": {},
                 "by_difficulty": {},
-                "details": []
+                "details": lambda model_name=model_name, strategy=strategy: [
+                    detail_from_row(table, row) for row in table.rows(model=model_name, strategy=strategy)
+                ]
             }
-            
-            # Process each skill type
             for skill_type in skill_types:
-                print(f"\nTesting skill type: {skill_type}")
+                strategy_results["by_skill"][skill_type] = {
+                    "total": 0,
+                    "correct": 0,
+                    "accuracy": 0,
+                    "by_difficulty": {}
+                }
+            
+            for completion in by_cell.get((model_name, strategy), []):
+                result_detail = grade_completion(completion)
+                skill_type = result_detail["skill"]
+                difficulty = result_detail["difficulty"]
+                skill_stats = strategy_results["by_skill"][skill_type]
                 
-                # Initialize skill results
-                if skill_type not in strategy_results["by_skill"]:
-                    strategy_results["by_skill"][skill_type] = {
-                        "total": 0,
-                        "correct": 0,
-                        "accuracy": 0,
-                        "by_difficulty": {}
-                    }
+                # Initialize difficulty counts if not seen before
+                skill_stats["by_difficulty"].setdefault(difficulty, {"total": 0, "correct": 0})
+                strategy_results["by_difficulty"].setdefault(difficulty, {"total": 0, "correct": 0})
+                table.append(
+                    model_name, strategy, result_detail["question_number"], result_detail["is_correct"],
+                    runtime=result_detail.get("runtime"),
+                    response=result_detail.get("full_response"),
+                    answer=result_detail["model_answer"],
+                    expected=result_detail["correct_answer"],
+                    skill=skill_type,
+                    difficulty=difficulty,
+                    text=result_detail["question_text"],
+                    error=result_detail.get("error")
+                )
                 
-                # Process questions for this skill type
-                for question in questions_by_skill[skill_type]:
-                    question_num = question.get("number", 0)
-                    difficulty = question.get("questionDifficulty", "Medium")
-                    
-                    # Get correct answer - use our hardcoded answers dictionary for Words in Context
-                    if skill_type == "Words in Context" and question_num in words_in_context_answers:
-                        correct_answer = words_in_context_answers[question_num]
-                    else:
-                        correct_answer = question.get("correctAnswer", "").strip().upper()
-                    
-                    # Debug info
-                    if not correct_answer:
-                        print(f"  WARNING: Missing correct answer for question {question_num}")
-                        continue  # Skip questions with missing answers
-                    
-                    # Initialize difficulty counts for this skill type if not seen before
-                    if difficulty not in strategy_results["by_skill"][skill_type]["by_difficulty"]:
-                        strategy_results["by_skill"][skill_type]["by_difficulty"][difficulty] = {"total": 0, "correct": 0}
-                    
-                    # Initialize overall difficulty counts if not seen before
-                    if difficulty not in strategy_results["by_difficulty"]:
-                        strategy_results["by_difficulty"][difficulty] = {"total": 0, "correct": 0}
-                    
-                    print(f"\nQuestion {question_num} (Skill: {skill_type}, Difficulty: {difficulty}):")
-                    
-                    # Generate the appropriate prompt
-                    if strategy == "zero-shot":
-                        prompt = generate_zero_shot_prompt(question)
-                    elif strategy == "five-shot":
-                        prompt = generate_five_shot_prompt(question, skill_type)
-                    else:  # chain-of-thought
-                        prompt = generate_cot_prompt(question, skill_type)
-                    
-                    # Call the model
-                    try:
-                        start_time = time.time()
-                        response = client.chat.completions.create(
-                            model=model_name,
-                            messages=[{"role": "user", "content": prompt}],
-                            timeout=args.timeout,
-                            temperature=args.temp
-                        ).choices[0].message.content.strip()
-                        runtime = round(time.time() - start_time, 2)
-                        
-                        # Extract the answer
-                        model_answer = extract_answer(response)
-                        is_correct = (model_answer == correct_answer)
-                        
-                        # Update statistics
-                        strategy_results["total"] += 1
-                        strategy_results["by_skill"][skill_type]["total"] += 1
-                        strategy_results["by_skill"][skill_type]["by_difficulty"][difficulty]["total"] += 1
-                        strategy_results["by_difficulty"][difficulty]["total"] += 1
-                        
-                        if is_correct:
-                            strategy_results["correct"] += 1
-                            strategy_results["by_skill"][skill_type]["correct"] += 1
-                            strategy_results["by_skill"][skill_type]["by_difficulty"][difficulty]["correct"] += 1
-                            strategy_results["by_difficulty"][difficulty]["correct"] += 1
-                        
-                        # Store result details
-                        result_detail = {
-                            "question_number": question_num,
-                            "skill": skill_type,
-                            "question_text": question.get("question", ""),
-                            "difficulty": difficulty,
-                            "correct_answer": correct_answer,
-                            "model_answer": model_answer,
-                            "is_correct": is_correct,
-                            "runtime": runtime,
-                            "full_response": response[:1000] + "..." if len(response) > 1000 else response
-                        }
-                        strategy_results["details"].append(result_detail)
-                        
-                        print(f"  Model answer: {model_answer}, Correct answer: {correct_answer}")
-                        print(f"  {'✓ Correct' if is_correct else '✗ Incorrect'} (Runtime: {runtime}s)")
-                        
-                    except Exception as e:
-                        print(f"  Error getting model response: {e}")
-                        
-                        # Store error in details
-                        result_detail = {
-                            "question_number": question_num,
-                            "skill": skill_type,
-                            "question_text": question.get("question", ""),
-                            "difficulty": difficulty,
-                            "correct_answer": correct_answer,
-                            "model_answer": None,
-                            "is_correct": False,
-                            "error": str(e)
-                        }
-                        strategy_results["details"].append(result_detail)
+                print(f"\nQuestion {result_detail['question_number']} (Skill: {skill_type}, Difficulty: {difficulty}):")
+                if not completion.ok:
+                    print(f"  Error getting model response: {completion.error}")
+                    continue
+                
+                is_correct = result_detail["is_correct"]
+                
+                # Update statistics
+                strategy_results["total"] += 1
+                skill_stats["total"] += 1
+                skill_stats["by_difficulty"][difficulty]["total"] += 1
+                strategy_results["by_difficulty"][difficulty]["total"] += 1
                 
+                if is_correct:
+                    strategy_results["correct"] += 1
+                    skill_stats["correct"] += 1
+                    skill_stats["by_difficulty"][difficulty]["correct"] += 1
+                    strategy_results["by_difficulty"][difficulty]["correct"] += 1
+                
+                print(f"  Model answer: {result_detail['model_answer']}, Correct answer: {result_detail['correct_answer']}")
+                print(f"  {'✓ Correct' if is_correct else '✗ Incorrect'} (Runtime: {result_detail['runtime']}s)")
+            
+            for skill_type in skill_types:
+                skill_stats = strategy_results["by_skill"][skill_type]
                 # Calculate accuracy for this skill type
-                if strategy_results["by_skill"][skill_type]["total"] > 0:
-                    strategy_results["by_skill"][skill_type]["accuracy"] = (
-                        strategy_results["by_skill"][skill_type]["correct"] / 
-                        strategy_results["by_skill"][skill_type]["total"]
-                    )
+                if skill_stats["total"] > 0:
+                    skill_stats["accuracy"] = skill_stats["correct"] / skill_stats["total"]
                 
                 # Calculate accuracy by difficulty for this skill type
-                for difficulty, counts in strategy_results["by_skill"][skill_type]["by_difficulty"].items():
+                for difficulty, counts in skill_stats["by_difficulty"].items():
                     if counts["total"] > 0:
                         counts["accuracy"] = counts["correct"] / counts["total"]
             
@@ -694,12 +809,173 @@ def main():
             # Store results for this strategy
             all_results[model_name][strategy] = strategy_results
     
+    return all_results
+
+def run_journaled(items, journal, args):
+    """Run every (model, strategy, question) call not yet journaled through the shared engine"""
+    cache = None if args.no_cache else ResponseCache(args.cache, replay_only=args.replay_only)
+    client = Client()
+    if args.budget_policy is not None:
+        print(args.budget_policy.describe())
+        if args.budget_policy.streams():
+            # stop_at_answer budgets read each answer from a stream and close it there
+            client = StreamingClient(client, watcher=answer_watcher)
+    if cache is not None:
+        client = CachedClient(client, cache)
+    limiter = RateLimiter(default_rpm=args.rpm)
+    concurrency = None
+    if args.adaptive:
+        concurrency = AdaptiveConcurrency(
+            initial=min(4, args.concurrency),
+            maximum=args.concurrency,
+            timeout=args.timeout,
+            log_path=os.path.splitext(journal.path)[0] + ".concurrency.jsonl"
+        )
+    scheduler = None
+    if args.schedule != "fifo":
+        # Interleave models so a slow provider fills idle slots instead of blocking the rest
+        scheduler = PriorityScheduler(LatencyHistory.load(), policy=args.schedule, deadline=args.deadline)
+    
+    restored = sum(1 for item in items if journal.is_done(item.model, item.strategy, item.key))
+    to_run = len(items) - restored
+    print(f"\nRunning {'up to ' if args.sequential else ''}{to_run} model calls with up to {args.concurrency} "
+          f"in flight ({restored} restored from journal)")
+    done = [0]
+    
+    def report_progress(completion):
+        done[0] += 1
+        status = f"{completion.runtime}s" if completion.ok else f"error: {completion.error}"
+        print(f"  [{done[0]}/{to_run}] {completion.item.model} / {completion.item.strategy} / {completion.item.key} ({status})")
+    
+    def run_batch(batch):
+        return run_items(
+            client, batch,
+            max_in_flight=args.concurrency,
+            on_complete=report_progress,
+            limiter=limiter,
+            max_retries=args.max_retries,
+            journal=journal,
+            concurrency=concurrency,
+            scheduler=scheduler
+        )
+    
+    start_time = time.time()
+    completions = run_cells(items, run_batch, args)
+    journal.close()
+    print(f"\nFinished {done[0]} model calls in {time.time() - start_time:.1f}s")
+    print(f"Raw responses kept in {compact_journal(journal.path)}")
+    print(limiter.format_report())
+    if concurrency is not None:
+        print(concurrency.format_report())
+        print(f"Concurrency decisions logged to {concurrency.log_path}")
+    if scheduler is not None:
+        print(scheduler.format_report())
+        print(f"Per-call schedule written to {scheduler.write_csv(os.path.splitext(journal.path)[0] + '.schedule.csv')}")
+    if cache is not None:
+        print(cache.format_report())
+        cache.close()
+    
+    return completions
+def run_layout_comparison(questions_by_skill, args):
+    """Time --compare_layouts questions per (model, strategy) in both prompt layouts, without grading them"""
+    items_by_layout = {layout: build_work_items(questions_by_skill, args, layout) for layout in LAYOUTS}
+    for layout, items in items_by_layout.items():
+        print(format_prefix_reuse(prefix_reuse(items), f"{layout} layout, whole sweep"))
+
+    pairs = []
+    taken = {}
+    for legacy_item, stable_item in zip(items_by_layout["legacy"], items_by_layout["stable"]):
+        cell = (legacy_item.model, legacy_item.strategy)
+        if taken.get(cell, 0) < args.compare_layouts:
+            taken[cell] = taken.get(cell, 0) + 1
+            pairs.append((legacy_item, stable_item))
+
+    print(f"\nTiming {len(pairs)} questions in both layouts, one call at a time")
+
+    def report_call(row):
+        status = f"ttft {row['ttft']}s, {row['latency']}s" if row["error"] is None else f"error: {row['error']}"
+        print(f"  {row['model']} / {row['strategy']} / {row['key']} [{row['layout']}] ({status})")
+
+    # Straight to the models: cached answers would hide exactly what is being measured
+    rows = compare_layouts(Client(), pairs, on_call=report_call)
+    print(f"\n{format_layout_report(rows)}")
+    csv_file = os.path.join(args.output, f"layout_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    print(f"Per-call timings saved to {write_layout_csv(rows, csv_file)}")
+
+def run_budget_comparison(questions_by_skill, args):
+    """Answer --compare_budgets questions per (model, strategy) open-ended and under the budget policy, and grade both"""
+    policy = args.budget_policy or BudgetPolicy.load("default")
+    print(policy.describe())
+    pairs = []
+    taken = {}
+    for open_item, budgeted_item in zip(build_work_items(questions_by_skill, args, budgets=BudgetPolicy()),
+                                        build_work_items(questions_by_skill, args, budgets=policy)):
+        cell = (open_item.model, open_item.strategy)
+        if taken.get(cell, 0) < args.compare_budgets:
+            taken[cell] = taken.get(cell, 0) + 1
+            pairs.append((open_item, budgeted_item))
+    budgeted = {id(budgeted_item) for _, budgeted_item in pairs}
+
+    print(f"\nAnswering {len(pairs)} questions open-ended and budgeted, with up to {args.concurrency} calls in flight")
+
+    def report_call(completion):
+        status = f"{completion.runtime}s" if completion.ok else f"error: {completion.error}"
+        budget = "budgeted" if id(completion.item) in budgeted else "open"
+        print(f"  {completion.item.model} / {completion.item.strategy} / {completion.item.key} [{budget}] ({status})")
+
+    # Straight to the models: cached answers would hide exactly what is being measured.  Both arms go
+    # through the same client, streamed if the policy stops at the answer, and each pair is sent together
+    client = StreamingClient(Client(), watcher=answer_watcher) if policy.streams() else Client()
+    completions = run_items(client, [item for pair in pairs for item in pair], max_in_flight=args.concurrency,
+                            on_complete=report_call, limiter=RateLimiter(default_rpm=args.rpm),
+                            max_retries=args.max_retries)
+
+    def outcome(completion):
+        detail = grade_completion(completion)
+        return detail["model_answer"], detail["is_correct"]
+
+    rows = budget_rows(completions[0::2], completions[1::2], outcome)
+    print(f"\n{format_budget_report(rows)}")
+    csv_file = os.path.join(args.output, f"budget_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    print(f"Per-call answers and runtimes saved to {write_budget_csv(rows, csv_file)}")
+
+def run_queued(items, journal, args):
+    """Submit the calls not yet journaled to a shared work queue and wait for its workers"""
+    queue = WorkQueue(args.queue)
+    dataset = os.path.splitext(os.path.basename(args.input))[0]
+    pending = [item for item in items if not journal.is_done(item.model, item.strategy, item.key)]
+    outstanding = queue.submit(dataset, pending, max_attempts=args.max_retries)
+    print(f"\nQueued {len(pending)} model calls as '{dataset}' in {args.queue} ({outstanding} waiting for workers)")
+    print(f"Start workers with: python -m evalkit queue work {args.queue}")
+    
+    start_time = time.time()
+    finished = {}
+    for completion in queue.collect(dataset, pending):
+        item = completion.item
+        journal.record(item.model, item.strategy, item.key, completion.response, completion.runtime, completion.error)
+        finished[(item.model, item.strategy, item.key)] = completion
+        status = f"{completion.runtime}s" if completion.ok else f"error: {completion.error}"
+        print(f"  [{len(finished)}/{len(pending)}] {item.model} / {item.strategy} / {item.key} ({status})")
+    journal.close()
+    print(f"\nFinished {len(pending)} model calls in {time.time() - start_time:.1f}s")
+    print(f"Raw responses kept in {compact_journal(journal.path)}")
+    print(queue.format_report())
+    queue.close()
+    
+    return [
+        finished.get((item.model, item.strategy, item.key))
+        or completion_from_entry(item, journal.get(item.model, item.strategy, item.key))
+        for item in items
+    ]
+
+def save_results(all_results, args):
+    """Write the results JSON, the summary JSON and the summary CSV"""
     # Save all results to file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     result_file = os.path.join(args.output, f"reading_comp_results_{timestamp}.json")
     
     with open(result_file, "w", encoding="utf-8") as f:
-        json.dump(all_results, f, indent=2)
+        dump_json(all_results, f, indent=2)
     
     print(f"\nAll results saved to {result_file}")
     
@@ -708,10 +984,13 @@ def main():
         "timestamp": timestamp,
         "models_tested": args.models,
         "strategies_tested": args.strategies,
-        "skill_types": skill_types,
+        "skill_types": SKILL_TYPES,
         "questions_per_type": args.questions_per_type,
         "model_summaries": {}
     }
+    rule = stopping_rule(args)
+    if rule is not None:
+        summary["sequential"] = {**rule.settings(), "batch": args.sequential_batch}
     
     for model_name in args.models:
         model_summary = {}
@@ -729,7 +1008,7 @@ def main():
                 }
                 
                 # Add skill type summaries
-                for skill_type in skill_types:
+                for skill_type in SKILL_TYPES:
                     if skill_type in results["by_skill"]:
                         skill_data = results["by_skill"][skill_type]
                         strategy_summary["by_skill"][skill_type] = {
@@ -738,6 +1017,8 @@ def main():
                             "total": skill_data.get("total", 0),
                             "by_difficulty": skill_data.get("by_difficulty", {})
                         }
+                        if "sequential" in skill_data:
+                            strategy_summary["by_skill"][skill_type]["sequential"] = skill_data["sequential"]
                 
                 # Add difficulty summaries
                 for difficulty, data in results["by_difficulty"].items():
@@ -762,7 +1043,7 @@ def main():
     with open(csv_file, "w", encoding="utf-8") as f:
         # Write CSV header
         f.write("Model,Strategy,Overall Accuracy")
-        for skill_type in skill_types:
+        for skill_type in SKILL_TYPES:
             f.write(f",{skill_type} Accuracy")
         f.write("\n")
         
@@ -777,7 +1058,7 @@ def main():
                     
                     f.write(f"{model_name},{strategy},{overall_acc:.2%}")
                     
-                    for skill_type in skill_types:
+                    for skill_type in SKILL_TYPES:
                         if (skill_type in model_strategy["by_skill"] and
                             "accuracy" in model_strategy["by_skill"][skill_type]):
                             skill_acc = model_strategy["by_skill"][skill_type]["accuracy"]
@@ -789,5 +1070,208 @@ def main():
     
     print(f"CSV summary saved to {csv_file}")
 
+def report_results(completions, questions_by_skill, args):
+    """Grade the finished calls and write the result, summary and CSV files"""
+    rule = stopping_rule(args)
+    decisions = None
+    if rule is not None:
+        # Where each cell stopped, and the interval over the answers it got
+        planned = {}
+        for model_name in args.models:
+            for strategy in args.strategies:
+                for skill_type in SKILL_TYPES:
+                    planned[(model_name, strategy, skill_type)] = sum(
+                        1 for question in questions_by_skill[skill_type] if get_correct_answer(question, skill_type)
+                    )
+        decisions = sequential_decisions(completions, rule, planned, skill_cell, answer_outcome)
+    
+    # Store all results
+    all_results = aggregate_results(completions, args.models, args.strategies, SKILL_TYPES)
+    completions.clear()  # the result table keeps everything the output files need
+    if decisions is not None:
+        for (model_name, strategy, skill_type), decision in decisions.items():
+            all_results[model_name][strategy]["by_skill"][skill_type]["sequential"] = decision
+        print(f"\n{format_decisions(decisions)}")
+    
+    save_results(all_results, args)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate LLM performance on reading comprehension questions by skill type")
+    parser.add_argument("--input", default="/home/ltang24/Education/SAT/Craft_and_Structure.json", 
+                        help="Path to input JSON file with questions")
+    parser.add_argument("--output", default=None,
+                        help="Output directory for results (default: results, or the folder of the --resume journal)")
+    parser.add_argument("--models", nargs="+", default=["gpt-4"],
+                        help="List of models to evaluate")
+    parser.add_argument("--strategies", nargs="+", default=["zero-shot", "five-shot", "chain-of-thought"],
+                        help="List of prompting strategies to use")
+    parser.add_argument("--questions_per_type", type=int, default=20, 
+                        help="Number of questions to test per skill type")
+    parser.add_argument("--timeout", type=int, default=120, help="Timeout in seconds for model responses")
+    parser.add_argument("--temp", type=float, default=0.3, help="Temperature setting for model calls")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Maximum number of model calls in flight at once")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt each model's calls in flight (up to --concurrency) to its latency and error rate")
+    parser.add_argument("--schedule", choices=["fair", "sjf", "fifo"], default="fair",
+                        help="Order of calls: fair share per model with shortest expected first (fair), "
+                             "shortest expected first (sjf), or model/strategy/question order (fifo)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Seconds into the run; calls expected to finish after it wait until nothing that can still make it is left")
+    parser.add_argument("--max_retries", type=int, default=3,
+                        help="Attempts per question when a call errors or is rate limited")
+    parser.add_argument("--rpm", type=float, default=0,
+                        help="Requests per minute allowed per model (0 = no cap, cooldowns still apply)")
+    parser.add_argument("--resume", metavar="JOURNAL",
+                        help="Continue an interrupted run from its journal; the question sample, models and strategies come from the journal")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="Response cache shared by all drivers; unchanged prompts are answered from it")
+    parser.add_argument("--no_cache", action="store_true", help="Always call the models, bypassing the cache")
+    parser.add_argument("--replay_only", action="store_true",
+                        help="Serve every call from the cache and report misses as errors instead of calling the models")
+    parser.add_argument("--queue", metavar="DB",
+                        help="Hand the calls to workers on any machine through this shared work queue (see python -m evalkit queue)")
+    parser.add_argument("--rescore", metavar="JOURNAL",
+                        help="Re-grade the raw responses in a finished run's journal without calling any model")
+    parser.add_argument("--sequential", choices=["ci", "sprt"],
+                        help="Stop each (model, strategy, skill) cell once its accuracy is pinned down: when the "
+                             "confidence interval is --ci_width wide (ci) or a sequential probability ratio test decides (sprt)")
+    parser.add_argument("--ci_width", type=float, default=0.25,
+                        help="With --sequential ci, stop a cell once its Wilson interval is at most this wide")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="With --sequential, confidence of the interval (ci) or 1 - error rate of the test (sprt)")
+    parser.add_argument("--min_questions", type=int, default=5,
+                        help="With --sequential, answers a cell needs before it can stop")
+    parser.add_argument("--sprt_threshold", type=float, default=0.5,
+                        help="With --sequential sprt, the accuracy the test decides a cell is above or below")
+    parser.add_argument("--sprt_delta", type=float, default=0.1,
+                        help="With --sequential sprt, half-width of the indifference zone around --sprt_threshold")
+    parser.add_argument("--sequential_batch", type=int, default=5,
+                        help="With --sequential, questions each open cell sends per round")
+    parser.add_argument("--dry_run", action="store_true",
+                        help="Build every prompt and print calls, tokens and a predicted schedule without calling any model")
+    parser.add_argument("--layout", choices=LAYOUTS, default="legacy",
+                        help="Prompt layout: one user prompt as originally written (legacy), or instructions and examples "
+                             "first in a system message and the question last, so providers can reuse the shared prefix (stable)")
+    parser.add_argument("--compare_layouts", type=int, metavar="N",
+                        help="Instead of evaluating, send N questions per model and strategy in both layouts one call at a "
+                             "time and report time to first token and latency")
+    parser.add_argument("--budgets", nargs="?", const="default", metavar="POLICY",
+                        help="Bound each call's output with max_tokens and stop sequences per strategy and question type: "
+                             "the built-in policy, or a policy JSON file with per-model overrides (see evalkit/budgets.py)")
+    parser.add_argument("--compare_budgets", type=int, metavar="N",
+                        help="Instead of evaluating, answer N questions per model and strategy open-ended and under the "
+                             "budget policy (--budgets, or the built-in one) and report accuracy and runtime side by side")
+    args = parser.parse_args()
+    if args.output is None:
+        # A resumed run writes its results next to its journal, like the run it continues
+        args.output = os.path.dirname(os.path.abspath(args.resume)) if args.resume else "results"
+    args.budget_policy = BudgetPolicy.load(args.budgets) if args.budgets else None
+    if args.sequential and args.queue:
+        parser.error("--sequential needs the answers of each round before sending the next, which --queue does not support")
+    if args.queue and args.budget_policy is not None and args.budget_policy.streams():
+        parser.error("--queue workers do not stream, so the budget policy cannot use stop_at_answer")
+    
+    if args.dry_run:
+        # Size the sweep from the prompts alone; nothing is journaled or sent
+        items = build_work_items(select_questions(open_dataset(args.input), args), args)
+        estimate = SweepEstimate.from_items(items, LatencyHistory.load())
+        print(estimate.format_report(concurrency=args.concurrency, rpm=args.rpm))
+        print(format_prefix_reuse(prefix_reuse(items), f"{args.layout} layout"))
+        if args.budget_policy is not None:
+            print(args.budget_policy.describe())
+        return
+
+    if args.compare_layouts:
+        # Timing only: nothing is journaled, cached or graded
+        os.makedirs(args.output, exist_ok=True)
+        run_layout_comparison(select_questions(open_dataset(args.input), args), args)
+        return
+
+    if args.compare_budgets:
+        # Side by side on the same questions; nothing is journaled or cached
+        os.makedirs(args.output, exist_ok=True)
+        run_budget_comparison(select_questions(open_dataset(args.input), args), args)
+        return
+
+    # Create output directory if it doesn't exist
+    os.makedirs(args.output, exist_ok=True)
+    
+    # Every finished call is journaled so a crashed run can be resumed or rescored
+    if args.rescore:
+        journal = Journal(args.rescore, read_only=True)
+        if not journal.header:
+            print(f"Error: {args.rescore} has no run header to rescore from")
+            return
+        print(f"Rescoring {len(journal)} journaled responses from {args.rescore}")
+    elif args.resume:
+        journal = Journal(args.resume, resume=True)
+        print(f"Resuming from {args.resume} ({len(journal)} results already journaled)")
+    else:
+        journal_file = os.path.join(args.output, f"reading_comp_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        journal = Journal(journal_file)
+        print(f"Journaling results to {journal_file}")
+    if journal.header:
+        args.input = journal.header["input"]
+        args.models = journal.header["models"]
+        args.strategies = journal.header["strategies"]
+        args.questions_per_type = journal.header["questions_per_type"]
+        args.layout = journal.header.get("layout", "legacy")
+        budgets = journal.header.get("budgets")
+        args.budget_policy = BudgetPolicy.from_dict(budgets) if budgets else None
+        # The stopping rule of a sequential run is part of its header
+        sequential = journal.header.get("sequential")
+        args.sequential = sequential["method"] if sequential else None
+        if sequential:
+            args.ci_width = sequential["ci_width"]
+            args.confidence = sequential["confidence"]
+            args.min_questions = sequential["min_questions"]
+            args.sprt_threshold = sequential["threshold"]
+            args.sprt_delta = sequential["delta"]
+            args.sequential_batch = sequential["batch"]
+    
+    # Load questions
+    print(f"Loading questions from {args.input}")
+    try:
+        # The shared index groups questions by skill without re-parsing the file
+        dataset = open_dataset(args.input)
+        print(f"Loaded {len(dataset)} total questions")
+    except Exception as e:
+        print(f"Error loading questions: {e}")
+        return
+    
+    questions_by_skill = select_questions(dataset, args, journal.header["selection"] if journal.header else None)
+    
+    if not journal.header:
+        journal.write_header(
+            input=os.path.abspath(args.input),
+            models=args.models,
+            strategies=args.strategies,
+            questions_per_type=args.questions_per_type,
+            layout=args.layout,
+            budgets=args.budget_policy.as_dict() if args.budget_policy else None,
+            sequential={**stopping_rule(args).settings(), "batch": args.sequential_batch} if args.sequential else None,
+            selection={skill: [q.get("number", 0) for q in questions_by_skill[skill]] for skill in SKILL_TYPES}
+        )
+    
+    items = build_work_items(questions_by_skill, args)
+    if args.rescore and args.sequential:
+        # Replay the stopping rule on the new grades; calls the run never made are left out
+        completions = run_cells(
+            items,
+            lambda batch: completions_from_journal(
+                [item for item in batch if journal.get(item.model, item.strategy, item.key) is not None], journal
+            ),
+            args
+        )
+    elif args.rescore:
+        completions = completions_from_journal(items, journal)
+    elif args.queue:
+        completions = run_queued(items, journal, args)
+    else:
+        completions = run_journaled(items, journal, args)
+    
+    report_results(completions, questions_by_skill, args)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
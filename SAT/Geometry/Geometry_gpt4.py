@@ -4,12 +4,20 @@ import time
 import os
 import random
 import argparse
+import sys
 from datetime import datetime
-from g4f.client import Client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from evalkit import sharding
+from evalkit.engine import WorkItem, user_message
+from evalkit.lazy import lazy_import
+from evalkit.ratelimit import RateLimiter, is_rate_limited_response
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 # Constants
 MAX_RETRIES = 3
-RATE_LIMIT_KEYWORD = "限流"  # Rate limit keyword in Chinese
 MAX_QUESTIONS = 20  # Total questions to analyze
 
 def extract_answer(response: str) -> str:
@@ -236,6 +244,282 @@ def generate_cot_prompt(question: dict) -> str:
     
     return prompt
 
+def build_prompt(strat, q, examples):
+    """Generate the prompt for one question under a strategy."""
+    if strat == "zero-shot":
+        return generate_zero_shot_prompt(q)
+    elif strat == "five-shot":
+        return generate_five_shot_prompt(q, examples)
+    else:  # chain-of-thought
+        return generate_cot_prompt(q)
+
+def plan_cells(questions, args):
+    """
+    Sample every (model, strategy) cell's five-shot examples and test questions
+    up front; returns the cells with their question counts and one
+    (model, strategy, question, examples) item per call.
+    """
+    cells = []
+    items = []
+    for model_name in args.models:
+        for strat in args.strategies:
+            # Get examples for five-shot prompting
+            examples = []
+            if strat == "five-shot" and len(questions) > 5:
+                examples = random.sample(questions, 5)
+                # Ensure we're not testing the examples
+                test_questions = [q for q in questions if q not in examples]
+                if len(test_questions) < len(questions) - 5:
+                    # If we don't have enough test questions, select randomly
+                    test_questions = random.sample(questions, len(questions) - 5)
+            else:
+                test_questions = questions
+            cells.append((model_name, strat, len(test_questions)))
+            items.extend((model_name, strat, q, examples) for q in test_questions)
+    return cells, items
+
+def failed_detail(q):
+    """Details entry for a question whose call never succeeded."""
+    return {
+        "number": q.get("number", 0),
+        "difficulty": q.get("difficulty", "Medium"),
+        "correct_answer": get_correct_answer(q),
+        "model_answer": None,
+        "is_correct": False,
+        "error": "rate_limited"
+    }
+
+def grade_response(q, resp, rt, args):
+    """Extract and grade a model response; returns the details entry."""
+    num = q.get("number", 0)
+    diff = q.get("difficulty", "Medium")
+    correct = get_correct_answer(q)
+
+    # Extract and evaluate answer
+    ans = extract_answer(resp)
+    is_correct = is_correct_answer(ans, correct)
+    
+    # Handle different types of correct answers for display
+    if isinstance(correct, (list, tuple)):
+        correct_display = ", ".join(str(c) for c in correct)
+    else:
+        correct_display = str(correct)
+    
+    print(f"Q{num} ({diff}): {q['question'][:50]}...")
+    print(f"  Model answer: {ans}, Correct answer: {correct_display}")
+    print(f"  {'✓ Correct' if is_correct else '✗ Incorrect'} (Runtime: {rt}s)\n")
+
+    # Store result details
+    return {
+        "number": num,
+        "difficulty": diff,
+        "question": q['question'],
+        "correct_answer": correct,
+        "model_answer": ans,
+        "model_full_response": resp[:500] if args.verbose else "",
+        "is_correct": is_correct,
+        "runtime": rt
+    }
+
+def evaluate_question(client, limiter, model_name, strat, q, examples, args):
+    """Ask one question with retries and return its details entry."""
+    prompt = build_prompt(strat, q, examples)
+
+    # Call model with retries; throttling only pauses this model's provider
+    for attempt in range(1, MAX_RETRIES+1):
+        limiter.acquire(model_name)
+        try:
+            t0 = time.time()
+            content = client.chat.completions.create(
+                model=model_name,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=args.timeout,
+                temperature=args.temp
+            ).choices[0].message.content.strip()
+            rt = round(time.time() - t0, 2)
+        except Exception as e:
+            wait = limiter.report_error(model_name, e)
+            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Error: {e} (retrying in {wait:.1f}s)")
+            continue
+        
+        # Check for rate limiting
+        if is_rate_limited_response(content):
+            wait = limiter.report_rate_limit(model_name)
+            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Rate limit detected, cooling down {model_name} for {wait:.0f}s...")
+            continue
+        limiter.report_success(model_name)
+            
+        # Print full response in verbose mode
+        if args.verbose:
+            print(f"Full response:\n{content}\n")
+            
+        return grade_response(q, content, rt, args)
+
+    # All retries failed
+    print(f"  Question {q.get('number', 0)} failed after multiple retries, skipping\n")
+    return failed_detail(q)
+
+def evaluate_items(client, limiter, items, args):
+    """Evaluate (model, strategy, question, examples) items in order."""
+    details = []
+    current = None
+    for model_name, strat, q, examples in items:
+        if (model_name, strat) != current:
+            current = (model_name, strat)
+            print("\n" + "-"*80)
+            print(f"Testing model: {model_name} with strategy: {strat}")
+            print("-"*80 + "\n")
+        details.append(evaluate_question(client, limiter, model_name, strat, q, examples, args))
+    return details
+
+def evaluate_shard(shard, items, args):
+    """One shard in its own process, with its own client and rate limiter."""
+    client = Client()
+    # The per-model rpm cap is split evenly between the shards
+    limiter = RateLimiter(default_rpm=args.rpm / args.shards if args.rpm else args.rpm)
+    details = evaluate_items(client, limiter, items, args)
+    print(f"[shard {shard}] {limiter.format_report()}")
+    return details
+
+def save_results(details, cells, args):
+    """Fold the details into per-cell statistics and write the results JSON and CSV summary."""
+    # Store all results
+    all_results = {}
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    # Test each model and strategy
+    position = 0
+    for model_name, strat, count in cells:
+        all_results.setdefault(model_name, {})
+
+        # Initialize statistics
+        stats = {
+            "total": 0,
+            "correct": 0,
+            "by_difficulty": {},
+            "details": []
+        }
+
+        # Process each question
+        for detail in details[position:position + count]:
+            diff = detail["difficulty"]
+            
+            # Initialize counters if needed
+            if diff not in stats["by_difficulty"]:
+                stats["by_difficulty"][diff] = {"total": 0, "correct": 0}
+            
+            # Update totals
+            stats["total"] += 1
+            stats["by_difficulty"][diff]["total"] += 1
+
+            # Update statistics
+            if detail["is_correct"]:
+                stats["correct"] += 1
+                stats["by_difficulty"][diff]["correct"] += 1
+
+            stats["details"].append(detail)
+        position += count
+
+        # Calculate accuracy metrics
+        total = stats["total"]
+        correct = stats["correct"]
+        accuracy = correct/total if total else 0.0
+        stats["accuracy"] = accuracy
+        
+        # Calculate overall accuracy by difficulty
+        for d, data in stats["by_difficulty"].items():
+            t = data["total"]; c = data["correct"]
+            a = c/t if t else 0
+            data["accuracy"] = a
+
+        # Generate summary text
+        lines = []
+        lines.append(f"{model_name} with {strat} strategy summary:")
+        lines.append(f"Overall accuracy: {accuracy:.2%} ({correct}/{total})\n")
+        
+        for d, data in sorted(stats["by_difficulty"].items()):
+            t = data["total"]; c = data["correct"]
+            a = data["accuracy"]
+            lines.append(f"  {d} difficulty: {a:.2%} ({c}/{t})")
+        lines.append("")  # blank line
+            
+        stats["summary_text"] = "\n".join(lines)
+
+        # Print summary
+        print(stats["summary_text"])
+
+        # Store results for this strategy
+        all_results[model_name][strat] = stats
+
+    # Save results to file
+    out_path = os.path.join(args.output, f"geometry_results_{timestamp}.json")
+    
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(all_results, f, indent=2, ensure_ascii=False)
+    
+    print(f"All results saved to {out_path}")
+
+    # Generate CSV summary for easy viewing
+    csv_path = os.path.join(args.output, f"geometry_summary_{timestamp}.csv")
+    
+    with open(csv_path, "w", encoding="utf-8") as f:
+        # Write header
+        f.write("Model,Strategy,Overall Accuracy\n")
+        
+        # Write data
+        for model_name in args.models:
+            for strat in args.strategies:
+                if model_name in all_results and strat in all_results[model_name]:
+                    model_strat = all_results[model_name][strat]
+                    f.write(f"{model_name},{strat},{model_strat['accuracy']:.2%}\n")
+    
+    print(f"CSV summary saved to {csv_path}")
+
+# Plan-runner hooks (python -m evalkit plan): the same sweep driven by the shared engine
+
+# Driver options the plan hooks read, besides timeout/temp/verbose (evalkit.plan.DEFAULT_ARGS)
+PLAN_ARGS = ("max_questions",)
+
+def select_questions(dataset, args):
+    """The text-only questions, limited to max_questions (MAX_QUESTIONS), from an evalkit dataset."""
+    limit = getattr(args, "max_questions", MAX_QUESTIONS)
+    questions = [q.raw for q in dataset.all() if "img" not in q.raw]
+    if len(questions) > limit:
+        questions = random.sample(questions, limit)
+    return questions
+
+def build_work_items(questions, args):
+    """One engine work item per (model, strategy, question) call."""
+    cells, items = plan_cells(questions, args)
+    return [
+        WorkItem(
+            model=model_name,
+            strategy=strat,
+            key=str(q.get("number", 0)),
+            messages=user_message(build_prompt(strat, q, examples)),
+            params={"timeout": args.timeout, "temperature": args.temp},
+            meta={"question": q}
+        )
+        for model_name, strat, q, examples in items
+    ]
+
+def report_results(completions, questions, args):
+    """Grade finished engine calls and write the usual result files."""
+    details = []
+    cells = []
+    for completion in completions:
+        item = completion.item
+        if not cells or cells[-1][:2] != (item.model, item.strategy):
+            cells.append((item.model, item.strategy, 0))
+        cells[-1] = (item.model, item.strategy, cells[-1][2] + 1)
+        q = item.meta["question"]
+        if completion.ok:
+            details.append(grade_response(q, completion.response, completion.runtime, args))
+        else:
+            print(f"  Question {q.get('number', 0)} failed after multiple retries, skipping\n")
+            details.append(failed_detail(q))
+    save_results(details, cells, args)
+
 def main():
     parser = argparse.ArgumentParser(
         description="Evaluate LLM on Geometry and Trigonometry questions"
@@ -270,13 +554,18 @@ def main():
         "--verbose", action="store_true",
         help="Enable verbose output with full model responses"
     )
+    parser.add_argument(
+        "--rpm", type=float, default=0,
+        help="Requests per minute allowed per model (0 = no cap, cooldowns still apply)"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=1,
+        help="Split the questions over this many worker processes (by question number)"
+    )
     args = parser.parse_args()
 
     # Create output directory if it doesn't exist
     os.makedirs(args.output, exist_ok=True)
-    
-    # Initialize client
-    client = Client()
 
     # Load questions
     print(f"Loading questions from {args.input}")
@@ -299,188 +588,23 @@ def main():
         print(f"Error loading questions: {e}")
         return
 
-    # Store all results
-    all_results = {}
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    # Test each model and strategy
-    for model_name in args.models:
-        all_results[model_name] = {}
-        
-        for strat in args.strategies:
-            print("\n" + "-"*80)
-            print(f"Testing model: {model_name} with strategy: {strat}")
-            print("-"*80 + "\n")
-
-            # Initialize statistics
-            stats = {
-                "total": 0,
-                "correct": 0,
-                "by_difficulty": {},
-                "details": []
-            }
+    # Sample every cell's questions up front, so sharding does not change them
+    cells, items = plan_cells(questions, args)
 
-            # Get examples for five-shot prompting
-            examples = []
-            if strat == "five-shot" and len(questions) > 5:
-                examples = random.sample(questions, 5)
-                # Ensure we're not testing the examples
-                test_questions = [q for q in questions if q not in examples]
-                if len(test_questions) < len(questions) - 5:
-                    # If we don't have enough test questions, select randomly
-                    test_questions = random.sample(questions, len(questions) - 5)
-            else:
-                test_questions = questions
-            
-            # Process each question
-            for q in test_questions:
-                # Extract question data
-                num = q.get("number", 0)
-                diff = q.get("difficulty", "Medium")
-                correct = get_correct_answer(q)
-                
-                # Initialize counters if needed
-                if diff not in stats["by_difficulty"]:
-                    stats["by_difficulty"][diff] = {"total": 0, "correct": 0}
-                
-                # Update totals
-                stats["total"] += 1
-                stats["by_difficulty"][diff]["total"] += 1
-
-                # Generate appropriate prompt
-                if strat == "zero-shot":
-                    prompt = generate_zero_shot_prompt(q)
-                elif strat == "five-shot":
-                    prompt = generate_five_shot_prompt(q, examples)
-                else:  # chain-of-thought
-                    prompt = generate_cot_prompt(q)
-
-                # Call model with retries
-                resp = None
-                for attempt in range(1, MAX_RETRIES+1):
-                    try:
-                        t0 = time.time()
-                        content = client.chat.completions.create(
-                            model=model_name,
-                            messages=[{"role": "user", "content": prompt}],
-                            timeout=args.timeout,
-                            temperature=args.temp
-                        ).choices[0].message.content.strip()
-                        rt = round(time.time() - t0, 2)
-                        
-                        # Check for rate limiting
-                        if RATE_LIMIT_KEYWORD in content:
-                            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Rate limit detected, waiting 120s...")
-                            time.sleep(120)
-                            continue
-                            
-                        # Print full response in verbose mode
-                        if args.verbose:
-                            print(f"Full response:\n{content}\n")
-                            
-                        resp = content
-                        break
-                    except Exception as e:
-                        print(f"  [Attempt {attempt}/{MAX_RETRIES}] Error: {e}")
-                        time.sleep(5)
-                else:
-                    # All retries failed
-                    print(f"  Question {num} failed after multiple retries, skipping\n")
-                    stats["details"].append({
-                        "number": num,
-                        "difficulty": diff,
-                        "correct_answer": correct,
-                        "model_answer": None,
-                        "is_correct": False,
-                        "error": "rate_limited"
-                    })
-                    continue
-
-                # Extract and evaluate answer
-                ans = extract_answer(resp)
-                is_correct = is_correct_answer(ans, correct)
-                
-                # Handle different types of correct answers for display
-                if isinstance(correct, (list, tuple)):
-                    correct_display = ", ".join(str(c) for c in correct)
-                else:
-                    correct_display = str(correct)
-                
-                print(f"Q{num} ({diff}): {q['question'][:50]}...")
-                print(f"  Model answer: {ans}, Correct answer: {correct_display}")
-                print(f"  {'✓ Correct' if is_correct else '✗ Incorrect'} (Runtime: {rt}s)\n")
-
-                # Update statistics
-                if is_correct:
-                    stats["correct"] += 1
-                    stats["by_difficulty"][diff]["correct"] += 1
-
-                # Store result details
-                stats["details"].append({
-                    "number": num,
-                    "difficulty": diff,
-                    "question": q['question'],
-                    "correct_answer": correct,
-                    "model_answer": ans,
-                    "model_full_response": resp[:500] if args.verbose else "",
-                    "is_correct": is_correct,
-                    "runtime": rt
-                })
-
-            # Calculate accuracy metrics
-            total = stats["total"]
-            correct = stats["correct"]
-            accuracy = correct/total if total else 0.0
-            stats["accuracy"] = accuracy
-            
-            # Calculate overall accuracy by difficulty
-            for d, data in stats["by_difficulty"].items():
-                t = data["total"]; c = data["correct"]
-                a = c/t if t else 0
-                data["accuracy"] = a
-
-            # Generate summary text
-            lines = []
-            lines.append(f"{model_name} with {strat} strategy summary:")
-            lines.append(f"Overall accuracy: {accuracy:.2%} ({correct}/{total})\n")
-            
-            for d, data in sorted(stats["by_difficulty"].items()):
-                t = data["total"]; c = data["correct"]
-                a = data["accuracy"]
-                lines.append(f"  {d} difficulty: {a:.2%} ({c}/{t})")
-            lines.append("")  # blank line
-                
-            stats["summary_text"] = "\n".join(lines)
-
-            # Print summary
-            print(stats["summary_text"])
-
-            # Store results for this strategy
-            all_results[model_name][strat] = stats
-
-    # Save results to file
-    out_path = os.path.join(args.output, f"geometry_results_{timestamp}.json")
-    
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(all_results, f, indent=2, ensure_ascii=False)
-    
-    print(f"All results saved to {out_path}")
+    limiter = None
+    if args.shards > 1:
+        print(f"Running {len(items)} calls in {args.shards} shards")
+        details = sharding.run_sharded(evaluate_shard, items, args.shards,
+                                       key=lambda item: item[2].get("number", item[2]["question"]), args=(args,))
+    else:
+        # Initialize client
+        client = Client()
+        limiter = RateLimiter(default_rpm=args.rpm)
+        details = evaluate_items(client, limiter, items, args)
 
-    # Generate CSV summary for easy viewing
-    csv_path = os.path.join(args.output, f"geometry_summary_{timestamp}.csv")
-    
-    with open(csv_path, "w", encoding="utf-8") as f:
-        # Write header
-        f.write("Model,Strategy,Overall Accuracy\n")
-        
-        # Write data
-        for model_name in args.models:
-            for strat in args.strategies:
-                if model_name in all_results and strat in all_results[model_name]:
-                    model_strat = all_results[model_name][strat]
-                    f.write(f"{model_name},{strat},{model_strat['accuracy']:.2%}\n")
-    
-    print(f"CSV summary saved to {csv_path}")
+    save_results(details, cells, args)
+    if limiter is not None:
+        print(limiter.format_report())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
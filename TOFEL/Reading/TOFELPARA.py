@@ -1,8 +1,23 @@
-import json
+import os
 import re
-import time
-from collections import defaultdict
-from g4f.client import Client
+import sys
+import json
+import argparse
+from functools import lru_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from evalkit.cache import DEFAULT_CACHE_PATH, CachedClient, ResponseCache
+from evalkit.engine import WorkItem, run_items, user_message
+from evalkit.lazy import lazy_import
+from evalkit.packing import (answer_instructions, format_parity, format_questions, pack_items, packed_fields,
+                             parity_rows, request_savings, unpack_completions, write_parity_csv)
+from evalkit.prompts import LAYOUTS, PromptParts, format_prefix_reuse, prefix_reuse
+from evalkit.ratelimit import RateLimiter
+from evalkit.streaming import AnswerWatcher, StreamingClient, timing_fields
+from evalkit.templates import PromptTemplate, option_lines, static
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 def normalize_answer(answer):
     """将答案转为小写、去除空格，便于比较"""
@@ -23,201 +38,361 @@ def extract_answer(response):
     # 如果没有匹配到，则直接返回整个响应（转换为大写，方便比较）
     return response.strip().upper()
 
+def answer_watcher():
+    """--stop_at_answer 只在 "Final Answer: X" 独占一行、且 extract_answer 对已收到的部分已给出 X 时截断"""
+    return AnswerWatcher(extract_answer)
+
 # 针对TOEFL阅读理解题目的提示生成函数
 def generate_zero_shot_prompt_toefl(passage, q_item):
     # passage: 整个段落文本
     # q_item: 一个题目对象，包含 "Question", "Options" 等
-    prompt = ("Please read the following passage carefully:\n\n" +
-              passage + "\n\n" +
-              "Now answer the following question by selecting the best answer letter (A/B/C/D, etc.):\n")
-    prompt += "Question: " + q_item.get("Question", "") + "\n"
-    prompt += "Options:\n"
-    options = q_item.get("Options", {})
-    for letter, text in options.items():
-        prompt += f"{letter}: {text}\n"
-    prompt += "\nImportant: Answer with ONLY the letter corresponding to your chosen answer."
-    return prompt
+    return render_prompt_toefl("zero-shot", passage, q_item)
 
-def generate_five_shot_prompt_toefl(passage, q_item):
-    # 下面提供5个示例（示例内容为通用示例，实际使用时可调整）
-    examples = [
-        {
-            "question": "Example: According to the passage, which statement best reflects the author’s view on language evolution?",
-            "options": {
-                "A": "Languages are static and unchanging.",
-                "B": "Grammar is an inherent, evolving system in all languages.",
-                "C": "Only modern languages have complex grammar.",
-                "D": "Children have little role in creating language."
-            },
-            "final_answer": "B"
+# 下面提供5个示例（示例内容为通用示例，实际使用时可调整）
+FIVE_SHOT_EXAMPLES = [
+    {
+        "question": "Example: According to the passage, which statement best reflects the author’s view on language evolution?",
+        "options": {
+            "A": "Languages are static and unchanging.",
+            "B": "Grammar is an inherent, evolving system in all languages.",
+            "C": "Only modern languages have complex grammar.",
+            "D": "Children have little role in creating language."
+        },
+        "final_answer": "B"
+    },
+    {
+        "question": "Example: In the passage, what is the primary reason for the development of creoles?",
+        "options": {
+            "A": "The influence of adult speakers.",
+            "B": "The natural creativity of children.",
+            "C": "The strict rules of the colonizers' language.",
+            "D": "The absence of any grammatical structure."
         },
-        {
-            "question": "Example: In the passage, what is the primary reason for the development of creoles?",
-            "options": {
-                "A": "The influence of adult speakers.",
-                "B": "The natural creativity of children.",
-                "C": "The strict rules of the colonizers' language.",
-                "D": "The absence of any grammatical structure."
-            },
-            "final_answer": "B"
+        "final_answer": "B"
+    },
+    {
+        "question": "Example: What does the passage imply about the Cherokee language?",
+        "options": {
+            "A": "It is simpler than English.",
+            "B": "It distinguishes subtle differences that English does not.",
+            "C": "It is not used anymore.",
+            "D": "It has no grammatical structure."
         },
-        {
-            "question": "Example: What does the passage imply about the Cherokee language?",
-            "options": {
-                "A": "It is simpler than English.",
-                "B": "It distinguishes subtle differences that English does not.",
-                "C": "It is not used anymore.",
-                "D": "It has no grammatical structure."
-            },
-            "final_answer": "B"
+        "final_answer": "B"
+    },
+    {
+        "question": "Example: According to the passage, why are sign languages significant?",
+        "options": {
+            "A": "They are identical to spoken languages.",
+            "B": "They develop naturally among children and have complex grammar.",
+            "C": "They are learned from written texts.",
+            "D": "They are less complex than spoken languages."
         },
-        {
-            "question": "Example: According to the passage, why are sign languages significant?",
-            "options": {
-                "A": "They are identical to spoken languages.",
-                "B": "They develop naturally among children and have complex grammar.",
-                "C": "They are learned from written texts.",
-                "D": "They are less complex than spoken languages."
-            },
-            "final_answer": "B"
+        "final_answer": "B"
+    },
+    {
+        "question": "Example: The passage suggests that creoles are formed primarily through:",
+        "options": {
+            "A": "The copying of adults’ language patterns.",
+            "B": "The innovative use of language by children.",
+            "C": "Formal education in grammar.",
+            "D": "The interference of foreign languages."
         },
-        {
-            "question": "Example: The passage suggests that creoles are formed primarily through:",
-            "options": {
-                "A": "The copying of adults’ language patterns.",
-                "B": "The innovative use of language by children.",
-                "C": "Formal education in grammar.",
-                "D": "The interference of foreign languages."
-            },
-            "final_answer": "B"
-        }
-    ]
-    prompt = "Below are five examples of TOEFL reading comprehension questions:\n\n"
-    for idx, ex in enumerate(examples, start=1):
+        "final_answer": "B"
+    }
+]
+
+@lru_cache(maxsize=None)
+def format_five_shot_examples():
+    """五个示例题目及答案"""
+    prompt = ""
+    for idx, ex in enumerate(FIVE_SHOT_EXAMPLES, start=1):
         prompt += f"Example {idx}:\n"
         prompt += "Question: " + ex["question"] + "\n"
         prompt += "Options:\n"
         for letter, text in ex["options"].items():
             prompt += f"{letter}: {text}\n"
         prompt += "Final Answer: " + ex["final_answer"] + "\n\n"
-    prompt += ("Now, read the following passage and answer the question by selecting the best answer letter in EXACT format.\n\n")
-    prompt += "Passage:\n" + passage + "\n\n"
-    prompt += "Question: " + q_item.get("Question", "") + "\n"
-    prompt += "Options:\n"
-    options = q_item.get("Options", {})
-    for letter, text in options.items():
-        prompt += f"{letter}: {text}\n"
     return prompt
 
+def format_question_toefl(q_item):
+    return "Question: " + q_item.get("Question", "") + "\nOptions:\n" + option_lines(q_item.get("Options", {}))
+
+@lru_cache(maxsize=None)
+def prompt_template_toefl(strategy):
+    """每种策略的提示模板只编译一次，五个示例已渲染在模板中"""
+    if strategy == "five-shot":
+        return PromptTemplate(
+            static("Below are five examples of TOEFL reading comprehension questions:\n\n" + format_five_shot_examples())
+            + "Now, read the following passage and answer the question by selecting the best answer letter in EXACT format.\n\n"
+            + "Passage:\n{passage}\n\nQuestion: {question}\nOptions:\n{options}"
+        )
+    if strategy == "chain-of-thought":
+        return PromptTemplate(
+            "Please read the following passage and use a detailed Chain of Thought to answer the question. "
+            "Show your reasoning and then state only the final answer letter in EXACT format.\n\n"
+            "Passage:\n{passage}\n\nQuestion: {question}\nOptions:\n{options}"
+            "\nFor example, you may conclude: Final Answer: B"
+        )
+    return PromptTemplate(
+        "Please read the following passage carefully:\n\n{passage}\n\n"
+        "Now answer the following question by selecting the best answer letter (A/B/C/D, etc.):\n"
+        "Question: {question}\nOptions:\n{options}"
+        "\nImportant: Answer with ONLY the letter corresponding to your chosen answer."
+    )
+
+def render_prompt_toefl(strategy, passage, q_item):
+    return prompt_template_toefl(strategy).render(
+        passage=passage,
+        question=q_item.get("Question", ""),
+        options=option_lines(q_item.get("Options", {}))
+    )
+
+def generate_five_shot_prompt_toefl(passage, q_item):
+    return render_prompt_toefl("five-shot", passage, q_item)
+
 def generate_cot_prompt_toefl(passage, q_item):
-    prompt = ("Please read the following passage and use a detailed Chain of Thought to answer the question. "
-              "Show your reasoning and then state only the final answer letter in EXACT format.\n\n")
+    return render_prompt_toefl("chain-of-thought", passage, q_item)
+
+def generate_packed_prompt_toefl(passage, q_items, strategy):
+    """一次请求发送整个段落及其全部题目，按编号作答"""
+    if strategy == "five-shot":
+        prompt = "Below are five examples of TOEFL reading comprehension questions:\n\n"
+        prompt += format_five_shot_examples()
+        prompt += "Now, read the following passage and answer the questions.\n\n"
+    elif strategy == "chain-of-thought":
+        prompt = "Please read the following passage and use a detailed Chain of Thought to answer the questions.\n\n"
+    else:
+        prompt = "Please read the following passage carefully and answer the questions below.\n\n"
     prompt += "Passage:\n" + passage + "\n\n"
-    prompt += "Question: " + q_item.get("Question", "") + "\n"
-    prompt += "Options:\n"
-    options = q_item.get("Options", {})
-    for letter, text in options.items():
-        prompt += f"{letter}: {text}\n"
-    prompt += "\nFor example, you may conclude: Final Answer: B"
+    prompt += format_questions([(q_item.get("Question", ""), q_item.get("Options", {})) for q_item in q_items])
+    prompt += answer_instructions(len(q_items), reasoning=strategy == "chain-of-thought")
     return prompt
 
-# 初始化 g4f 客户端
-client = Client()
+def generate_prompt_parts_toefl(passage, q_item, strategy):
+    """--layout stable：说明和示例在前（所有题目相同），段落其次，题目最后，便于服务端复用提示前缀缓存"""
+    if strategy == "five-shot":
+        return PromptParts(
+            instructions="Below are five examples of TOEFL reading comprehension questions. Then read the passage "
+                         "and answer the question by selecting the best answer letter in EXACT format.",
+            examples=format_five_shot_examples(),
+            passage="Passage:\n" + passage,
+            question=format_question_toefl(q_item)
+        )
+    if strategy == "chain-of-thought":
+        return PromptParts(
+            instructions="Please read the passage and use a detailed Chain of Thought to answer the question. "
+                         "Show your reasoning and then state only the final answer letter in EXACT format.\n"
+                         "For example, you may conclude: Final Answer: B",
+            passage="Passage:\n" + passage,
+            question=format_question_toefl(q_item)
+        )
+    return PromptParts(
+        instructions="Please read the passage carefully and answer the question by selecting the best answer letter "
+                     "(A/B/C/D, etc.).\nImportant: Answer with ONLY the letter corresponding to your chosen answer.",
+        passage="Passage:\n" + passage,
+        question=format_question_toefl(q_item)
+    )
 
-# 加载TOFELPARA.json文件
-json_file = "/home/ltang24/Education/TOFEL/TOFELPARA.json"
-with open(json_file, "r", encoding="utf-8") as f:
-    passages = json.load(f)
+def build_messages(paragraph_text, q_item, strategy, layout="legacy"):
+    if layout == "stable":
+        return generate_prompt_parts_toefl(paragraph_text, q_item, strategy).messages()
+    return user_message(build_prompt(paragraph_text, q_item, strategy))
 
-# 结果存储结构：以段落的NO和TITLE作为分组，内部按模型和策略统计评测
-all_results = {}
+def build_prompt(paragraph_text, q_item, strategy):
+    # 根据策略生成提示
+    if strategy == "zero-shot":
+        return generate_zero_shot_prompt_toefl(paragraph_text, q_item)
+    elif strategy == "five-shot":
+        return generate_five_shot_prompt_toefl(paragraph_text, q_item)
+    elif strategy == "chain-of-thought":
+        return generate_cot_prompt_toefl(paragraph_text, q_item)
+    return generate_zero_shot_prompt_toefl(paragraph_text, q_item)
 
-# 定义使用的模型和提示策略
-models = [
-    "gpt-4", "gpt-4o", "llama-3.1-8b", "llama-3.1-70b",
-    "llama-3.1-405b", "gemini-1.5-flash", "command-r"
-]
-prompting_strategies = ["zero-shot", "five-shot", "chain-of-thought"]
-
-for passage in passages:
-    passage_no = passage.get("NO", "Unknown")
-    title = passage.get("TITLE", "")
-    paragraph_text = passage.get("PARAGRAPH", "")
-    questions = passage.get("questions", [])
-    
-    print(f"\n{'='*50}\nProcessing Passage {passage_no}: {title}\n{'='*50}")
-    all_results[passage_no] = {"title": title, "results": {}}
-    # 对于每个模型和提示策略在该段落下分别评测
-    for model in models:
-        if model not in all_results[passage_no]["results"]:
-            all_results[passage_no]["results"][model] = {}
-        for strategy in prompting_strategies:
-            print(f"\n--- Testing Model: {model} with Strategy: {strategy.upper()} for Passage {passage_no} ---")
-            total_processed = 0
-            correct_count = 0
-            details = []
-            for idx, q_item in enumerate(questions, start=1):
-                # 根据策略生成提示
-                if strategy == "zero-shot":
-                    prompt = generate_zero_shot_prompt_toefl(paragraph_text, q_item)
-                elif strategy == "five-shot":
-                    prompt = generate_five_shot_prompt_toefl(paragraph_text, q_item)
-                elif strategy == "chain-of-thought":
-                    prompt = generate_cot_prompt_toefl(paragraph_text, q_item)
-                else:
-                    prompt = generate_zero_shot_prompt_toefl(paragraph_text, q_item)
-                
-                answer_found = False
-                best_response = None
-                answer_extracted = ""
-                runtime = None
-                qid = f"{passage_no}-{idx}"
-                try:
-                    start_time = time.perf_counter()
-                    response = client.chat.completions.create(
+def build_packed_prompt(members):
+    meta = members[0].meta
+    return generate_packed_prompt_toefl(meta["paragraph"], [member.meta["q_item"] for member in members],
+                                        members[0].strategy)
+
+def build_work_items(passages, args):
+    """每个 (段落, 模型, 策略, 题目) 一个请求，顺序与结果输出一致"""
+    items = []
+    params = {"timeout": args.timeout, "temperature": args.temp}
+    if args.stop_at_answer:
+        params["stop_at_answer"] = True
+    for passage in passages:
+        passage_no = passage.get("NO", "Unknown")
+        paragraph_text = passage.get("PARAGRAPH", "")
+        for model in args.models:
+            for strategy in args.strategies:
+                for idx, q_item in enumerate(passage.get("questions", []), start=1):
+                    items.append(WorkItem(
                         model=model,
-                        messages=[{"role": "user", "content": prompt}],
-                        timeout=120,
-                        temperature=0.3
-                    ).choices[0].message.content.strip()
-                    runtime = round(time.perf_counter() - start_time, 2)
-                    answer_extracted = extract_answer(response)
-                    if answer_extracted:
-                        answer_found = True
-                        best_response = response
-                except Exception as e:
-                    print(f"Model {model} with strategy {strategy} error on question {qid}: {e}")
-                
-                if answer_found:
-                    total_processed += 1
-                    expected = str(q_item.get("Answer", "")).strip().upper()
-                    is_correct = (normalize_answer(answer_extracted) == normalize_answer(expected))
-                    if is_correct:
-                        correct_count += 1
-                    print(f"Passage {passage_no} Q{idx}: Model Answer = {answer_extracted} | Expected = {expected} | {'Correct' if is_correct else 'Incorrect'} (Runtime: {runtime}s)")
-                    details.append({
-                        "question_id": qid,
-                        "expected": expected,
-                        "model_answer": answer_extracted,
-                        "model_response": best_response,
-                        "runtime": runtime,
-                        "correct": is_correct
-                    })
-                else:
-                    print(f"  ✗ No answer found for question {qid}")
-            overall_accuracy = correct_count / total_processed if total_processed > 0 else 0
-            result_entry = {
-                "overall_accuracy": overall_accuracy,
-                "total_questions_processed": total_processed,
-                "details": details
-            }
-            all_results[passage_no]["results"].setdefault(model, {})[strategy] = result_entry
-            print(f"\nResults for Model: {model} with Strategy: {strategy.upper()} for Passage {passage_no}:")
-            print(f"Overall Accuracy: {overall_accuracy:.2%} ({correct_count}/{total_processed})")
-
-# 保存所有评测结果到JSON文件
-output_file = "multi_model_results_toefl_para.json"
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(all_results, f, ensure_ascii=False, indent=4)
-
-print(f"\nTesting complete. Comprehensive results saved to: {output_file}")
+                        strategy=strategy,
+                        key=f"{passage_no}-{idx}",
+                        messages=build_messages(paragraph_text, q_item, strategy, args.layout),
+                        params=params,
+                        meta={"passage_no": passage_no, "paragraph": paragraph_text, "index": idx, "q_item": q_item}
+                    ))
+    return items
+
+def grade(completion):
+    """评分单个请求结果；没有答案时返回 None"""
+    if not completion.ok:
+        return None
+    answer_extracted = extract_answer(completion.response.strip())
+    if not answer_extracted:
+        return None
+    expected = str(completion.item.meta["q_item"].get("Answer", "")).strip().upper()
+    return {
+        "question_id": completion.item.key,
+        "expected": expected,
+        "model_answer": answer_extracted,
+        "model_response": completion.response.strip(),
+        "runtime": completion.runtime,
+        **timing_fields(completion),
+        **packed_fields(completion),
+        "correct": normalize_answer(answer_extracted) == normalize_answer(expected)
+    }
+
+def run_questions(client, limiter, items, args):
+    """逐题请求，或用 --packed 每个段落一次请求；--parity 时两种方式都运行并逐题比较"""
+    def run(batch):
+        return run_items(client, batch, max_in_flight=args.concurrency, limiter=limiter, max_retries=args.max_retries)
+
+    if not (args.packed or args.parity):
+        return run(items)
+    packed_items = pack_items(items, lambda item: item.meta["passage_no"], build_packed_prompt)
+    if not args.parity:
+        return unpack_completions(run(packed_items))
+
+    completions = run(items + packed_items)
+    unpacked, packed = completions[:len(items)], unpack_completions(completions[len(items):])
+
+    def outcomes(completions):
+        graded = {}
+        for completion in completions:
+            detail = grade(completion)
+            graded[(completion.item.model, completion.item.strategy, completion.item.key)] = \
+                detail["correct"] if detail else None
+        return graded
+
+    rows = parity_rows(outcomes(unpacked), outcomes(packed))
+    print(format_parity(rows, request_savings(items, packed_items)))
+    parity_file = os.path.splitext(args.output)[0] + "_parity.csv"
+    print(f"Packed/unpacked parity written to {write_parity_csv(rows, parity_file)}")
+    return packed if args.packed else unpacked
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate LLMs on TOEFL reading passages")
+    parser.add_argument("--input", default="/home/ltang24/Education/TOFEL/TOFELPARA.json",
+                        help="Path to the TOFELPARA.json passages")
+    parser.add_argument("--output", default="multi_model_results_toefl_para.json", help="Results JSON file")
+    parser.add_argument("--models", nargs="+", default=[
+        "gpt-4", "gpt-4o", "llama-3.1-8b", "llama-3.1-70b",
+        "llama-3.1-405b", "gemini-1.5-flash", "command-r"
+    ], help="List of models to evaluate")
+    parser.add_argument("--strategies", nargs="+", default=["zero-shot", "five-shot", "chain-of-thought"],
+                        help="List of prompting strategies to use")
+    parser.add_argument("--timeout", type=int, default=120, help="Timeout in seconds for model responses")
+    parser.add_argument("--temp", type=float, default=0.3, help="Temperature setting for model calls")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum number of model calls in flight at once")
+    parser.add_argument("--max_retries", type=int, default=1,
+                        help="Attempts per call when it errors or is rate limited")
+    parser.add_argument("--rpm", type=float, default=0,
+                        help="Requests per minute allowed per model (0 = no cap, cooldowns still apply)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="Response cache shared by all drivers; unchanged prompts are answered from it")
+    parser.add_argument("--no_cache", action="store_true", help="Always call the models, bypassing the cache")
+    parser.add_argument("--packed", action="store_true",
+                        help="Send each passage with all of its questions in one call, answered by number")
+    parser.add_argument("--parity", action="store_true",
+                        help="Run both the packed and the per-question requests and report how often they grade the same "
+                             "(the results file holds the --packed mode's answers)")
+    parser.add_argument("--layout", choices=LAYOUTS, default="legacy",
+                        help="Prompt layout of per-question calls: one user prompt as originally written (legacy), or "
+                             "instructions and examples first in a system message and the question last (stable)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream every call and record time to first token and time to answer")
+    parser.add_argument("--stop_at_answer", action="store_true",
+                        help="Close each stream right after its 'Final Answer: X' line (implies --stream); letter-only "
+                             "prompts never write one and are read to the end, bound those with an output budget "
+                             "(evalkit/budgets.py)")
+    args = parser.parse_args()
+
+    # 加载TOFELPARA.json文件
+    with open(args.input, "r", encoding="utf-8") as f:
+        passages = json.load(f)
+
+    # 初始化 g4f 客户端
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    # --stream 时逐块接收回复；--stop_at_answer 时读到答案字母即关闭连接
+    streaming = StreamingClient(Client(), watcher=answer_watcher) if args.stream or args.stop_at_answer else None
+    client = streaming or Client()
+    if cache is not None:
+        client = CachedClient(client, cache)
+    limiter = RateLimiter(default_rpm=args.rpm)
+
+    items = build_work_items(passages, args)
+    if not args.packed:
+        print(format_prefix_reuse(prefix_reuse(items), f"{args.layout} layout"))
+    completions = iter(run_questions(client, limiter, items, args))
+
+    # 结果存储结构：以段落的NO和TITLE作为分组，内部按模型和策略统计评测
+    all_results = {}
+
+    for passage in passages:
+        passage_no = passage.get("NO", "Unknown")
+        title = passage.get("TITLE", "")
+        questions = passage.get("questions", [])
+
+        print(f"\n{'='*50}\nProcessing Passage {passage_no}: {title}\n{'='*50}")
+        all_results[passage_no] = {"title": title, "results": {}}
+        # 对于每个模型和提示策略在该段落下分别评测
+        for model in args.models:
+            if model not in all_results[passage_no]["results"]:
+                all_results[passage_no]["results"][model] = {}
+            for strategy in args.strategies:
+                print(f"\n--- Testing Model: {model} with Strategy: {strategy.upper()} for Passage {passage_no} ---")
+                total_processed = 0
+                correct_count = 0
+                details = []
+                for idx, q_item in enumerate(questions, start=1):
+                    completion = next(completions)
+                    qid = completion.item.key
+                    if not completion.ok:
+                        print(f"Model {model} with strategy {strategy} error on question {qid}: {completion.error}")
+                    detail = grade(completion)
+
+                    if detail:
+                        total_processed += 1
+                        if detail["correct"]:
+                            correct_count += 1
+                        print(f"Passage {passage_no} Q{idx}: Model Answer = {detail['model_answer']} | Expected = {detail['expected']} | {'Correct' if detail['correct'] else 'Incorrect'} (Runtime: {detail['runtime']}s)")
+                        details.append(detail)
+                    else:
+                        print(f"  ✗ No answer found for question {qid}")
+                overall_accuracy = correct_count / total_processed if total_processed > 0 else 0
+                result_entry = {
+                    "overall_accuracy": overall_accuracy,
+                    "total_questions_processed": total_processed,
+                    "details": details
+                }
+                all_results[passage_no]["results"].setdefault(model, {})[strategy] = result_entry
+                print(f"\nResults for Model: {model} with Strategy: {strategy.upper()} for Passage {passage_no}:")
+                print(f"Overall Accuracy: {overall_accuracy:.2%} ({correct_count}/{total_processed})")
+
+    if streaming is not None:
+        print(streaming.format_report())
+    if cache is not None:
+        print(cache.format_report())
+        cache.close()
+
+    # 保存所有评测结果到JSON文件
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(all_results, f, ensure_ascii=False, indent=4)
+
+    print(f"\nTesting complete. Comprehensive results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
 import json
 import re
-import time
 import os
 import random
 import argparse
+import sys
 from datetime import datetime
-from g4f.client import Client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from evalkit.engine import WorkItem, run_items, user_message
+from evalkit.estimate import LatencyHistory
+from evalkit.lazy import lazy_import
+from evalkit.packing import (answer_instructions, format_parity, format_questions, pack_items, packed_fields,
+                             parity_rows, request_savings, unpack_completions, write_parity_csv)
+from evalkit.ratelimit import RateLimiter
+from evalkit.scheduler import PriorityScheduler
+
+# g4f is only imported once a client is created, so --help and imports of this script stay fast
+Client = lazy_import("g4f.client", "Client")
 
 # Constants
 MAX_RETRIES = 3
-RATE_LIMIT_KEYWORD = "限流"  # Rate limit keyword in Chinese
 
 def extract_answer(response: str) -> str:
     """Extract the answer letter (A-D) from the model's response for TOEFL listening questions."""
@@ -72,7 +82,7 @@ def is_correct_answer(model_answer: str, correct_answer: str) -> bool:
     # Handle single answer questions
     return model_answer.upper() == correct_answer.upper()
 
-def generate_zero_shot_prompt(question_data: dict) -> str:
+def generate_zero_shot_prompt(question_data: dict, q_idx: int = 0) -> str:
     """Generate a simple direct prompt for the TOEFL listening question."""
     prompt = "Please answer the following TOEFL listening question based on the provided conversation transcript.\n\n"
     
@@ -80,7 +90,7 @@ def generate_zero_shot_prompt(question_data: dict) -> str:
     prompt += f"Conversation Transcript:\n{question_data.get('CONVERSATION', '')}\n\n"
     
     # Add question
-    q = question_data['questions'][0]  # Get the first question for this example
+    q = question_data['questions'][q_idx]
     prompt += f"Question: {q['Question']}\n\n"
     
     # Add options
@@ -93,7 +103,7 @@ def generate_zero_shot_prompt(question_data: dict) -> str:
     
     return prompt
 
-def generate_five_shot_prompt(question_data: dict, examples: list) -> str:
+def generate_five_shot_prompt(question_data: dict, examples: list, q_idx: int = 0) -> str:
     """Generate a prompt with five examples followed by the actual question."""
     prompt = "I'll show you five examples of TOEFL listening questions and their answers, then ask you a new question.\n\n"
     
@@ -112,7 +122,7 @@ def generate_five_shot_prompt(question_data: dict, examples: list) -> str:
     prompt += "Now, please answer this new question:\n\n"
     prompt += f"Conversation Transcript:\n{question_data.get('CONVERSATION', '')}\n\n"
     
-    q = question_data['questions'][0]  # Get the first question for this example
+    q = question_data['questions'][q_idx]
     prompt += f"Question: {q['Question']}\n\n"
     
     # Add options
@@ -125,7 +135,7 @@ def generate_five_shot_prompt(question_data: dict, examples: list) -> str:
     
     return prompt
 
-def generate_cot_prompt(question_data: dict) -> str:
+def generate_cot_prompt(question_data: dict, q_idx: int = 0) -> str:
     """Generate a prompt that encourages step-by-step reasoning."""
     prompt = "Please solve the following TOEFL listening question using step-by-step reasoning.\n\n"
     
@@ -133,7 +143,7 @@ def generate_cot_prompt(question_data: dict) -> str:
     prompt += f"Conversation Transcript:\n{question_data.get('CONVERSATION', '')}\n\n"
     
     # Add question
-    q = question_data['questions'][0]  # Get the first question for this example
+    q = question_data['questions'][q_idx]
     prompt += f"Question: {q['Question']}\n\n"
     
     # Add options
@@ -151,50 +161,81 @@ def generate_cot_prompt(question_data: dict) -> str:
     
     return prompt
 
-def process_question(question_data, index, question_index, model_name, strategy, args, client, pool=None):
-    """Process a single question and return the result."""
-    q = question_data['questions'][question_index]
-    question_id = f"{question_data['NO']}-{question_index+1}"
-    correct_answer = q['Answer'].strip()
+def generate_packed_prompt(question_data: dict, q_indexes: list, strategy: str, examples: list = None) -> str:
+    """Generate one prompt with the conversation transcript and all of its questions, answered by number."""
+    if strategy == "five-shot":
+        prompt = "I'll show you five examples of TOEFL listening questions and their answers, then ask you new questions.\n\n"
+        for i, example in enumerate(examples or [], 1):
+            prompt += f"Example {i}:\n"
+            prompt += f"Conversation (excerpt):\n{example['CONVERSATION'][:200]}...\n\n"
+            q = example['questions'][0]
+            prompt += f"Question: {q['Question']}\n"
+            prompt += "Options:\n"
+            for letter, text in q['Options'].items():
+                prompt += f"{letter}: {text}\n"
+            prompt += f"Answer: {q['Answer']}\n\n"
+        prompt += "Now, please answer these new questions:\n\n"
+    elif strategy == "chain-of-thought":
+        prompt = "Please solve the following TOEFL listening questions using step-by-step reasoning.\n\n"
+    else:
+        prompt = "Please answer the following TOEFL listening questions based on the provided conversation transcript.\n\n"
     
-    # Generate appropriate prompt based on strategy
+    prompt += f"Conversation Transcript:\n{question_data.get('CONVERSATION', '')}\n\n"
+    questions = [question_data['questions'][q_idx] for q_idx in q_indexes]
+    prompt += format_questions([(q['Question'], q['Options']) for q in questions])
+    prompt += answer_instructions(len(questions), reasoning=strategy == "chain-of-thought")
+    return prompt
+
+def build_prompt(question_data, strategy, q_idx=0, examples=None):
+    """Generate the prompt for one question of a conversation under a strategy."""
     if strategy == "zero-shot":
-        prompt = generate_zero_shot_prompt(question_data)
+        return generate_zero_shot_prompt(question_data, q_idx)
     elif strategy == "five-shot":
-        examples = random.sample(pool, min(5, len(pool))) if pool else []
-        prompt = generate_five_shot_prompt(question_data, examples)
+        return generate_five_shot_prompt(question_data, examples or [], q_idx)
     else:  # chain-of-thought
-        prompt = generate_cot_prompt(question_data)
-    
-    # Call model with retries
-    resp = None
-    for attempt in range(1, MAX_RETRIES+1):
-        try:
-            t0 = time.time()
-            content = client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                timeout=args.timeout,
-                temperature=args.temp
-            ).choices[0].message.content.strip()
-            rt = round(time.time() - t0, 2)
-            
-            # Check for rate limiting
-            if RATE_LIMIT_KEYWORD in content:
-                print(f"  [Attempt {attempt}/{MAX_RETRIES}] Rate limit detected, waiting 120s...")
-                time.sleep(120)
-                continue
-                
-            # Print full response in verbose mode
-            if args.verbose:
-                print(f"Full response:\n{content}\n")
-                
-            resp = content
-            break
-        except Exception as e:
-            print(f"  [Attempt {attempt}/{MAX_RETRIES}] Error: {e}")
-            time.sleep(5)
-    else:
+        return generate_cot_prompt(question_data, q_idx)
+
+def build_packed_prompt(members):
+    """One prompt for all the work items of a conversation; five-shot reuses its first question's examples."""
+    meta = members[0].meta
+    return generate_packed_prompt(meta["conversation"], [member.meta["question_index"] for member in members],
+                                  members[0].strategy, meta["examples"])
+
+def build_work_items(conversations, args):
+    """
+    One engine work item per (model, strategy, conversation, question), in
+    the order the results are reported; five-shot examples are sampled here,
+    in the same order the sequential loop used to draw them.
+    """
+    items = []
+    for model_name in args.models:
+        for strat in args.strategies:
+            for i, conversation in enumerate(conversations):
+                questions_in_conv = min(len(conversation['questions']), args.questions_per_test)
+                for q_idx in range(questions_in_conv):
+                    examples = random.sample(conversations, min(5, len(conversations))) if strat == "five-shot" else None
+                    prompt = build_prompt(conversation, strat, q_idx, examples)
+                    question_id = f"{conversation['NO']}-{q_idx+1}"
+                    items.append(WorkItem(
+                        model=model_name,
+                        strategy=strat,
+                        key=question_id,
+                        messages=user_message(prompt),
+                        params={"timeout": args.timeout, "temperature": args.temp},
+                        meta={"index": i, "question_index": q_idx, "conversation": conversation, "examples": examples}
+                    ))
+    return items
+
+def grade_completion(completion, args):
+    """Extract and grade a finished call; returns the per-question result."""
+    meta = completion.item.meta
+    question_data = meta["conversation"]
+    index = meta["index"]
+    q = question_data['questions'][meta["question_index"]]
+    question_id = completion.item.key
+    correct_answer = q['Answer'].strip()
+    
+    if not completion.ok:
         # All retries failed
         print(f"  Question {question_id} failed after multiple retries, skipping\n")
         return {
@@ -204,9 +245,17 @@ def process_question(question_data, index, question_index, model_name, strategy,
             "correct_answer": correct_answer,
             "model_answer": None,
             "is_correct": False,
-            "error": "rate_limited"
+            "error": "rate_limited",
+            **packed_fields(completion)
         }
     
+    resp = completion.response
+    rt = completion.runtime
+    
+    # Print full response in verbose mode
+    if args.verbose:
+        print(f"Full response:\n{resp}\n")
+    
     # Extract and evaluate answer
     model_answer = extract_answer(resp)
     is_correct = is_correct_answer(model_answer, correct_answer)
@@ -223,9 +272,71 @@ def process_question(question_data, index, question_index, model_name, strategy,
         "model_answer": model_answer,
         "model_full_response": resp[:500] if args.verbose else "",
         "is_correct": is_correct,
-        "runtime": rt
+        "runtime": rt,
+        **packed_fields(completion)
     }
 
+def answer_outcome(completion):
+    """Whether a finished call answered correctly, or None if it errored (no printing, for the parity report)"""
+    if not completion.ok:
+        return None
+    q = completion.item.meta["conversation"]['questions'][completion.item.meta["question_index"]]
+    return is_correct_answer(extract_answer(completion.response), q['Answer'].strip())
+
+def run_questions(client, limiter, items, args):
+    """
+    Run the per-question items, packed one call per conversation with
+    --packed; with --parity the other mode runs too and the two are compared
+    question by question.  Returns the completions of the chosen mode.
+    """
+    if not (args.packed or args.parity):
+        return run_items_scheduled(client, limiter, items, args)
+    
+    packed_items = pack_items(items, lambda item: item.meta["index"], build_packed_prompt)
+    if not args.parity:
+        return unpack_completions(run_items_scheduled(client, limiter, packed_items, args))
+    
+    completions = run_items_scheduled(client, limiter, items + packed_items, args)
+    unpacked, packed = completions[:len(items)], unpack_completions(completions[len(items):])
+    rows = parity_rows(
+        {(c.item.model, c.item.strategy, c.item.key): answer_outcome(c) for c in unpacked},
+        {(c.item.model, c.item.strategy, c.item.key): answer_outcome(c) for c in packed}
+    )
+    print(format_parity(rows, request_savings(items, packed_items)))
+    os.makedirs(args.output, exist_ok=True)
+    parity_path = os.path.join(args.output, f"toefl_listening_parity_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    print(f"Packed/unpacked parity written to {write_parity_csv(rows, parity_path)}")
+    return packed if args.packed else unpacked
+
+def run_items_scheduled(client, limiter, items, args):
+    """Send every call through the shared engine, interleaving models per --schedule"""
+    scheduler = None
+    if args.schedule != "fifo":
+        scheduler = PriorityScheduler(LatencyHistory.load(), policy=args.schedule, deadline=args.deadline)
+    
+    print(f"\nRunning {len(items)} model calls with up to {args.concurrency} in flight ({args.schedule} schedule)")
+    done = [0]
+    
+    def report_progress(completion):
+        done[0] += 1
+        status = f"{completion.runtime}s" if completion.ok else f"error: {completion.error}"
+        print(f"  [{done[0]}/{len(items)}] {completion.item.model} / {completion.item.strategy} / {completion.item.key} ({status})")
+    
+    completions = run_items(
+        client, items,
+        max_in_flight=args.concurrency,
+        on_complete=report_progress,
+        limiter=limiter,
+        max_retries=MAX_RETRIES,
+        scheduler=scheduler
+    )
+    if scheduler is not None:
+        print(scheduler.format_report())
+        os.makedirs(args.output, exist_ok=True)
+        schedule_path = os.path.join(args.output, f"toefl_listening_schedule_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        print(f"Per-call schedule written to {scheduler.write_csv(schedule_path)}")
+    return completions
+
 def main():
     parser = argparse.ArgumentParser(
         description="Evaluate LLM on TOEFL listening comprehension questions"
@@ -264,6 +375,32 @@ def main():
         "--verbose", action="store_true",
         help="Enable verbose output with full model responses"
     )
+    parser.add_argument(
+        "--rpm", type=float, default=0,
+        help="Requests per minute allowed per model (0 = no cap, cooldowns still apply)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=32,
+        help="Maximum number of model calls in flight at once"
+    )
+    parser.add_argument(
+        "--schedule", choices=["fair", "sjf", "fifo"], default="fair",
+        help="Order of calls: fair share per model with shortest expected first (fair), "
+             "shortest expected first (sjf), or model/strategy/conversation order (fifo)"
+    )
+    parser.add_argument(
+        "--deadline", type=float, default=None,
+        help="Seconds into the run; calls expected to finish after it wait until nothing that can still make it is left"
+    )
+    parser.add_argument(
+        "--packed", action="store_true",
+        help="Send each conversation's questions in one call with numbered answers instead of one call per question"
+    )
+    parser.add_argument(
+        "--parity", action="store_true",
+        help="Run both the packed and the per-question requests and report how often they grade the same "
+             "(the result files hold the --packed mode's answers)"
+    )
     args = parser.parse_args()
 
     # Create output directory if it doesn't exist
@@ -271,6 +408,7 @@ def main():
     
     # Initialize client
     client = Client()
+    limiter = RateLimiter(default_rpm=args.rpm)
 
     # Load questions
     print(f"Loading questions from {args.input}")
@@ -288,6 +426,9 @@ def main():
         conversations = random.sample(conversations, args.questions_per_test)
         print(f"Sampled {len(conversations)} conversations for testing")
 
+    # Every call is sent up front; the results are then graded in the original order
+    completions = iter(run_questions(client, limiter, build_work_items(conversations, args), args))
+
     # Store all results
     all_results = {}
 
@@ -327,16 +468,7 @@ def main():
                 questions_in_conv = min(len(conversation['questions']), args.questions_per_test)
                 
                 for q_idx in range(questions_in_conv):
-                    result = process_question(
-                        conversation, 
-                        i, 
-                        q_idx, 
-                        model_name, 
-                        strat, 
-                        args, 
-                        client,
-                        pool=conversations if strat == "five-shot" else None
-                    )
+                    result = grade_completion(next(completions), args)
                     
                     # Update statistics
                     stats["total"] += 1
@@ -419,6 +551,7 @@ def main():
                     f.write("\n")
     
     print(f"CSV summary saved to {csv_path}")
+    print(limiter.format_report())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
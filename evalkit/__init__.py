@@ -0,0 +1,82 @@
+"""
+Shared evaluation infrastructure for the exam drivers.
+
+Drivers add the repository root to ``sys.path`` and import from here instead
+of copy-pasting the call/grade/aggregate loop into every script.
+
+The names below are resolved on first access, so ``import evalkit`` (and the
+``from evalkit.x import ...`` lines at the top of every driver) only loads the
+submodules a script actually uses.
+"""
+
+import importlib
+
+# name -> submodule that defines it
+_EXPORTS = {
+    "RuntimeAggregator": "aggregate",
+    "aggregate_runtimes": "aggregate",
+    "CachedClient": "cache",
+    "CacheMiss": "cache",
+    "ResponseCache": "cache",
+    "AdaptiveClient": "concurrency",
+    "AdaptiveConcurrency": "concurrency",
+    "Question": "datasets",
+    "load_questions": "datasets",
+    "open_dataset": "datasets",
+    "Completion": "engine",
+    "WorkItem": "engine",
+    "completions_from_journal": "engine",
+    "run_items": "engine",
+    "run_items_async": "engine",
+    "user_message": "engine",
+    "Journal": "journal",
+    "compact_journal": "journal",
+    "RateLimiter": "ratelimit",
+    "RateLimitError": "ratelimit",
+    "ResultRecord": "records",
+    "ResultTable": "records",
+    "dump_json": "records",
+    "WorkQueue": "workqueue",
+    "run_worker": "workqueue",
+}
+
+__all__ = [
+    "AdaptiveClient",
+    "AdaptiveConcurrency",
+    "CacheMiss",
+    "CachedClient",
+    "Completion",
+    "Journal",
+    "Question",
+    "RateLimitError",
+    "RateLimiter",
+    "ResponseCache",
+    "ResultRecord",
+    "ResultTable",
+    "RuntimeAggregator",
+    "WorkItem",
+    "WorkQueue",
+    "aggregate_runtimes",
+    "compact_journal",
+    "completions_from_journal",
+    "dump_json",
+    "load_questions",
+    "open_dataset",
+    "run_items",
+    "run_items_async",
+    "run_worker",
+    "user_message",
+]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'evalkit' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
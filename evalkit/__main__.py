@@ -0,0 +1,401 @@
+"""
+Command-line entry point for the shared tooling: ``python -m evalkit <command>``.
+
+Each command imports what it needs when it runs, so ``--help`` and the light
+commands do not load the engine, NumPy or g4f.
+"""
+
+import argparse
+import os
+import runpy
+import sys
+
+# Spelled out rather than imported so building the parser stays import-free
+CACHE_DEFAULT = "($EVALKIT_CACHE or .cache/llm_responses.sqlite)"
+
+
+def cache_command(args):
+    from .cache import DEFAULT_CACHE_PATH, ResponseCache
+
+    cache = ResponseCache(
+        args.cache or DEFAULT_CACHE_PATH,
+        max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None,
+        max_age=args.max_age_days * 86400 if args.max_age_days is not None else None
+    )
+    if args.action == "prune":
+        print(f"Evicted {cache.evict()} entries")
+    stats = cache.summary()
+    print(f"{stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB in {cache.path}")
+    cache.close()
+
+
+def datasets_command(args):
+    from .datasets import open_dataset
+
+    for path in args.paths:
+        dataset = open_dataset(path, refresh=args.refresh)
+        print(f"{path}: {len(dataset)} questions")
+        for value, count in dataset.groups(args.by).items():
+            if value is not None:
+                print(f"    {value}: {count}")
+
+
+def runtimes_command(args):
+    from .aggregate import aggregate_runtimes
+
+    aggregate_runtimes(args.root, args.output, extended=args.extended, combined=args.combined,
+                       columnar=args.npz, refresh=args.refresh)
+
+
+def stats_command(args):
+    from .columnar import ColumnarResults
+
+    results = ColumnarResults.load(args.store)
+    if args.where:
+        results = results.select(results.mask(**dict(item.split("=", 1) for item in args.where)))
+    stats = results.group_stats(by=args.by, percentiles=args.percentiles)
+    if args.output:
+        stats.write_csv(args.output)
+        print(f"Wrote {len(stats)} groups to {args.output}")
+        return
+    for row in stats.rows():
+        print(", ".join(
+            f"{name}={value:.4g}" if isinstance(value, float) else f"{name}={value}" for name, value in row.items()
+        ))
+
+
+def significance_command(args):
+    from .stats import Outcomes, write_rows
+
+    outcomes = Outcomes.from_result_files(args.results)
+    intervals = outcomes.intervals(by=args.by, replicates=args.replicates, confidence=args.confidence, seed=args.seed)
+    comparisons = outcomes.compare(args.compare, within=args.within, replicates=args.replicates,
+                                   confidence=args.confidence, seed=args.seed)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        write_rows(intervals, os.path.join(args.output, "accuracy_intervals.csv"))
+        write_rows(comparisons, os.path.join(args.output, f"{args.compare}_comparisons.csv"))
+        print(f"Wrote {len(intervals)} intervals and {len(comparisons)} comparisons to {args.output}")
+        return
+    for row in intervals:
+        label = " / ".join(str(row[name]) for name in args.by)
+        print(f"{label}: {row['accuracy']:.1%} [{row['low']:.1%}, {row['high']:.1%}] (n={row['total']})")
+    for row in comparisons:
+        label = " / ".join(str(row[name]) for name in args.within)
+        print(f"{label}: {row['a']} vs {row['b']}: {row['difference']:+.1%} "
+              f"[{row['low']:+.1%}, {row['high']:+.1%}], McNemar p={row['p_value']:.3g} (n={row['shared']})")
+
+
+def irt_command(args):
+    from .irt import ItemBank, default_bank_path, format_simulation, load_responses, simulate
+
+    responses = load_responses(args.results, model_from=args.model_from)
+    labels = None
+    if args.dataset:
+        from .datasets import open_dataset
+        labels = {question.qid: question.difficulty for question in open_dataset(args.dataset).all()}
+    bank = ItemBank.calibrate(responses, labels, model=args.model)
+    print(bank.format_report())
+    output = args.output or (default_bank_path(args.dataset) if args.dataset else None)
+    if output:
+        print(f"Item bank saved to {bank.save(output)}")
+    if args.simulate:
+        print(format_simulation(simulate(responses, labels, model=args.model, target_se=args.target_se,
+                                         max_items=args.max_items)))
+
+
+def queue_command(args):
+    from .workqueue import DEFAULT_QUEUE_PATH, WorkQueue, run_worker
+
+    queue = WorkQueue(args.queue or DEFAULT_QUEUE_PATH)
+    if args.action == "work":
+        from g4f.client import Client
+
+        from .cache import DEFAULT_CACHE_PATH, CachedClient, ResponseCache
+        from .ratelimit import RateLimiter
+
+        cache = None if args.no_cache else ResponseCache(args.cache or DEFAULT_CACHE_PATH)
+        client = Client() if cache is None else CachedClient(Client(), cache)
+        limiter = RateLimiter(default_rpm=args.rpm)
+
+        def report(task, runtime, error):
+            status = f"{runtime}s" if error is None else f"error: {error}"
+            print(f"  {task.dataset} / {task.item.model} / {task.item.strategy} / {task.item.key} ({status})")
+
+        done = run_worker(queue, client, node=args.node, threads=args.threads, lease_seconds=args.lease,
+                          limiter=limiter, idle_exit=args.idle_exit, on_complete=report)
+        print(f"Completed {done} tasks")
+        print(limiter.format_report())
+        if cache is not None:
+            print(cache.format_report())
+            cache.close()
+    elif args.action == "requeue":
+        print(f"Requeued {queue.requeue(args.dataset)} failed tasks")
+    print(queue.format_report())
+    queue.close()
+
+
+def plan_command(args):
+    from .cache import DEFAULT_CACHE_PATH, CachedClient, ResponseCache
+    from .concurrency import AdaptiveConcurrency
+    from .journal import Journal, compact_journal
+    from .plan import default_journal_path, format_plan, load_plans, prepare, run_plan
+    from .ratelimit import RateLimiter
+
+    cells, seed = load_plans(args.plans)
+    calls = prepare(cells, seed=seed if args.seed is None else args.seed)
+    print(format_plan(cells, calls))
+    if args.dry_run:
+        from .estimate import LatencyHistory, SweepEstimate
+
+        estimate = SweepEstimate.from_items(calls.values(), LatencyHistory.load())
+        print(estimate.format_report(concurrency=args.concurrency, rpm=args.rpm))
+        return
+    if args.resume:
+        journal = Journal(args.resume, resume=True)
+        print(f"Resuming from {args.resume} ({len(journal)} results already journaled)")
+    else:
+        journal = Journal(args.journal or default_journal_path(args.plans[0]))
+        journal.write_header(plans=[os.path.abspath(path) for path in args.plans], seed=seed)
+        print(f"Journaling results to {journal.path}")
+
+    from g4f.client import Client
+
+    cache = None if args.no_cache else ResponseCache(args.cache or DEFAULT_CACHE_PATH, replay_only=args.replay_only)
+    client = Client() if cache is None else CachedClient(Client(), cache)
+    limiter = RateLimiter(default_rpm=args.rpm)
+    concurrency = None
+    if args.adaptive:
+        concurrency = AdaptiveConcurrency(
+            initial=min(4, args.concurrency),
+            maximum=args.concurrency,
+            log_path=os.path.splitext(journal.path)[0] + ".concurrency.jsonl"
+        )
+
+    to_run = sum(1 for item in calls.values() if not journal.is_done(item.model, item.strategy, item.key))
+    print(f"\nRunning {to_run} model calls with up to {args.concurrency} in flight "
+          f"({len(calls) - to_run} restored from journal)")
+    done = [0]
+
+    def report_progress(completion):
+        done[0] += 1
+        status = f"{completion.runtime}s" if completion.ok else f"error: {completion.error}"
+        print(f"  [{done[0]}/{to_run}] {completion.item.model} / {completion.item.strategy} ({status})")
+
+    run_plan(cells, calls, client, journal, max_in_flight=args.concurrency, limiter=limiter,
+             max_retries=args.max_retries, concurrency=concurrency, on_complete=report_progress)
+    print(f"Raw responses kept in {compact_journal(journal.path)}")
+    print(limiter.format_report())
+    if concurrency is not None:
+        print(concurrency.format_report())
+    if cache is not None:
+        print(cache.format_report())
+        cache.close()
+
+
+def importtime_command(args):
+    from .importtime import ENTRY_POINTS, benchmark, check, format_report, load_baseline, save_baseline
+
+    entry_points = {name: ENTRY_POINTS[name] for name in args.entry_points} if args.entry_points else None
+    results = benchmark(entry_points, repeat=args.repeat)
+    print(format_report(results))
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.check:
+        baseline = load_baseline(args.baseline) if args.baseline else None
+        problems = check(results, budget_ms=args.budget_ms, baseline=baseline, tolerance=args.tolerance)
+        for problem in problems:
+            print(f"FAIL {problem}")
+        if problems:
+            sys.exit(1)
+        print("Import-time check passed")
+
+
+def promptbench_command(args):
+    from .promptbench import benchmark, changed, format_report, load_baseline, save_baseline
+
+    results = benchmark(args.drivers or None, repeat=args.repeat)
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    print(format_report(results, baseline))
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+        print(f"Baseline saved to {args.save_baseline}")
+    if baseline and changed(results, baseline):
+        print(f"FAIL prompts differ from the baseline for: {', '.join(changed(results, baseline))}")
+        sys.exit(1)
+
+
+def rescore_command(args):
+    # Each journal is replayed through the driver's own grading and report code
+    driver = os.path.abspath(args.driver)
+    for journal_path in args.journals:
+        argv = [driver, "--rescore", os.path.abspath(journal_path)]
+        if args.output:
+            argv += ["--output", args.output]
+        saved_argv = sys.argv
+        sys.argv = argv
+        try:
+            runpy.run_path(driver, run_name="__main__")
+        finally:
+            sys.argv = saved_argv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m evalkit", description="Shared evaluation tooling")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cache_parser = commands.add_parser("cache", help="Inspect or prune the shared LLM response cache")
+    cache_parser.add_argument("action", choices=["stats", "prune"])
+    cache_parser.add_argument("--cache", default=None, help=f"Path to the cache database {CACHE_DEFAULT}")
+    cache_parser.add_argument("--max_mb", type=float, default=None,
+                              help="Evict least recently used entries above this size")
+    cache_parser.add_argument("--max_age_days", type=float, default=None, help="Evict entries older than this")
+    cache_parser.set_defaults(func=cache_command)
+
+    datasets_parser = commands.add_parser("datasets", help="Build or refresh the question index and show its groups")
+    datasets_parser.add_argument("paths", nargs="+", help="Question files to index")
+    datasets_parser.add_argument("--by", default="skill", help="Indexed field to summarize (skill, difficulty, question_type, ...)")
+    datasets_parser.add_argument("--refresh", action="store_true", help="Re-parse even if the files did not change")
+    datasets_parser.set_defaults(func=datasets_command)
+
+    significance_parser = commands.add_parser(
+        "significance", help="Bootstrap accuracy intervals and paired McNemar tests from result JSON files"
+    )
+    significance_parser.add_argument("results", nargs="+", help="Result files ({model: {strategy: {details}}})")
+    significance_parser.add_argument("--by", nargs="*", default=["model", "strategy", "skill"],
+                                     help="Cells to report intervals for (model, strategy, skill, difficulty)")
+    significance_parser.add_argument("--compare", default="model", choices=["model", "strategy"],
+                                     help="Field whose values are compared pairwise")
+    significance_parser.add_argument("--within", nargs="*", default=["strategy"],
+                                     help="Fields held fixed in each comparison")
+    significance_parser.add_argument("--replicates", type=int, default=2000)
+    significance_parser.add_argument("--confidence", type=float, default=0.95)
+    significance_parser.add_argument("--seed", type=int, default=0)
+    significance_parser.add_argument("--output", default=None, help="Directory for the CSV reports")
+    significance_parser.set_defaults(func=significance_command)
+
+    irt_parser = commands.add_parser(
+        "irt", help="Fit item response theory parameters for a question bank from past result files"
+    )
+    irt_parser.add_argument("results", nargs="+", help="Result files with per-question correctness")
+    irt_parser.add_argument("--model_from", choices=["key", "file"], default="key",
+                            help="Take the model from the top-level key ({model: {strategy: ...}}) or the file name "
+                                 "({group: {strategy: ...}}, as in GMAT/Quant/*_result.json)")
+    irt_parser.add_argument("--dataset", default=None,
+                            help="Question file whose difficulty labels set the difficulty priors (and the default bank path)")
+    irt_parser.add_argument("--model", choices=["1pl", "2pl"], default="2pl", help="Rasch (1pl) or two-parameter logistic")
+    irt_parser.add_argument("--output", default=None, help="Bank JSON to write (default: .cache/irt/<dataset>.json)")
+    irt_parser.add_argument("--simulate", action="store_true",
+                            help="Replay adaptive tests on the recorded answers, each model against a bank calibrated "
+                                 "without it, and compare with the full sweeps")
+    irt_parser.add_argument("--target_se", type=float, default=0.3, help="With --simulate, ability standard error to stop at")
+    irt_parser.add_argument("--max_items", type=int, default=30, help="With --simulate, questions per test at most")
+    irt_parser.set_defaults(func=irt_command)
+
+    queue_parser = commands.add_parser(
+        "queue", help="Run, inspect or requeue tasks of a shared multi-node work queue"
+    )
+    queue_parser.add_argument("action", choices=["work", "status", "requeue"],
+                              help="work: lease and run tasks; status: task counts and per-node throughput; "
+                                   "requeue: retry failed tasks")
+    queue_parser.add_argument("queue", nargs="?", default=None,
+                              help="Path to the queue database ($EVALKIT_QUEUE or .cache/work_queue.sqlite)")
+    queue_parser.add_argument("--node", default=None, help="Name reported for this machine (default: hostname)")
+    queue_parser.add_argument("--threads", type=int, default=4, help="Calls this worker keeps in flight")
+    queue_parser.add_argument("--lease", type=float, default=300.0,
+                              help="Seconds a task stays leased without a heartbeat before it is handed out again")
+    queue_parser.add_argument("--idle_exit", type=float, default=60.0,
+                              help="Stop after the queue has been empty this long")
+    queue_parser.add_argument("--rpm", type=float, default=0, help="Requests per minute allowed per model")
+    queue_parser.add_argument("--cache", default=None, help=f"Response cache used by the worker {CACHE_DEFAULT}")
+    queue_parser.add_argument("--no_cache", action="store_true", help="Always call the models")
+    queue_parser.add_argument("--dataset", default=None, help="Only requeue this dataset's failed tasks")
+    queue_parser.set_defaults(func=queue_command)
+
+    plan_parser = commands.add_parser(
+        "plan", help="Run every (dataset, model, strategy, sample size) cell of one or more plan files in one process"
+    )
+    plan_parser.add_argument("plans", nargs="+", help="Plan JSON files; cells shared between them are run once")
+    plan_parser.add_argument("--concurrency", type=int, default=32, help="Maximum number of model calls in flight")
+    plan_parser.add_argument("--adaptive", action="store_true",
+                             help="Adapt each model's calls in flight (up to --concurrency) to its latency and error rate")
+    plan_parser.add_argument("--max_retries", type=int, default=3,
+                             help="Attempts per call when it errors or is rate limited")
+    plan_parser.add_argument("--rpm", type=float, default=0, help="Requests per minute allowed per model")
+    plan_parser.add_argument("--seed", type=int, default=None, help="Sampling seed (overrides the plan's)")
+    plan_parser.add_argument("--journal", default=None,
+                             help="Journal path (default: plan_journal_<time>.jsonl next to the first plan)")
+    plan_parser.add_argument("--resume", metavar="JOURNAL",
+                             help="Continue an interrupted plan run; needs the same plans and seed")
+    plan_parser.add_argument("--cache", default=None, help=f"Response cache shared by all drivers {CACHE_DEFAULT}")
+    plan_parser.add_argument("--no_cache", action="store_true", help="Always call the models, bypassing the cache")
+    plan_parser.add_argument("--replay_only", action="store_true",
+                             help="Serve every call from the cache and report misses as errors")
+    plan_parser.add_argument("--dry_run", action="store_true",
+                             help="Build every prompt and print calls, tokens and a predicted schedule without calling any model")
+    plan_parser.set_defaults(func=plan_command)
+
+    importtime_parser = commands.add_parser(
+        "importtime", help="Benchmark the entry points' start-up imports (python -X importtime) and flag regressions"
+    )
+    importtime_parser.add_argument("entry_points", nargs="*",
+                                   help="Entry points to profile (default: all of evalkit.importtime.ENTRY_POINTS)")
+    importtime_parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point; the fastest is kept")
+    importtime_parser.add_argument("--check", action="store_true",
+                                   help="Exit 1 if an entry point fails, loads a heavy package or exceeds its budget")
+    importtime_parser.add_argument("--budget_ms", type=float, default=None, help="Import time allowed per entry point")
+    importtime_parser.add_argument("--baseline", default=None, help="JSON of per-entry-point import times to compare with")
+    importtime_parser.add_argument("--tolerance", type=float, default=0.5,
+                                   help="Allowed slowdown over the baseline (0.5 = 50%%)")
+    importtime_parser.add_argument("--save_baseline", default=None, help="Write this run's import times as a baseline")
+    importtime_parser.set_defaults(func=importtime_command)
+
+    promptbench_parser = commands.add_parser(
+        "promptbench", help="Time each driver's prompt builders per prompt and check the prompts did not change"
+    )
+    promptbench_parser.add_argument("drivers", nargs="*",
+                                    help="Drivers to time (default: all of evalkit.promptbench.DRIVERS)")
+    promptbench_parser.add_argument("--repeat", type=int, default=5, help="Warm passes per driver; the fastest is kept")
+    promptbench_parser.add_argument("--baseline", default=None,
+                                    help="JSON of an earlier run to compare timings and prompt digests with")
+    promptbench_parser.add_argument("--save_baseline", default=None, help="Write this run's timings and digests as a baseline")
+    promptbench_parser.set_defaults(func=promptbench_command)
+
+    rescore_parser = commands.add_parser(
+        "rescore", help="Re-grade journaled raw responses with a driver's current extractor, without model calls"
+    )
+    rescore_parser.add_argument("driver", help="Driver script that produced the journals, e.g. SAT/Craft_and_Structure/C_S_GPT-4o.py")
+    rescore_parser.add_argument("journals", nargs="+", help="Journal files (.jsonl or .jsonl.gz) to rescore")
+    rescore_parser.add_argument("--output", default=None, help="Output directory for the regenerated result files")
+    rescore_parser.set_defaults(func=rescore_command)
+
+    runtimes_parser = commands.add_parser(
+        "runtimes", help="Aggregate per-model runtime CSVs from a tree of result files, re-reading only what changed"
+    )
+    runtimes_parser.add_argument("root", help="Folder of result files, e.g. SAT or GMAT/Verbal")
+    runtimes_parser.add_argument("output", help="Output folder, e.g. runtime_sat")
+    runtimes_parser.add_argument("--extended", action="store_true",
+                                 help="Also read flat question lists and question_id/expected/correct fields")
+    runtimes_parser.add_argument("--combined", action="store_true",
+                                 help="Also write all_results.csv and runtime_statistics.csv over every model")
+    runtimes_parser.add_argument("--npz", action="store_true",
+                                 help="Also write results.npz and latency_statistics.csv (needs NumPy)")
+    runtimes_parser.add_argument("--refresh", action="store_true", help="Re-read every file and rewrite every CSV")
+    runtimes_parser.set_defaults(func=runtimes_command)
+
+    stats_parser = commands.add_parser("stats", help="Group-by latency percentiles and accuracy from a results.npz")
+    stats_parser.add_argument("store", help="results.npz written by the runtimes command")
+    stats_parser.add_argument("--by", nargs="*", default=["model", "strategy"],
+                              help="Columns to group by: model, strategy, subject, difficulty, status")
+    stats_parser.add_argument("--where", nargs="*", default=[], help="Filters such as model=gpt-4o")
+    stats_parser.add_argument("--percentiles", nargs="*", type=float, default=[50, 90, 99])
+    stats_parser.add_argument("--output", default=None, help="Write the table to this CSV instead of printing it")
+    stats_parser.set_defaults(func=stats_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
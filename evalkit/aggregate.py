@@ -0,0 +1,611 @@
+"""
+Incremental runtime aggregation over a tree of result files.
+
+``runtime_GMAT``, ``runtime_sat`` and ``runtime_tofel`` each had their own copy
+of a script that walked an exam folder, ``json.load``-ed every result file,
+kept every graded question as a dict in per-bucket lists and then computed
+avg/min/max with list comprehensions -- all of it again on every run.
+
+``aggregate_runtimes`` does the same job once for any tree.  Each result file
+is read with a small streaming JSON reader that only materializes the
+``details`` entries, and what a file contributes (its CSV rows plus running
+count/sum/min/max per (model, strategy, status)) is kept in a SQLite state
+file under ``.cache/``.  On the next run a file is only re-read if its size or
+mtime moved and its SHA-256 actually changed, and only the models whose rows
+changed get their CSVs rewritten, so regenerating the outputs after one new
+run is near-instant.
+
+    python -m evalkit runtimes SAT runtime_sat --combined
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STATE_PATH = os.environ.get(
+    "EVALKIT_RUNTIME_STATE", os.path.join(REPO_ROOT, ".cache", "runtime_aggregate.sqlite")
+)
+
+# Bump when the row extraction changes so every file is re-read once
+STATE_VERSION = 1
+
+STRATEGIES = ("zero-shot", "five-shot", "chain-of-thought")
+STATUSES = ("correct", "incorrect")
+
+DETAIL_HEADER = ["Strategy", "Subject", "Question_Number", "Difficulty",
+                 "Runtime", "Status", "Question", "Correct_Answer", "Model_Answer"]
+STATS_HEADER = ["Strategy", "Status", "Avg_Runtime", "Min_Runtime", "Max_Runtime", "Count"]
+
+# Runtime columns are declared without a type so SQLite keeps 0 and 0.0 apart,
+# exactly as the CSVs print them
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    scope TEXT NOT NULL,
+    path TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (scope, path)
+);
+CREATE TABLE IF NOT EXISTS models (
+    scope TEXT NOT NULL,
+    path TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    PRIMARY KEY (scope, path, pos)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    scope TEXT NOT NULL,
+    path TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    status TEXT NOT NULL,
+    subject TEXT,
+    number TEXT,
+    difficulty TEXT,
+    runtime,
+    question TEXT,
+    correct_answer TEXT,
+    model_answer TEXT,
+    PRIMARY KEY (scope, path, seq)
+);
+CREATE INDEX IF NOT EXISTS rows_model ON rows (scope, model);
+CREATE TABLE IF NOT EXISTS stats (
+    scope TEXT NOT NULL,
+    path TEXT NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min,
+    max,
+    PRIMARY KEY (scope, path, model, strategy, status)
+);
+"""
+
+
+class RunningStats:
+    """Count, sum, min and max of the runtimes seen so far in one bucket."""
+
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self, count=0, total=0.0, min=None, max=None):
+        self.count = count
+        self.total = total
+        self.min = min
+        self.max = max
+
+    def add(self, value):
+        if not isinstance(value, (int, float)):
+            return
+        # Strict comparisons keep the first of equal values, like min()/max()
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.total += value
+        self.count += 1
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0 or other.min < self.min:
+            self.min = other.min
+        if self.count == 0 or other.max > self.max:
+            self.max = other.max
+        self.total += other.total
+        self.count += other.count
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+class _JSONStream:
+    """
+    Pull parser over a text file: containers are walked with ``members`` and
+    ``elements``, and only the values asked for are decoded.
+    """
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        if self._eof:
+            return False
+        chunk = self._f.read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ("" at EOF)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r}, found {found or 'end of file'!r}")
+        self._pos += 1
+
+    def value(self):
+        """Decode the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Value runs past the buffer: read at least as much again
+                if self._fill(max(self._chunk_size, len(self._buf))):
+                    continue
+                raise
+            if isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(self._buf, end) and self._fill():
+                continue  # the number may continue in the next chunk
+            self._pos = end
+            return value
+
+    def members(self):
+        """Yield the keys of the next object; the caller consumes each value."""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("}")
+            return
+
+    def elements(self):
+        """Yield once per element of the next array; the caller consumes it."""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("]")
+            return
+
+    def end(self):
+        if self.peek() != "":
+            raise ValueError("extra data after the top-level value")
+
+
+def _first(entry, keys, default):
+    for key in keys:
+        if key in entry:
+            return entry[key]
+    return default
+
+
+def _cell(value):
+    # What csv.writer prints for a value
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _FileRows:
+    """What one result file contributes: models in first-seen order and rows."""
+
+    def __init__(self):
+        self.models = []
+        self.rows = []
+        self.stats = {}
+
+    def model(self, name):
+        if name not in self.models:
+            self.models.append(name)
+
+    def add(self, model, strategy, is_correct, subject, number, difficulty, runtime,
+            question, correct_answer, model_answer):
+        status = "correct" if is_correct else "incorrect"
+        self.rows.append((model, strategy, status, _cell(subject), _cell(number), _cell(difficulty),
+                          runtime, _cell(question), _cell(correct_answer), _cell(model_answer)))
+        self.stats.setdefault((model, strategy, status), RunningStats()).add(runtime)
+
+
+def _read_detail(rows, model, strategy, subject, q, extended):
+    if extended:
+        number = _first(q, ("number", "question_id"), "N/A")
+        correct_answer = _first(q, ("correct_answer", "expected"), "")
+        model_answer = _first(q, ("model_answer", "model_response"), "")
+        if "is_correct" in q:
+            is_correct = bool(q["is_correct"])
+        elif "correct" in q:
+            is_correct = bool(q["correct"])
+        else:
+            is_correct = correct_answer == model_answer
+    else:
+        number = q.get("number", "N/A")
+        correct_answer = q.get("correct_answer", "")
+        model_answer = q.get("model_answer", "")
+        is_correct = q.get("is_correct", False)
+    rows.add(model, strategy, is_correct, subject, number, q.get("difficulty", "N/A"),
+             q.get("runtime", 0), q.get("question", ""), correct_answer, model_answer)
+
+
+def read_result_file(path, root_name, extended=False):
+    """
+    Stream one result file into its rows.
+
+    The usual shape is ``{model: {strategy: {"details": [...]}}}``.  With
+    ``extended`` the newer flat lists of graded questions are read too (model
+    and strategy come from the folder or file name, the subject from the
+    tree's root folder) along with their ``question_id``/``expected``/
+    ``correct`` field names.  Other shapes contribute nothing.
+    """
+    p = Path(path)
+    rows = _FileRows()
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        first = stream.peek()
+        if first == "{":
+            subject = p.stem.split("_results")[0]
+            for model in stream.members():
+                if stream.peek() != "{":
+                    stream.value()
+                    continue
+                rows.model(model)
+                for strategy in stream.members():
+                    if strategy not in STRATEGIES or stream.peek() != "{":
+                        stream.value()
+                        continue
+                    for key in stream.members():
+                        if key != "details" or stream.peek() != "[":
+                            stream.value()
+                            continue
+                        for _ in stream.elements():
+                            q = stream.value()
+                            if isinstance(q, dict):
+                                _read_detail(rows, model, strategy, subject, q, extended)
+        elif first == "[" and extended:
+            if p.parent.name in STRATEGIES:
+                strategy, model = p.parent.name, p.parent.parent.name
+            else:
+                parts = p.stem.split("_")
+                model, strategy = parts[0], parts[1] if len(parts) > 1 else "unknown"
+            if strategy not in STRATEGIES:
+                raise ValueError(f"unknown strategy {strategy!r}")
+            rows.model(model)
+            for _ in stream.elements():
+                q = stream.value()
+                if not isinstance(q, dict):
+                    continue
+                rows.add(model, strategy, q.get("correct", False), root_name,
+                         q.get("question_id", "N/A"), q.get("difficulty", "N/A"), q.get("runtime", 0), "",
+                         q.get("expected", ""), _first(q, ("model_answer", "model_response"), ""))
+        else:
+            print(f"Skipping {path}: top-level JSON is not a results dict")
+            stream.value()
+        stream.end()
+    return rows
+
+
+def find_result_files(directory):
+    """Result files under ``directory`` in ``os.walk`` order."""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            if name.endswith(".json") or (name.endswith(".txt") and "results" in name):
+                files.append(os.path.join(root, name))
+    return files
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _status_label(status):
+    return "Correct" if status == "correct" else "Incorrect"
+
+
+class RuntimeAggregator:
+    """
+    Runtime statistics for one result tree, kept up to date incrementally.
+
+    ``root`` is the folder to scan (``SAT``, ``TOFEL``, ``GMAT/Verbal``); the
+    state of every file seen under it lives in the SQLite file at
+    ``state_path``, so several trees can share it.
+    """
+
+    def __init__(self, root, extended=False, state_path=DEFAULT_STATE_PATH):
+        self.root = os.path.abspath(root)
+        self.extended = extended
+        self.scope = f"{self.root}|{'extended' if extended else 'details'}"
+        self.state_path = state_path
+        self.files = []
+        self.reread = 0
+        os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        self._db = sqlite3.connect(state_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _models_of(self, path):
+        return [model for (model,) in self._db.execute(
+            "SELECT model FROM models WHERE scope = ? AND path = ? ORDER BY pos", (self.scope, path)
+        )]
+
+    def _forget(self, path):
+        for table in ("files", "models", "rows", "stats"):
+            self._db.execute(f"DELETE FROM {table} WHERE scope = ? AND path = ?", (self.scope, path))
+
+    def _reread(self, path, stat, digest):
+        error = None
+        try:
+            contents = read_result_file(path, os.path.basename(self.root), self.extended)
+        except Exception as e:
+            # Like a failed json.load: the file contributes nothing until it changes
+            print(f"Error reading {path}: {e}")
+            contents, error = _FileRows(), str(e) or type(e).__name__
+        with self._db:
+            self._forget(path)
+            self._db.executemany(
+                "INSERT INTO models (scope, path, pos, model) VALUES (?, ?, ?, ?)",
+                [(self.scope, path, pos, model) for pos, model in enumerate(contents.models)]
+            )
+            self._db.executemany(
+                "INSERT INTO rows (scope, path, seq, model, strategy, status, subject, number, difficulty, "
+                "runtime, question, correct_answer, model_answer) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(self.scope, path, seq) + row for seq, row in enumerate(contents.rows)]
+            )
+            self._db.executemany(
+                "INSERT INTO stats (scope, path, model, strategy, status, count, total, min, max) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(self.scope, path) + key + (s.count, s.total, s.min, s.max) for key, s in contents.stats.items()]
+            )
+            self._db.execute(
+                "INSERT INTO files (scope, path, version, mtime_ns, size, sha256, error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.scope, path, STATE_VERSION, stat.st_mtime_ns, stat.st_size, digest, error)
+            )
+        self.reread += 1
+        return contents.models
+
+    def update(self, refresh=False):
+        """
+        Bring the state in line with the files on disk; returns the set of
+        models whose rows changed (every model when ``refresh`` is set).
+        """
+        self.files = find_result_files(self.root)
+        self.reread = 0
+        known = {path: (version, mtime_ns, size, sha256) for path, version, mtime_ns, size, sha256 in self._db.execute(
+            "SELECT path, version, mtime_ns, size, sha256 FROM files WHERE scope = ?", (self.scope,)
+        )}
+        changed = set()
+        for path in self.files:
+            stat = os.stat(path)
+            row = known.pop(path, None)
+            if not refresh and row is not None and row[0] == STATE_VERSION and row[2] == stat.st_size:
+                if row[1] == stat.st_mtime_ns:
+                    continue
+                # Touched but maybe not changed: only re-read if the bytes differ
+                digest = _file_sha256(path)
+                if digest == row[3]:
+                    with self._db:
+                        self._db.execute("UPDATE files SET mtime_ns = ? WHERE scope = ? AND path = ?",
+                                         (stat.st_mtime_ns, self.scope, path))
+                    continue
+            else:
+                digest = _file_sha256(path)
+            changed.update(self._models_of(path))
+            changed.update(self._reread(path, stat, digest))
+        for path in known:
+            # Deleted since the last run
+            changed.update(self._models_of(path))
+            with self._db:
+                self._forget(path)
+        if refresh:
+            changed.update(self.models())
+        return changed
+
+    def models(self):
+        """Every model in the current files, in first-seen order."""
+        order = {path: rank for rank, path in enumerate(self.files)}
+        found = sorted(self._db.execute("SELECT path, pos, model FROM models WHERE scope = ?", (self.scope,)),
+                       key=lambda r: (order.get(r[0], len(order)), r[1]))
+        return list(dict.fromkeys(model for _, _, model in found))
+
+    def detail_rows(self, model=None):
+        """
+        CSV rows grouped the way the old scripts wrote them: by strategy, then
+        status, then file order, then position in the file.  Without
+        ``model`` the rows of every model are returned with the model name
+        inserted as the second column.
+        """
+        order = {path: rank for rank, path in enumerate(self.files)}
+        positions = {(path, m): pos for path, pos, m in self._db.execute(
+            "SELECT path, pos, model FROM models WHERE scope = ?", (self.scope,)
+        )}
+        query = ("SELECT path, seq, model, strategy, status, subject, number, difficulty, runtime, question, "
+                 "correct_answer, model_answer FROM rows WHERE scope = ?")
+        params = (self.scope,)
+        if model is not None:
+            query += " AND model = ?"
+            params += (model,)
+        buckets = {(strategy, status): [] for strategy in STRATEGIES for status in STATUSES}
+        for row in self._db.execute(query, params):
+            buckets[(row[3], row[4])].append(row)
+        for (strategy, status), rows in buckets.items():
+            rows.sort(key=lambda r: (order.get(r[0], len(order)), positions.get((r[0], r[2]), 0), r[1]))
+            for path, seq, m, _, _, subject, number, difficulty, runtime, question, correct, answer in rows:
+                line = [strategy, subject, number, difficulty, _cell(runtime), _status_label(status),
+                        question, correct, answer]
+                if model is None:
+                    line.insert(1, m)
+                yield line
+
+    def records(self):
+        """
+        ``(model, strategy, subject, difficulty, correct, runtime)`` for every
+        row, in file order (the input ``ColumnarResults.from_records`` takes).
+        """
+        order = {path: rank for rank, path in enumerate(self.files)}
+        rows = self._db.execute(
+            "SELECT path, seq, model, strategy, subject, difficulty, status, runtime FROM rows WHERE scope = ?",
+            (self.scope,)
+        ).fetchall()
+        rows.sort(key=lambda r: (order.get(r[0], len(order)), r[1]))
+        for _, _, model, strategy, subject, difficulty, status, runtime in rows:
+            yield model, strategy, subject, difficulty, status == "correct", runtime
+
+    def statistics(self, model=None):
+        """``{(strategy, status): RunningStats}`` for one model or for all of them."""
+        order = {path: rank for rank, path in enumerate(self.files)}
+        positions = {(path, m): pos for path, pos, m in self._db.execute(
+            "SELECT path, pos, model FROM models WHERE scope = ?", (self.scope,)
+        )}
+        query = "SELECT path, model, strategy, status, count, total, min, max FROM stats WHERE scope = ?"
+        params = (self.scope,)
+        if model is not None:
+            query += " AND model = ?"
+            params += (model,)
+        parts = sorted(self._db.execute(query, params),
+                       key=lambda r: (order.get(r[0], len(order)), positions.get((r[0], r[1]), 0)))
+        merged = {(strategy, status): RunningStats() for strategy in STRATEGIES for status in STATUSES}
+        for _, _, strategy, status, count, total, low, high in parts:
+            merged[(strategy, status)].merge(RunningStats(count, total, low, high))
+        return merged
+
+    def _write_stats(self, path, stats):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(STATS_HEADER)
+            for (strategy, status), s in stats.items():
+                if s.count == 0:
+                    continue
+                writer.writerow([strategy, _status_label(status), round(s.mean, 2), s.min, s.max, s.count])
+
+    def write_csv(self, output_dir, models=None, combined=False):
+        """
+        Write ``<model>/<model>_results.csv`` and
+        ``<model>/<model>_runtime_statistics.csv`` for ``models`` (default:
+        all), plus any model whose files are missing from ``output_dir``.
+        ``combined`` also writes ``all_results.csv`` and
+        ``runtime_statistics.csv`` over every model.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        written = []
+        for model in self.models():
+            model_dir = os.path.join(output_dir, model)
+            detail_path = os.path.join(model_dir, f"{model}_results.csv")
+            stat_path = os.path.join(model_dir, f"{model}_runtime_statistics.csv")
+            if models is not None and model not in models and os.path.exists(detail_path) \
+                    and os.path.exists(stat_path):
+                continue
+            os.makedirs(model_dir, exist_ok=True)
+            with open(detail_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(DETAIL_HEADER)
+                writer.writerows(self.detail_rows(model))
+            self._write_stats(stat_path, self.statistics(model))
+            written.append(model)
+        combined_path = os.path.join(output_dir, "all_results.csv")
+        if combined and (models is None or models or written or not os.path.exists(combined_path)):
+            with open(combined_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(DETAIL_HEADER[:1] + ["Model"] + DETAIL_HEADER[1:])
+                writer.writerows(self.detail_rows())
+            self._write_stats(os.path.join(output_dir, "runtime_statistics.csv"), self.statistics())
+        return written
+
+    def close(self):
+        self._db.close()
+
+
+def write_columnar(aggregator, output_dir):
+    """
+    Save every row as ``results.npz`` and the per (model, strategy, status)
+    latency percentiles, accuracy and spread as ``latency_statistics.csv``.
+    """
+    from .columnar import ColumnarResults
+
+    results = ColumnarResults.from_records(aggregator.records())
+    results.save(os.path.join(output_dir, "results.npz"))
+    results.group_stats(by=("model", "strategy", "status")).write_csv(
+        os.path.join(output_dir, "latency_statistics.csv")
+    )
+    return results
+
+
+def aggregate_runtimes(root, output_dir, extended=False, combined=False, columnar=False, refresh=False,
+                       state_path=DEFAULT_STATE_PATH):
+    """
+    Scan ``root``, re-read what changed and refresh the CSVs in ``output_dir``.
+    ``columnar`` also keeps ``results.npz`` and ``latency_statistics.csv``
+    up to date (needs NumPy).
+    """
+    with RuntimeAggregator(root, extended=extended, state_path=state_path) as aggregator:
+        changed = aggregator.update(refresh=refresh)
+        written = aggregator.write_csv(output_dir, models=changed, combined=combined)
+        if columnar and (changed or written or not os.path.exists(os.path.join(output_dir, "results.npz"))):
+            write_columnar(aggregator, output_dir)
+        print(f"Found {len(aggregator.files)} files; re-read {aggregator.reread}, "
+              f"rewrote {len(written)} of {len(aggregator.models())} models in {output_dir}")
+        return written
@@ -0,0 +1,266 @@
+"""
+Content-addressed on-disk cache of model responses.
+
+Re-running a driver with unchanged prompts used to re-send every request (the
+SAT results folder holds several runs of the same sample from one afternoon).
+``ResponseCache`` stores each response in SQLite under a SHA-256 of the model,
+the message list and the sampling parameters, so an identical request is
+answered from disk.  ``CachedClient`` wraps a g4f ``Client``/``AsyncClient``
+and exposes the same ``client.chat.completions.create`` surface, which is the
+only thing the drivers and the engine touch.
+
+Entries expire after ``max_age`` seconds and the least recently used ones are
+evicted once the stored responses exceed ``max_bytes``.  In replay-only mode a
+miss raises ``CacheMiss`` instead of reaching the network, which makes a
+re-run fully offline and reproducible.
+
+    python -m evalkit cache stats
+    python -m evalkit cache prune --max_mb 256 --max_age_days 30
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from .ratelimit import is_rate_limited_response
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "EVALKIT_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_responses.sqlite")
+)
+
+# Request options that do not change what the model answers
+_IGNORED_PARAMS = {"timeout", "stream"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    runtime REAL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+class CacheMiss(LookupError):
+    """Raised in replay-only mode when a request has no cached response."""
+
+
+def cache_key(model, messages, params=None):
+    """Stable hash of everything that determines a model's answer."""
+    sampling = {k: v for k, v in (params or {}).items() if k not in _IGNORED_PARAMS}
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": sampling},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with LRU size and age eviction.
+
+    ``max_bytes`` caps the total size of stored responses (None = unbounded)
+    and ``max_age`` is in seconds (None = never expire).  Safe to share
+    between the engine's worker threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=512 * 1024 * 1024, max_age=None,
+                 replay_only=False, evict_every=100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.replay_only = replay_only
+        self.evict_every = max(1, evict_every)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _expired(self, created, now):
+        return self.max_age is not None and now - created > self.max_age
+
+    def lookup(self, model, messages, params=None):
+        """Return ``(response, runtime)`` for a cached request, or None."""
+        key = cache_key(model, messages, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, runtime, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[2], now):
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.evicted += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0], row[1]
+
+    def store(self, model, messages, params, response, runtime=None):
+        key = cache_key(model, messages, params)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, runtime, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response, runtime, len(response.encode("utf-8")), now, now)
+            )
+            self._db.commit()
+            self.stores += 1
+            if self.stores % self.evict_every == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        removed = 0
+        if self.max_age is not None:
+            removed += self._db.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.max_age,)
+            ).rowcount
+        if self.max_bytes is not None:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Walk from least to most recently used until we are under the cap
+                excess = total - self.max_bytes
+                doomed = []
+                for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    doomed.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                removed += len(doomed)
+        self._db.commit()
+        self.evicted += removed
+        return removed
+
+    def evict(self):
+        """Apply the age and size limits now; returns the number of entries removed."""
+        with self._lock:
+            return self._evict(time.time())
+
+    def summary(self):
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evicted": self.evicted
+        }
+
+    def format_report(self):
+        stats = self.summary()
+        lookups = stats["hits"] + stats["misses"]
+        rate = stats["hits"] / lookups if lookups else 0.0
+        mode = " (replay only)" if self.replay_only else ""
+        return (
+            f"Response cache{mode}: {stats['hits']} hits, {stats['misses']} misses ({rate:.1%} hit rate), "
+            f"{stats['stores']} stored; {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB in {self.path}"
+        )
+
+    def close(self):
+        with self._lock:
+            self._evict(time.time())
+            self._db.close()
+
+
+def _cached_completion(response, runtime):
+    """Minimal stand-in for a chat completion object served from the cache."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=response))],
+        cached=True,
+        cached_runtime=runtime
+    )
+
+
+def _cacheable(response):
+    return bool(response) and not is_rate_limited_response(response)
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache):
+        self._completions = completions
+        self._cache = cache
+
+    def _replay(self, model, messages, params):
+        hit = self._cache.lookup(model, messages, params)
+        if hit is not None:
+            return _cached_completion(*hit)
+        if self._cache.replay_only or self._completions is None:
+            raise CacheMiss(f"No cached response for {model} (replay-only mode)")
+        return None
+
+    def create(self, model, messages, **params):
+        cached = self._replay(model, messages, params)
+        if cached is not None:
+            return cached
+        start_time = time.time()
+        completion = self._completions.create(model=model, messages=messages, **params)
+        content = completion.choices[0].message.content
+        if _cacheable(content):
+            self._cache.store(model, messages, params, content, round(time.time() - start_time, 2))
+        return completion
+
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    async def create(self, model, messages, **params):
+        cached = self._replay(model, messages, params)
+        if cached is not None:
+            return cached
+        start_time = time.time()
+        completion = await self._completions.create(model=model, messages=messages, **params)
+        content = completion.choices[0].message.content
+        if _cacheable(content):
+            self._cache.store(model, messages, params, content, round(time.time() - start_time, 2))
+        return completion
+
+
+class CachedClient:
+    """
+    Drop-in wrapper around a g4f client that answers repeated requests
+    from a ``ResponseCache``.  ``client`` may be None in replay-only mode.
+
+    Responses served from the cache carry ``cached=True`` and the runtime of
+    the original call as ``cached_runtime`` so timing statistics stay honest.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+        completions = client.chat.completions if client is not None else None
+        if completions is not None and inspect.iscoroutinefunction(completions.create):
+            wrapped = _AsyncCachedCompletions(completions, cache)
+        else:
+            wrapped = _CachedCompletions(completions, cache)
+        self.chat = SimpleNamespace(completions=wrapped)
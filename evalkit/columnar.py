@@ -0,0 +1,219 @@
+"""
+Columnar results store with vectorized group-by statistics.
+
+The runtime CSVs only carry avg/min/max/count per (strategy, status), and
+answering anything else (tail latency, accuracy per difficulty, spread) meant
+re-reading every per-question row in Python.  ``ColumnarResults`` holds the
+same rows as NumPy arrays -- ``runtime`` (float64, NaN when unknown),
+``correct`` (bool) and categorical codes for model, strategy, subject and
+difficulty -- and ``group_stats`` computes count, accuracy, mean, std, min,
+percentiles and max for any grouping with sorts and ``reduceat`` instead of
+per-row loops.
+
+``save``/``load`` use an uncompressed ``.npz`` of plain arrays (no pickles),
+which the plotting and aggregation utilities can load in milliseconds:
+
+    results = ColumnarResults.load("runtime_sat/results.npz")
+    results.group_stats(by=("model", "difficulty")).rows()
+"""
+
+import csv
+
+import numpy as np
+
+CATEGORICAL = ("model", "strategy", "subject", "difficulty")
+
+# "status" is derived from ``correct`` and can be grouped on like the others
+_STATUS_CATEGORIES = np.array(["correct", "incorrect"])
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def encode(values):
+    """``(codes, categories)`` for a sequence, categories in first-seen order."""
+    values = np.asarray(["" if v is None else str(v) for v in values], dtype=str)
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int32), values
+    categories, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    remap = np.empty_like(order)
+    remap[order] = np.arange(order.size)
+    return remap[inverse].astype(np.int32), categories[order]
+
+
+class GroupStats:
+    """Per-group statistics as parallel arrays, one entry per group."""
+
+    def __init__(self, by, columns):
+        self.by = tuple(by)
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["count"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows(self):
+        """One dict per group, with plain Python values (NaN becomes None)."""
+        names = list(self.columns)
+        out = []
+        for i in range(len(self)):
+            row = {}
+            for name in names:
+                value = self.columns[name][i].item()
+                row[name] = None if isinstance(value, float) and value != value else value
+            out.append(row)
+        return out
+
+    def write_csv(self, path, digits=2):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for row in self.rows():
+                writer.writerow([
+                    "" if value is None else round(value, 4 if name == "accuracy" else digits)
+                    if isinstance(value, float) else value
+                    for name, value in row.items()
+                ])
+
+
+class ColumnarResults:
+    """Graded calls as NumPy columns; see the module docstring."""
+
+    def __init__(self, runtime, correct, codes, categories):
+        self.runtime = np.asarray(runtime, dtype=np.float64)
+        self.correct = np.asarray(correct, dtype=bool)
+        self.codes = {name: np.asarray(codes[name], dtype=np.int32) for name in CATEGORICAL}
+        self.categories = {name: np.asarray(categories[name], dtype=str) for name in CATEGORICAL}
+
+    def __len__(self):
+        return len(self.runtime)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from ``(model, strategy, subject, difficulty, correct, runtime)`` tuples."""
+        records = list(records)
+        columns = list(zip(*records)) if records else [()] * 6
+        codes, categories = {}, {}
+        for name, values in zip(CATEGORICAL, columns[:4]):
+            codes[name], categories[name] = encode(values)
+        runtime = [float(v) if isinstance(v, (int, float)) else np.nan for v in columns[5]]
+        return cls(runtime, [bool(v) for v in columns[4]], codes, categories)
+
+    @classmethod
+    def from_table(cls, table, subject="skill"):
+        """
+        Build from an ``evalkit.records.ResultTable``, reusing its interned
+        ids as codes; ``subject`` names the table column to use as subject.
+        """
+        codes, categories = {}, {}
+        for name, source in zip(CATEGORICAL, ("model", "strategy", subject, "difficulty")):
+            codes[name] = np.frombuffer(table.columns[source], dtype=table.columns[source].typecode).astype(np.int32)
+            categories[name] = np.array(["" if v is None else str(v) for v in table.interners[source].values],
+                                        dtype=str)
+        return cls(np.frombuffer(table.runtime, dtype=np.float64).copy(),
+                   np.frombuffer(table.correct, dtype=np.int8).astype(bool), codes, categories)
+
+    def values(self, name):
+        """Decoded values of a categorical column (or ``status``)."""
+        codes, categories = self._column(name)
+        return categories[codes]
+
+    def _column(self, name):
+        if name == "status":
+            return (~self.correct).astype(np.int32), _STATUS_CATEGORIES
+        return self.codes[name], self.categories[name]
+
+    def mask(self, **where):
+        """Boolean row mask for ``column=value`` filters on categorical columns."""
+        selected = np.ones(len(self), dtype=bool)
+        for name, value in where.items():
+            codes, categories = self._column(name)
+            matches = np.flatnonzero(categories == str(value))
+            if matches.size == 0:
+                return np.zeros(len(self), dtype=bool)
+            selected &= codes == matches[0]
+        return selected
+
+    def select(self, mask):
+        """A new store with only the rows where ``mask`` is true."""
+        return ColumnarResults(self.runtime[mask], self.correct[mask],
+                               {name: codes[mask] for name, codes in self.codes.items()}, self.categories)
+
+    def group_stats(self, by=("model", "strategy"), percentiles=DEFAULT_PERCENTILES):
+        """
+        Count, accuracy, mean, std (population), min, the given runtime
+        percentiles (linear interpolation, like ``np.percentile``) and max
+        for every combination of the ``by`` columns present in the data.
+        Rows without a runtime count towards accuracy only.
+        """
+        by = tuple(by)
+        n = len(self)
+        keys = [self._column(name)[0] for name in by]
+        names = ["count", "accuracy", "mean", "std", "min"] + [f"p{q:g}" for q in percentiles] + ["max"]
+        if n == 0:
+            columns = {name: np.zeros(0, dtype=str) for name in by}
+            columns.update({name: np.zeros(0, dtype=np.int64 if name == "count" else np.float64) for name in names})
+            return GroupStats(by, columns)
+
+        # Sort by group, then runtime; NaN runtimes sort last within a group
+        order = np.lexsort([self.runtime] + keys[::-1])
+        if keys:
+            sorted_keys = np.stack([key[order] for key in keys])
+            boundary = np.ones(n, dtype=bool)
+            boundary[1:] = np.any(sorted_keys[:, 1:] != sorted_keys[:, :-1], axis=0)
+        else:
+            sorted_keys = np.zeros((0, n), dtype=np.int32)
+            boundary = np.zeros(n, dtype=bool)
+            boundary[0] = True
+        starts = np.flatnonzero(boundary)
+        group = np.cumsum(boundary) - 1
+        counts = np.diff(np.append(starts, n))
+
+        runtime = self.runtime[order]
+        valid = ~np.isnan(runtime)
+        timed = np.add.reduceat(valid.astype(np.int64), starts)
+        filled = np.where(valid, runtime, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.add.reduceat(filled, starts) / timed
+            deviation = np.where(valid, runtime - mean[group], 0.0)
+            std = np.sqrt(np.add.reduceat(deviation * deviation, starts) / timed)
+        has_time = timed > 0
+        last = starts + np.maximum(timed - 1, 0)
+
+        def quantile(q):
+            position = starts + (q / 100.0) * np.maximum(timed - 1, 0)
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(low + 1, last)
+            value = runtime[low] + (runtime[high] - runtime[low]) * (position - low)
+            return np.where(has_time, value, np.nan)
+
+        columns = {}
+        for name, row in zip(by, sorted_keys):
+            columns[name] = self._column(name)[1][row[starts]]
+        columns["count"] = counts.astype(np.int64)
+        columns["accuracy"] = np.add.reduceat(self.correct[order].astype(np.int64), starts) / counts
+        columns["mean"] = np.where(has_time, mean, np.nan)
+        columns["std"] = np.where(has_time, std, np.nan)
+        columns["min"] = np.where(has_time, runtime[starts], np.nan)
+        for q in percentiles:
+            columns[f"p{q:g}"] = quantile(q)
+        columns["max"] = np.where(has_time, runtime[last], np.nan)
+        return GroupStats(by, columns)
+
+    def save(self, path, compressed=False):
+        arrays = {"runtime": self.runtime, "correct": self.correct}
+        for name in CATEGORICAL:
+            arrays[f"{name}_codes"] = self.codes[name]
+            arrays[f"{name}_categories"] = self.categories[name]
+        (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["runtime"], data["correct"],
+                {name: data[f"{name}_codes"] for name in CATEGORICAL},
+                {name: data[f"{name}_categories"] for name in CATEGORICAL}
+            )
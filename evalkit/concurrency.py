@@ -0,0 +1,321 @@
+"""
+Adaptive per-model concurrency (AIMD).
+
+A fixed ``--concurrency`` is wrong for g4f-backed models: the same setting
+that keeps a fast provider busy piles dozens of requests onto one that answers
+in two minutes or starts failing with ``IndexError``/throttling bursts.
+``AdaptiveConcurrency`` keeps a separate limit per model.  After each round
+of healthy completions (one per slot, with p90 latency under the target and
+the error rate under ``max_error_rate`` over the last ``window`` calls) the
+limit grows by ``increase``; an error, a timeout or a rate-limit marker
+multiplies it by ``decrease``.
+Like TCP congestion control, only failures of calls started after the last
+cut can cut again, so one burst of errors from a full window halves once.
+
+Every change is logged through the ``evalkit.concurrency`` logger, kept in
+``decisions`` and optionally appended to a JSONL file, so the limits can be
+tuned from real runs.
+
+The engine takes the controller as ``run_items(..., concurrency=...)``;
+code that calls ``client.chat.completions.create`` directly can wrap the
+client in ``AdaptiveClient`` instead.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from .ratelimit import is_rate_limit_error, is_rate_limited_response
+
+logger = logging.getLogger("evalkit.concurrency")
+
+SUCCESS = "success"
+ERROR = "error"
+TIMEOUT = "timeout"
+RATE_LIMITED = "rate_limited"
+
+
+def classify_error(error):
+    """Map an exception from the client onto ``timeout``, ``rate_limited`` or ``error``."""
+    if is_rate_limit_error(error):
+        return RATE_LIMITED
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "timeout" in type(error).__name__.lower():
+        return TIMEOUT
+    message = str(error).lower()
+    if "timed out" in message or "timeout" in message:
+        return TIMEOUT
+    return ERROR
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class _ModelState:
+    def __init__(self, limit, window):
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.waiters = deque()
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.healthy = 0
+        self.last_cut = 0.0
+        self.peak = float(limit)
+        self.calls = 0
+        self.failures = 0
+        self.increases = 0
+        self.decreases = 0
+
+
+class AdaptiveConcurrency:
+    """
+    Per-model AIMD limits on calls in flight.
+
+    ``target_p90`` is the latency (seconds) above which the limit stops
+    growing; when None it is ``latency_factor`` times the best p90 seen for
+    the model so far.  ``timeout`` (seconds) also counts slow successes as
+    timeouts.  Cached responses release their slot without feeding the
+    statistics.  Safe to use from threads and from asyncio code at once.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, increase=1.0, decrease=0.5, window=20,
+                 target_p90=None, latency_factor=2.0, max_error_rate=0.1, timeout=None, log_path=None):
+        self.initial = initial
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.window = max(1, window)
+        self.target_p90 = target_p90
+        self.latency_factor = latency_factor
+        self.max_error_rate = max_error_rate
+        self.timeout = timeout
+        self.log_path = log_path
+        self.decisions = []
+        self._best_p90 = {}
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _state(self, model):
+        state = self._states.get(model)
+        if state is None:
+            limit = min(self.maximum, max(self.minimum, self.initial))
+            state = self._states[model] = _ModelState(limit, self.window)
+        return state
+
+    def limit(self, model):
+        with self._lock:
+            return int(self._state(model).limit)
+
+    # -- slots ---------------------------------------------------------------
+
+    def acquire(self, model):
+        """Block until ``model`` has a free slot; returns the start token for ``release``."""
+        with self._lock:
+            state = self._state(model)
+            if not state.waiters and state.in_flight < int(state.limit):
+                state.in_flight += 1
+                return time.monotonic()
+            event = threading.Event()
+            state.waiters.append(event.set)
+        event.wait()
+        return time.monotonic()
+
+    async def acquire_async(self, model):
+        """Awaitable ``acquire`` that never blocks the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._state(model)
+            if not state.waiters and state.in_flight < int(state.limit):
+                state.in_flight += 1
+                return time.monotonic()
+            future = loop.create_future()
+            granted = []
+
+            def wake():
+                granted.append(True)
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+            state.waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if granted:
+                    # The slot was already handed over: pass it on
+                    state.in_flight -= 1
+                    self._wake(state)
+                else:
+                    state.waiters.remove(wake)
+            raise
+        return time.monotonic()
+
+    def _wake(self, state):
+        # Slots are handed straight to the oldest waiters
+        while state.waiters and state.in_flight < int(state.limit):
+            state.in_flight += 1
+            state.waiters.popleft()()
+
+    def release(self, model, started, outcome=SUCCESS, latency=None, cached=False):
+        """
+        Give back the slot taken at ``started`` and feed the outcome
+        (``success``, ``error``, ``timeout`` or ``rate_limited``) into the
+        model's limit.
+        """
+        with self._lock:
+            state = self._state(model)
+            state.in_flight -= 1
+            if not cached:
+                if latency is None:
+                    latency = time.monotonic() - started
+                if outcome == SUCCESS and self.timeout is not None and latency > self.timeout:
+                    outcome = TIMEOUT
+                self._observe(model, state, started, outcome, latency)
+            self._wake(state)
+
+    def _observe(self, model, state, started, outcome, latency):
+        state.calls += 1
+        state.outcomes.append(outcome != SUCCESS)
+        if outcome == SUCCESS:
+            state.latencies.append(latency)
+        else:
+            state.failures += 1
+            state.healthy = 0
+            # Calls already in flight when we last cut were sent under the old limit
+            if started >= state.last_cut:
+                self._set_limit(model, state, state.limit * self.decrease, outcome)
+                state.last_cut = time.monotonic()
+                state.decreases += 1
+            return
+        state.healthy += 1
+        if state.healthy < max(int(state.limit), 1) or len(state.latencies) < min(self.window, 5):
+            return
+        state.healthy = 0
+        p90 = _percentile(state.latencies, 90)
+        error_rate = sum(state.outcomes) / len(state.outcomes)
+        if len(state.latencies) >= self.window:
+            self._best_p90[model] = min(self._best_p90.get(model, p90), p90)
+        target = self.target_p90 if self.target_p90 is not None else \
+            self._best_p90.get(model, p90) * self.latency_factor
+        if p90 > target:
+            self._log(model, state.limit, state.limit, f"hold: p90 {p90:.1f}s above target {target:.1f}s",
+                      logging.DEBUG)
+        elif error_rate > self.max_error_rate:
+            self._log(model, state.limit, state.limit, f"hold: error rate {error_rate:.0%}", logging.DEBUG)
+        elif state.limit < self.maximum:
+            self._set_limit(model, state, state.limit + self.increase,
+                            f"healthy: p90 {p90:.1f}s, error rate {error_rate:.0%}")
+            state.increases += 1
+
+    def _set_limit(self, model, state, limit, reason):
+        old = state.limit
+        state.limit = float(min(self.maximum, max(self.minimum, limit)))
+        state.peak = max(state.peak, state.limit)
+        if int(state.limit) != int(old):
+            self._log(model, old, state.limit, reason)
+
+    def _log(self, model, old, new, reason, level=logging.INFO):
+        decision = {"time": round(time.time(), 3), "model": model, "from": int(old), "to": int(new),
+                    "reason": reason}
+        self.decisions.append(decision)
+        logger.log(level, "%s: concurrency %d -> %d (%s)", model, int(old), int(new), reason)
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+
+    # -- reporting -----------------------------------------------------------
+
+    def summary(self):
+        with self._lock:
+            return {
+                model: {
+                    "limit": int(state.limit),
+                    "peak": int(state.peak),
+                    "calls": state.calls,
+                    "failures": state.failures,
+                    "increases": state.increases,
+                    "decreases": state.decreases,
+                    "p90": round(_percentile(state.latencies, 90), 2) if state.latencies else None
+                }
+                for model, state in self._states.items()
+            }
+
+    def format_report(self):
+        summary = self.summary()
+        if not summary:
+            return "No adaptive concurrency decisions were made."
+        lines = ["Adaptive concurrency:"]
+        for model, stats in sorted(summary.items()):
+            p90 = f"{stats['p90']:.1f}s" if stats["p90"] is not None else "n/a"
+            lines.append(
+                f"  {model}: limit {stats['limit']} (peak {stats['peak']}), {stats['calls']} calls, "
+                f"{stats['failures']} failures, {stats['increases']} increases, {stats['decreases']} cuts, p90 {p90}"
+            )
+        return "\n".join(lines)
+
+
+def _completion_outcome(completion):
+    content = completion.choices[0].message.content
+    return RATE_LIMITED if is_rate_limited_response(content) else SUCCESS
+
+
+class _AdaptiveCompletions:
+    def __init__(self, completions, controller):
+        self._completions = completions
+        self._controller = controller
+
+    def create(self, model, messages, **params):
+        started = self._controller.acquire(model)
+        outcome, cached = ERROR, False
+        try:
+            completion = self._completions.create(model=model, messages=messages, **params)
+            outcome, cached = _completion_outcome(completion), getattr(completion, "cached", False)
+            return completion
+        except Exception as e:
+            outcome = classify_error(e)
+            raise
+        finally:
+            self._controller.release(model, started, outcome, cached=cached)
+
+
+class _AsyncAdaptiveCompletions(_AdaptiveCompletions):
+    async def create(self, model, messages, **params):
+        started = await self._controller.acquire_async(model)
+        outcome, cached = ERROR, False
+        try:
+            completion = await self._completions.create(model=model, messages=messages, **params)
+            outcome, cached = _completion_outcome(completion), getattr(completion, "cached", False)
+            return completion
+        except Exception as e:
+            outcome = classify_error(e)
+            raise
+        finally:
+            self._controller.release(model, started, outcome, cached=cached)
+
+
+class AdaptiveClient:
+    """
+    Wrapper around a g4f client (or a ``CachedClient``) whose
+    ``chat.completions.create`` waits for a slot from an
+    ``AdaptiveConcurrency`` and reports how the call went.
+    """
+
+    def __init__(self, client, controller):
+        self.client = client
+        self.controller = controller
+        completions = client.chat.completions
+        if inspect.iscoroutinefunction(completions.create):
+            wrapped = _AsyncAdaptiveCompletions(completions, controller)
+        else:
+            wrapped = _AdaptiveCompletions(completions, controller)
+        self.chat = SimpleNamespace(completions=wrapped)
@@ -0,0 +1,395 @@
+"""
+One loader for every exam's question files.
+
+Each driver used to parse its own JSON shape (``Allquestions`` in the GMAT
+files, ``passages`` in GRE RC, the ``"GRE Math Medium.json"`` key, flat SAT
+lists, TOEFL ``PARAGRAPH``/``questions`` groups) and then regroup by skill and
+difficulty with ``random.sample`` on every run.  ``open_dataset`` normalizes
+any of those shapes into ``Question`` records and keeps them, with an index by
+exam, section, skill, difficulty and question type, in a SQLite file under
+``.cache/``.  The index is rebuilt only when the source file changes (size and
+mtime first, SHA-256 when the mtime moved), so opening a dataset and drawing a
+stratified sample only reads the rows that are actually selected.
+
+    dataset = open_dataset("SAT/Craft_and_Structure/Craft_and_Structure.json")
+    dataset.groups("skill")                 # {"Words in Context": 85, ...}
+    dataset.sample(20, skill="Words in Context")
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.environ.get(
+    "EVALKIT_DATASET_INDEX", os.path.join(REPO_ROOT, ".cache", "datasets.sqlite")
+)
+
+# Bump when normalization changes so stale indexes are rebuilt
+INDEX_VERSION = 1
+
+INDEXED_FIELDS = ("exam", "section", "skill", "difficulty", "question_type")
+
+_ID_KEYS = ("number", "question_number", "question_id", "NO", "id")
+_TEXT_KEYS = ("question", "content", "Question", "student_goal")
+_OPTION_KEYS = ("options", "choices", "answer_choices", "Options")
+_ANSWER_KEYS = ("correct_answer", "correctAnswer", "answer", "Answer")
+_SKILL_KEYS = ("skill", "subtype-type", "subtype")
+_DIFFICULTY_KEYS = ("difficulty", "question_difficulty", "questionDifficulty")
+_PASSAGE_KEYS = ("passage_content", "passage", "PARAGRAPH", "CONVERSATION", "notes")
+_PASSAGE_ID_KEYS = ("passage_number", "passage_id", "NO")
+_LIST_WRAPPERS = ("Allquestions", "questions", "passages")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    source TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    qid TEXT NOT NULL,
+    exam TEXT,
+    section TEXT,
+    skill TEXT,
+    difficulty TEXT,
+    question_type TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (source, pos)
+);
+CREATE INDEX IF NOT EXISTS questions_skill ON questions (source, skill, difficulty);
+CREATE INDEX IF NOT EXISTS questions_type ON questions (source, question_type);
+CREATE INDEX IF NOT EXISTS questions_qid ON questions (source, qid);
+"""
+
+
+@dataclass
+class Question:
+    """
+    A question from any exam file in one normalized shape.
+
+    ``raw`` is the original dict, so drivers can keep feeding their existing
+    prompt builders while sampling and grouping go through the index.
+    """
+    exam: str
+    section: str
+    qid: str
+    text: str
+    options: dict
+    answer: Any
+    skill: Optional[str] = None
+    difficulty: Optional[str] = None
+    question_type: Optional[str] = None
+    passage: Optional[str] = None
+    passage_id: Optional[str] = None
+    source: str = ""
+    position: int = 0
+    raw: dict = field(default_factory=dict)
+
+
+def _first(entry, keys, default=None):
+    for key in keys:
+        value = entry.get(key)
+        if value not in (None, ""):
+            return value
+    return default
+
+
+def _normalize_options(options):
+    """Options come as a letter dict, ``"A. text"`` strings or label/text dicts."""
+    if isinstance(options, dict):
+        return {str(k).strip(): str(v).strip() for k, v in options.items()}
+    normalized = {}
+    for i, option in enumerate(options or []):
+        if isinstance(option, dict):
+            label = option.get("label") or chr(ord("A") + i)
+            normalized[str(label)] = str(option.get("text", "")).strip()
+            continue
+        text = str(option).strip()
+        if len(text) > 1 and text[0].isalpha() and text[1] in ".):":
+            normalized[text[0].upper()] = text[2:].strip()
+        else:
+            normalized[chr(ord("A") + i)] = text
+    return normalized
+
+
+def exam_and_section(path):
+    """
+    Exam and section from where a file lives, e.g. ``GRE RC/GRE_RC_questions.json``
+    -> ("GRE", "GRE RC") and ``SAT/Algebra/Algebra.json`` -> ("SAT", "Algebra").
+    """
+    rel = os.path.relpath(os.path.abspath(path), REPO_ROOT)
+    parts = [p.strip() for p in rel.split(os.sep)[:-1]]
+    if not parts or parts[0] == "..":
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return stem.split("_")[0].upper(), stem
+    exam = parts[0].replace("_", " ").split(" ")[0].upper()
+    section = parts[1] if len(parts) > 1 and parts[0] == exam else parts[0]
+    return exam, section
+
+
+def _question_entries(data):
+    """Unwrap the container shapes used across the repo into a flat entry list."""
+    if isinstance(data, dict):
+        for key in _LIST_WRAPPERS:
+            if isinstance(data.get(key), list):
+                return data[key]
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) == 1:
+            return lists[0]
+        return list(data.values())
+    return data if isinstance(data, list) else []
+
+
+def normalize_questions(data, path):
+    """Flatten and normalize a parsed exam file into ``Question`` records."""
+    exam, section = exam_and_section(path)
+    questions = []
+
+    def add(entry, passage=None, passage_id=None, fallback_id=None):
+        if not isinstance(entry, dict):
+            return
+        position = len(questions)
+        qid = _first(entry, _ID_KEYS)
+        if qid is None:
+            qid = fallback_id if fallback_id is not None else position + 1
+        if passage is None and entry.get("text1"):
+            passage = "\n\n".join(entry[k] for k in ("text1", "text2") if entry.get(k))
+        elif passage is None:
+            passage = _first(entry, _PASSAGE_KEYS)
+        questions.append(Question(
+            exam=exam,
+            section=str(entry.get("section") or section),
+            qid=str(qid),
+            text=str(_first(entry, _TEXT_KEYS, "")),
+            options=_normalize_options(_first(entry, _OPTION_KEYS)),
+            answer=_first(entry, _ANSWER_KEYS),
+            skill=_first(entry, _SKILL_KEYS),
+            difficulty=_first(entry, _DIFFICULTY_KEYS),
+            question_type=_first(entry, ("question_type", "subtype")),
+            passage=passage,
+            passage_id=None if passage_id is None else str(passage_id),
+            source=os.path.abspath(path),
+            position=position,
+            raw=entry
+        ))
+
+    for entry in _question_entries(data):
+        if isinstance(entry, dict) and isinstance(entry.get("questions"), list):
+            # Passage group: the passage text belongs to every question under it
+            passage = _first(entry, _PASSAGE_KEYS)
+            passage_id = _first(entry, _PASSAGE_ID_KEYS)
+            for i, sub in enumerate(entry["questions"], start=1):
+                add(sub, passage, passage_id, f"{passage_id}.{i}" if passage_id is not None else None)
+        else:
+            add(entry)
+    return questions
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Dataset:
+    """Indexed view of one question file; see ``open_dataset``."""
+
+    def __init__(self, db, lock, path):
+        self._db = db
+        self._lock = lock
+        self.path = path
+
+    def __len__(self):
+        return self.count()
+
+    def _where(self, filters):
+        clauses, params = ["source = ?"], [self.path]
+        for name, value in filters.items():
+            if name not in INDEXED_FIELDS:
+                raise ValueError(f"Cannot filter on {name!r}; indexed fields are {INDEXED_FIELDS}")
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{name} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        return " AND ".join(clauses), params
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM questions WHERE {where}", params).fetchone()[0]
+
+    def groups(self, field_name, **filters):
+        """Question counts per value of an indexed field, in file order."""
+        if field_name not in INDEXED_FIELDS:
+            raise ValueError(f"Cannot group on {field_name!r}; indexed fields are {INDEXED_FIELDS}")
+        where, params = self._where(filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {field_name}, COUNT(*), MIN(pos) FROM questions WHERE {where} "
+                f"GROUP BY {field_name} ORDER BY MIN(pos)", params
+            ).fetchall()
+        return {value: count for value, count, _ in rows}
+
+    def positions(self, **filters):
+        """File positions of the matching questions (cheap: no records are decoded)."""
+        where, params = self._where(filters)
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                f"SELECT pos FROM questions WHERE {where} ORDER BY pos", params
+            )]
+
+    def fetch(self, positions):
+        """Decode the records at ``positions``, in the order given."""
+        positions = list(positions)
+        records = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(positions), 500):
+                chunk = positions[start:start + 500]
+                for pos, record in self._db.execute(
+                    f"SELECT pos, record FROM questions WHERE source = ? AND pos IN ({','.join('?' * len(chunk))})",
+                    [self.path, *chunk]
+                ):
+                    records[pos] = record
+        return [Question(**json.loads(records[pos])) for pos in positions if pos in records]
+
+    def select(self, **filters):
+        return self.fetch(self.positions(**filters))
+
+    def all(self):
+        return self.select()
+
+    def head(self, n=None, **filters):
+        """The first ``n`` matching questions in file order (all when n is None)."""
+        return self.fetch(self.positions(**filters)[:n])
+
+    def by_ids(self, qids):
+        """Questions with the given ids, in the order of ``qids``."""
+        wanted = [str(qid) for qid in qids]
+        with self._lock:
+            first_pos = {}
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                for qid, pos in self._db.execute(
+                    f"SELECT qid, MIN(pos) FROM questions WHERE source = ? AND qid IN ({','.join('?' * len(chunk))}) "
+                    f"GROUP BY qid", [self.path, *chunk]
+                ):
+                    first_pos[qid] = pos
+        return self.fetch(first_pos[qid] for qid in wanted if qid in first_pos)
+
+    def sample(self, n, rng=random, **filters):
+        """
+        ``n`` questions drawn without replacement from those matching
+        ``filters`` (all of them, in file order, when there are no more than
+        ``n``).  Draws ``rng.sample`` over the same population in the same
+        order the drivers used, so a seeded run picks the same questions.
+        """
+        positions = self.positions(**filters)
+        if len(positions) > n:
+            positions = rng.sample(positions, n)
+        return self.fetch(positions)
+
+    def stratified_sample(self, n_per_group, by="skill", rng=random, **filters):
+        """``{group value: sample(n_per_group)}`` for every value of ``by``."""
+        return {
+            value: self.sample(n_per_group, rng=rng, **{**filters, by: value})
+            for value in self.groups(by, **filters)
+        }
+
+
+class DatasetIndex:
+    """The on-disk index shared by every dataset; one SQLite file."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def open(self, path, refresh=False):
+        """Return the ``Dataset`` for ``path``, (re)indexing it only if it changed."""
+        source = os.path.abspath(path)
+        stat = os.stat(source)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, mtime_ns, size, sha256 FROM sources WHERE path = ?", (source,)
+            ).fetchone()
+            if refresh or row is None or row[0] != INDEX_VERSION or row[2] != stat.st_size:
+                self._rebuild(source, stat)
+            elif row[1] != stat.st_mtime_ns:
+                # Touched but maybe not changed: only re-parse if the bytes differ
+                if _file_sha256(source) == row[3]:
+                    self._db.execute("UPDATE sources SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, source))
+                    self._db.commit()
+                else:
+                    self._rebuild(source, stat)
+        return Dataset(self._db, self._lock, source)
+
+    def _rebuild(self, source, stat):
+        with open(source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        questions = normalize_questions(data, source)
+        with self._db:
+            self._db.execute("DELETE FROM questions WHERE source = ?", (source,))
+            self._db.executemany(
+                "INSERT INTO questions (source, pos, qid, exam, section, skill, difficulty, question_type, record) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (source, q.position, q.qid, q.exam, q.section, q.skill, q.difficulty, q.question_type,
+                     json.dumps(asdict(q), ensure_ascii=False))
+                    for q in questions
+                ]
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO sources (path, version, mtime_ns, size, sha256, count) VALUES (?, ?, ?, ?, ?, ?)",
+                (source, INDEX_VERSION, stat.st_mtime_ns, stat.st_size, _file_sha256(source), len(questions))
+            )
+
+    def summary(self):
+        """Question counts per (exam, section) over every indexed file."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT exam, section, COUNT(*) FROM questions GROUP BY exam, section ORDER BY exam, section"
+            ).fetchall()
+        return [{"exam": exam, "section": section, "questions": count} for exam, section, count in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def open_dataset(path, refresh=False, index_path=None):
+    """Open (indexing on first use) the question file at ``path``."""
+    global _default_index
+    if index_path is not None:
+        return DatasetIndex(index_path).open(path, refresh=refresh)
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = DatasetIndex()
+    return _default_index.open(path, refresh=refresh)
+
+
+def load_questions(path, **filters):
+    """All (or the filtered) questions of a file, in file order."""
+    return open_dataset(path).select(**filters)
@@ -0,0 +1,234 @@
+"""
+Bounded-concurrency evaluation engine.
+
+The drivers build one work item per (model, strategy, question) cell and used
+to send them one at a time with ``client.chat.completions.create``.  Almost all
+of that time is spent waiting on the network, so the engine keeps up to
+``max_in_flight`` requests open at once and hands back one ``Completion`` per
+item, in the same order the items were built.  Grading and aggregation stay in
+the driver, so result dicts and summaries come out exactly as before.
+"""
+
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .cache import CacheMiss
+from .concurrency import RATE_LIMITED, SUCCESS, classify_error
+from .ratelimit import is_rate_limited_response
+
+
+@dataclass
+class WorkItem:
+    """One model call: who to ask, what to send, and driver bookkeeping."""
+    model: str
+    strategy: str
+    key: str
+    messages: list
+    params: dict = field(default_factory=dict)
+    meta: dict = field(default_factory=dict)
+
+
+@dataclass
+class Completion:
+    """
+    Outcome of a single WorkItem (``response`` is None when ``error`` is set).
+    ``timing`` holds a streamed call's ``stream_timing`` (see ``streaming``)
+    and ``packed_response`` the whole reply of a packed call (see ``packing``).
+    """
+    item: WorkItem
+    response: Optional[str] = None
+    runtime: Optional[float] = None
+    error: Optional[str] = None
+    timing: Optional[dict] = None
+    packed_response: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _runtime(completion, start_time):
+    """Wall-clock of the call, or of the original call for a cache hit."""
+    if getattr(completion, "cached", False) and completion.cached_runtime is not None:
+        return completion.cached_runtime
+    return round(time.time() - start_time, 2)
+
+
+def call_model(client, item, with_cached=False):
+    """
+    Blocking call used for the synchronous g4f ``Client``.  Returns
+    ``(response, runtime)``, plus whether it was a cache hit and the stream
+    timings (None unless the client streamed) with ``with_cached``.
+    """
+    start_time = time.time()
+    completion = client.chat.completions.create(
+        model=item.model,
+        messages=item.messages,
+        **item.params
+    )
+    response = completion.choices[0].message.content.strip()
+    if with_cached:
+        return (response, _runtime(completion, start_time), getattr(completion, "cached", False),
+                getattr(completion, "stream_timing", None))
+    return response, _runtime(completion, start_time)
+
+
+async def call_model_async(client, item, with_cached=False):
+    """Awaitable call used for ``AsyncClient``-style clients; see ``call_model``."""
+    start_time = time.time()
+    completion = await client.chat.completions.create(
+        model=item.model,
+        messages=item.messages,
+        **item.params
+    )
+    response = completion.choices[0].message.content.strip()
+    if with_cached:
+        return (response, _runtime(completion, start_time), getattr(completion, "cached", False),
+                getattr(completion, "stream_timing", None))
+    return response, _runtime(completion, start_time)
+
+
+def is_async_client(client):
+    return inspect.iscoroutinefunction(client.chat.completions.create)
+
+
+def completion_from_entry(item, entry):
+    """Rebuild a Completion for ``item`` from its journal entry."""
+    return Completion(item, entry.get("response"), entry.get("runtime"), entry.get("error"), entry.get("timing"))
+
+
+def completions_from_journal(items, journal):
+    """
+    Rebuild every item's Completion from a journal without calling any model
+    (used by ``--rescore``); items the journal never saw come back as errors.
+    """
+    completions = []
+    for item in items:
+        entry = journal.get(item.model, item.strategy, item.key)
+        if entry is None:
+            completions.append(Completion(item, error="missing from journal"))
+        else:
+            completions.append(completion_from_entry(item, entry))
+    return completions
+
+
+async def run_items_async(client, items, max_in_flight=16, on_complete=None,
+                          limiter=None, max_retries=1, journal=None, concurrency=None, scheduler=None):
+    """
+    Run every item with at most ``max_in_flight`` calls outstanding.
+
+    With a ``RateLimiter`` each call first waits for its own model's token
+    bucket/cooldown (outside the in-flight slots, so a throttled model never
+    starves the others), and throttling notices or exceptions are retried up
+    to ``max_retries`` attempts.
+
+    With an ``AdaptiveConcurrency`` controller, each model's calls in flight
+    are also capped by its own AIMD limit (``max_in_flight`` stays the overall
+    cap); the slot is taken before the shared one so a model that was cut back
+    never holds slots other models could use.
+
+    With a ``PriorityScheduler``, a freed slot goes to the waiting call the
+    scheduler ranks first (priority, deadline, fair share per model, expected
+    latency) instead of the next one in ``items`` order.
+
+    With a ``Journal``, items that already have a successful entry are not
+    sent again (their completion is rebuilt from the journal) and every new
+    completion is appended as soon as it finishes.
+
+    ``on_complete(completion)`` is invoked on the event-loop thread as each
+    call finishes, so drivers can print progress without interleaved lines.
+    Returns the completions in the order of ``items``.
+    """
+    max_in_flight = max(1, int(max_in_flight))
+    attempts = max(1, int(max_retries)) if limiter else 1
+    semaphore = asyncio.Semaphore(max_in_flight)
+    gate = scheduler.gate(max_in_flight) if scheduler else None
+    completions = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        if journal is not None and journal.is_done(item.model, item.strategy, item.key):
+            entry = journal.get(item.model, item.strategy, item.key)
+            completions[index] = completion_from_entry(item, entry)
+        else:
+            pending.append((index, item))
+    use_async = is_async_client(client)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        async def send(item):
+            if use_async:
+                return await call_model_async(client, item, with_cached=True)
+            return await loop.run_in_executor(executor, call_model, client, item, True)
+
+        async def worker(index, item):
+            for _ in range(attempts):
+                if limiter:
+                    wait = limiter.reserve(item.model)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                started = await concurrency.acquire_async(item.model) if concurrency else None
+                outcome, cached, runtime = SUCCESS, False, None
+                try:
+                    async with gate.slot(item) if gate else semaphore:
+                        response, runtime, cached, timing = await send(item)
+                    if is_rate_limited_response(response):
+                        outcome = RATE_LIMITED
+                except CacheMiss as e:
+                    # Replay-only run: retrying cannot help
+                    completion = Completion(item, error=str(e))
+                    cached = True
+                    break
+                except Exception as e:
+                    outcome = classify_error(e)
+                    completion = Completion(item, error=str(e))
+                    if limiter:
+                        limiter.report_error(item.model, e)
+                    continue
+                finally:
+                    if concurrency:
+                        concurrency.release(item.model, started, outcome, latency=runtime, cached=cached)
+                if limiter and is_rate_limited_response(response):
+                    completion = Completion(item, error="rate_limited")
+                    limiter.report_rate_limit(item.model)
+                    continue
+                if limiter:
+                    limiter.report_success(item.model)
+                completion = Completion(item, response, runtime, timing=timing)
+                break
+            completions[index] = completion
+            if journal is not None:
+                journal.record(item.model, item.strategy, item.key, completion.response, completion.runtime,
+                               completion.error, **({"timing": completion.timing} if completion.timing else {}))
+            if on_complete:
+                on_complete(completion)
+
+        await asyncio.gather(*(worker(index, item) for index, item in pending))
+
+    if journal is not None:
+        journal.sync()
+
+    return completions
+
+
+def run_items(client, items, max_in_flight=16, on_complete=None, limiter=None,
+              max_retries=1, journal=None, concurrency=None, scheduler=None):
+    """Synchronous entry point for the drivers; see ``run_items_async``."""
+    return asyncio.run(run_items_async(
+        client, items,
+        max_in_flight=max_in_flight,
+        on_complete=on_complete,
+        limiter=limiter,
+        max_retries=max_retries,
+        journal=journal,
+        concurrency=concurrency,
+        scheduler=scheduler
+    ))
+
+
+def user_message(prompt):
+    """The single-turn message list every driver sends."""
+    return [{"role": "user", "content": prompt}]
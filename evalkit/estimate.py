@@ -0,0 +1,282 @@
+"""
+Dry-run sizing of a sweep: calls, tokens and predicted wall-clock, without calling any model.
+
+Nothing used to say how big a run was before it started: ``multi.py`` sends
+8 models x 3 prompt styles x 120 base64 images, and the Craft and Structure
+five-shot prompts embed whole passages.  ``SweepEstimate`` takes the work
+items a driver would send (anything with ``model``, ``strategy`` and
+``messages``) and reports, per (model, strategy):
+
+* calls, prompt characters and estimated input tokens (``CHARS_PER_TOKEN``),
+* image payload bytes and estimated image tokens (the 512-px tile count of
+  the high-detail vision pricing, read from the PNG/JPEG header),
+* the mean latency recorded in ``runtime_*/<model>/<model>_runtime_statistics.csv``
+  (falling back to the model's mean over all strategies, then to the mean over
+  every model),
+
+and then simulates the run at a given concurrency and per-model rpm to print
+when each cell would start and finish:
+
+    estimate = SweepEstimate.from_items(items, LatencyHistory.load())
+    print(estimate.format_report(concurrency=32, rpm=60))
+
+Token counts are a character heuristic, not a tokenizer, and latencies are
+historical means; the point is the order of magnitude and which cells dominate.
+"""
+
+import base64
+import csv
+import glob
+import heapq
+import math
+import os
+import re
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHARS_PER_TOKEN = 4.0
+DEFAULT_LATENCY = 10.0  # seconds, when no history exists for any model
+IMAGE_FALLBACK_TOKENS = 765  # a 1024x1024 image, when the header cannot be read
+
+_DATA_URL = re.compile(r"^data:[^;,]*(;base64)?,")
+
+
+def _normalize_model(name):
+    # "command r" in a driver is "command-r" in the runtime folders
+    return re.sub(r"[\s_]+", "-", str(name).strip().lower())
+
+
+def _normalize_strategy(name):
+    name = re.sub(r"[^a-z0-9]", "", str(name).lower())
+    return {"cot": "chainofthought", "fewshot": "fiveshot"}.get(name, name)
+
+
+def image_size(data):
+    """``(width, height)`` from a PNG or JPEG header, or None."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"\xff\xd8":
+        position = 2
+        while position + 9 < len(data):
+            if data[position] != 0xFF:
+                position += 1
+                continue
+            marker = data[position + 1]
+            length = struct.unpack(">H", data[position + 2:position + 4])[0]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack(">HH", data[position + 5:position + 9])
+                return width, height
+            position += 2 + length
+    return None
+
+
+def image_tokens(width, height):
+    """High-detail vision token count: 85 + 170 per 512-px tile after downscaling."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def _data_url_tokens(url, _memo={}):
+    tokens = _memo.get(url)
+    if tokens is None:
+        match = _DATA_URL.match(url)
+        size = None
+        if match and match.group(1):
+            # The dimensions are in the first few KB; decode only that much
+            head = url[match.end():match.end() + 65536]
+            size = image_size(base64.b64decode(head[:len(head) - len(head) % 4]))
+        tokens = image_tokens(*size) if size and min(size) > 0 else IMAGE_FALLBACK_TOKENS
+        if len(_memo) < 4096:
+            _memo[url] = tokens
+    return tokens
+
+
+def message_size(messages):
+    """``(text_chars, image_bytes, image_tokens)`` of a chat request's messages."""
+    chars = image_bytes = tokens = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                chars += len(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                url = part.get("image_url", {}).get("url", "")
+                image_bytes += len(url)
+                tokens += _data_url_tokens(url)
+    return chars, image_bytes, tokens
+
+
+class LatencyHistory:
+    """Mean call latency per (model, strategy) from the runtime statistics CSVs."""
+
+    def __init__(self, cells=None):
+        # (model, normalized strategy) -> [count, total seconds]
+        self.cells = cells or {}
+
+    @classmethod
+    def load(cls, pattern=os.path.join(REPO_ROOT, "runtime_*", "*", "*_runtime_statistics.csv")):
+        cells = defaultdict(lambda: [0, 0.0])
+        for path in sorted(glob.glob(pattern)):
+            model = _normalize_model(os.path.basename(os.path.dirname(path)))
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    try:
+                        count, mean = int(row["Count"]), float(row["Avg_Runtime"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    cell = cells[(model, _normalize_strategy(row.get("Strategy", "")))]
+                    cell[0] += count
+                    cell[1] += count * mean
+        return cls(dict(cells))
+
+    def _mean(self, keys):
+        count = sum(self.cells[key][0] for key in keys)
+        return sum(self.cells[key][1] for key in keys) / count if count else None
+
+    def latency(self, model, strategy):
+        """``(seconds, source)``; source says which level of history was used."""
+        model = _normalize_model(model)
+        key = (model, _normalize_strategy(strategy))
+        if key in self.cells and self.cells[key][0]:
+            return self._mean([key]), "history"
+        model_keys = [cell for cell in self.cells if cell[0] == model]
+        if model_keys and self._mean(model_keys) is not None:
+            return self._mean(model_keys), "model mean"
+        if self.cells and self._mean(list(self.cells)) is not None:
+            return self._mean(list(self.cells)), "global mean"
+        return DEFAULT_LATENCY, "default"
+
+
+@dataclass
+class CellEstimate:
+    """Totals for one (model, strategy) cell of a sweep."""
+    model: str
+    strategy: str
+    calls: int = 0
+    chars: int = 0
+    image_bytes: int = 0
+    image_tokens: int = 0
+    latency: float = 0.0
+    source: str = ""
+    start: float = 0.0
+    finish: float = 0.0
+
+    @property
+    def input_tokens(self):
+        return int(self.chars / CHARS_PER_TOKEN) + self.image_tokens
+
+    @property
+    def serial_seconds(self):
+        return self.calls * self.latency
+
+
+class SweepEstimate:
+    def __init__(self, cells, calls):
+        self.cells = cells
+        # (cell key, latency) per call, in submission order
+        self._calls = calls
+
+    @classmethod
+    def from_items(cls, items, history=None):
+        history = history or LatencyHistory()
+        cells = {}
+        calls = []
+        for item in items:
+            key = (item.model, item.strategy)
+            cell = cells.get(key)
+            if cell is None:
+                latency, source = history.latency(item.model, item.strategy)
+                cell = cells[key] = CellEstimate(item.model, item.strategy, latency=latency, source=source)
+            chars, image_bytes, tokens = message_size(item.messages)
+            cell.calls += 1
+            cell.chars += chars
+            cell.image_bytes += image_bytes
+            cell.image_tokens += tokens
+            calls.append((key, cell.latency))
+        return cls(cells, calls)
+
+    def schedule(self, concurrency=16, rpm=0):
+        """
+        Simulate the run: calls start in order on the first free slot, no
+        sooner than ``60 / rpm`` after the previous call to the same model.
+        Sets each cell's start/finish and returns the predicted wall-clock.
+        """
+        slots = [0.0] * max(1, int(concurrency))
+        spacing = 60.0 / rpm if rpm else 0.0
+        next_start = defaultdict(float)
+        started = set()
+        for cell in self.cells.values():
+            cell.start = cell.finish = 0.0
+        end = 0.0
+        for key, latency in self._calls:
+            model = key[0]
+            free = heapq.heappop(slots)
+            start = max(free, next_start[model])
+            next_start[model] = start + spacing
+            finish = start + latency
+            heapq.heappush(slots, finish)
+            cell = self.cells[key]
+            if key not in started:
+                started.add(key)
+                cell.start = start
+            cell.finish = max(cell.finish, finish)
+            end = max(end, finish)
+        return end
+
+    def totals(self):
+        cells = self.cells.values()
+        return {
+            "calls": sum(cell.calls for cell in cells),
+            "chars": sum(cell.chars for cell in cells),
+            "input_tokens": sum(cell.input_tokens for cell in cells),
+            "image_bytes": sum(cell.image_bytes for cell in cells),
+            "image_tokens": sum(cell.image_tokens for cell in cells),
+            "serial_seconds": sum(cell.serial_seconds for cell in cells)
+        }
+
+    def summary(self, concurrency=16, rpm=0):
+        wall_clock = self.schedule(concurrency, rpm)
+        return {
+            **self.totals(),
+            "concurrency": concurrency,
+            "rpm": rpm,
+            "wall_clock_seconds": round(wall_clock, 1),
+            "cells": [
+                {**cell.__dict__, "input_tokens": cell.input_tokens, "serial_seconds": cell.serial_seconds}
+                for cell in self.cells.values()
+            ]
+        }
+
+    def format_report(self, concurrency=16, rpm=0):
+        wall_clock = self.schedule(concurrency, rpm)
+        lines = [f"{'model':<20} {'strategy':<18} {'calls':>6} {'in tokens':>10} {'image MB':>9} "
+                 f"{'latency':>8}  {'window (schedule)':<22} latency from"]
+        for cell in self.cells.values():
+            lines.append(
+                f"{cell.model:<20} {cell.strategy:<18} {cell.calls:>6} {cell.input_tokens:>10,} "
+                f"{cell.image_bytes / 1e6:>9.1f} {cell.latency:>7.1f}s  "
+                f"{_clock(cell.start):>9} - {_clock(cell.finish):<10} {cell.source}"
+            )
+        totals = self.totals()
+        images = (f" ({totals['image_tokens']:,} from images, {totals['image_bytes'] / 1e6:.1f} MB of image payload)"
+                  if totals["image_bytes"] else "")
+        lines.append(f"{totals['calls']} calls, ~{totals['input_tokens']:,} input tokens{images}, "
+                     f"{_clock(totals['serial_seconds'])} if run one at a time")
+        lines.append(f"Predicted wall-clock at concurrency {concurrency}"
+                     f"{f' and {rpm:g} rpm per model' if rpm else ''}: {_clock(wall_clock)}")
+        return "\n".join(lines)
+
+
+def _clock(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
@@ -0,0 +1,219 @@
+"""
+Hedged requests across a chain of backup models.
+
+``GRE_RC.py`` and ``GRE_Math_Medium.py`` ask ``main_model`` first and only
+try the next model in ``backup_models`` once the previous one has returned
+(or burned its full 120 s timeout).  ``Hedger`` races the chain instead: the
+next model is fired as soon as the newest call has been running longer than
+the recent p-th percentile latency of that model (or immediately when a call
+errors or gives an unacceptable answer), the first acceptable answer wins and
+the calls still running are abandoned.
+
+Each call's attempts are returned in a ``HedgeResult`` (who was launched
+when, who won, who was cancelled) and the hedger keeps per-model win and
+hedge counts for the end-of-run report (a request whose models all failed
+or were rejected counts as none accepted, not as a win).  Abandoned calls of the synchronous
+g4f ``Client`` cannot be interrupted; they finish in the background and their
+latency still feeds the percentile so the threshold is not biased low.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .concurrency import _percentile
+
+
+@dataclass
+class HedgeAttempt:
+    """One model call inside a hedged request; times are seconds from its start."""
+    model: str
+    launched: float
+    status: str = "running"
+    finished: Optional[float] = None
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+    def as_dict(self):
+        return {key: value for key, value in self.__dict__.items() if value is not None}
+
+
+@dataclass
+class HedgeResult:
+    """
+    Outcome of a hedged request.  ``model``/``response``/``answer`` are the
+    winner's, or the first answer in chain order when nothing was accepted.
+    """
+    model: str = ""
+    response: str = ""
+    answer: str = ""
+    accepted: bool = False
+    runtime: float = 0.0
+    attempts: list = field(default_factory=list)
+
+    @property
+    def models_tried(self):
+        return [attempt.model for attempt in self.attempts]
+
+    @property
+    def hedged(self):
+        return len(self.attempts) > 1
+
+
+class LatencyTracker:
+    """
+    Recent successful latencies per model and the hedge delay derived from
+    them: the ``percentile`` of the last ``window`` calls, clamped to
+    ``[min_delay, max_delay]``, or ``initial_delay`` until ``min_samples``
+    calls have finished.
+    """
+
+    def __init__(self, percentile=90, initial_delay=30.0, min_delay=1.0, max_delay=None,
+                 min_samples=5, window=200):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self._latencies = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, model, latency):
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self._window)).append(latency)
+
+    def delay(self, model):
+        with self._lock:
+            samples = list(self._latencies.get(model, ()))
+        if len(samples) < self.min_samples:
+            delay = self.initial_delay
+        else:
+            delay = _percentile(samples, self.percentile)
+        delay = max(self.min_delay, delay)
+        return min(self.max_delay, delay) if self.max_delay is not None else delay
+
+
+class Hedger:
+    """
+    Races a model chain through a synchronous client.
+
+    ``evaluate(model, response)`` returns ``(answer, accepted)``; the first
+    accepted answer ends the request.  ``hedge=False`` keeps the old strict
+    one-after-another order (the next model only starts once the previous
+    call has failed or been rejected) through the same code path.
+    """
+
+    def __init__(self, client, tracker=None, hedge=True, max_workers=32):
+        self.client = client
+        self.tracker = tracker or LatencyTracker()
+        self.hedge = hedge
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self.requests = 0
+        self.hedges = 0
+        self.cancelled = 0
+        self.wins = Counter()
+        self.none_accepted = 0
+
+    def _send(self, model, messages, params):
+        start = time.perf_counter()
+        completion = self.client.chat.completions.create(model=model, messages=messages, **params)
+        response = completion.choices[0].message.content.strip()
+        self.tracker.record(model, time.perf_counter() - start)
+        return response
+
+    def call(self, chain, messages, evaluate, **params):
+        """Run one request over ``chain`` (primary first); returns a ``HedgeResult``."""
+        start = time.perf_counter()
+        result = HedgeResult()
+        pending = {}
+        launched_at = [0.0]
+
+        def launch():
+            model = chain[len(result.attempts)]
+            launched_at[0] = time.perf_counter()
+            attempt = HedgeAttempt(model, round(launched_at[0] - start, 2))
+            result.attempts.append(attempt)
+            pending[self._executor.submit(self._send, model, messages, params)] = attempt
+
+        launch()
+        fallback = None
+        while pending:
+            more = len(result.attempts) < len(chain)
+            timeout = None
+            if self.hedge and more:
+                newest = result.attempts[-1].model
+                timeout = max(0.0, launched_at[0] + self.tracker.delay(newest) - time.perf_counter())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # The newest call is slower than its usual tail: race the next model
+                self.hedges += 1
+                launch()
+                continue
+            failed = 0
+            for future in done:
+                attempt = pending.pop(future)
+                attempt.finished = round(time.perf_counter() - start, 2)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    attempt.status, attempt.error = "error", str(e)
+                    failed += 1
+                    continue
+                answer, accepted = evaluate(attempt.model, response)
+                attempt.answer = answer
+                if accepted:
+                    attempt.status = "accepted"
+                    if not result.accepted:
+                        result.model, result.response, result.answer = attempt.model, response, answer
+                        result.accepted = True
+                    continue
+                attempt.status = "rejected"
+                failed += 1
+                position = result.attempts.index(attempt)
+                if answer and (fallback is None or position < fallback[0]):
+                    fallback = (position, attempt.model, response, answer)
+            if result.accepted:
+                break
+            # A failed or rejected call hands over to the next model straight away
+            for _ in range(failed):
+                if len(result.attempts) < len(chain):
+                    launch()
+
+        for future, attempt in pending.items():
+            future.cancel()
+            attempt.status = "cancelled"
+            self.cancelled += 1
+        if not result.accepted and fallback is not None:
+            _, result.model, result.response, result.answer = fallback
+        result.runtime = round(time.perf_counter() - start, 2)
+        self.requests += 1
+        if result.accepted:
+            self.wins[result.model] += 1
+        else:
+            self.none_accepted += 1
+        return result
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "cancelled": self.cancelled,
+            "wins": dict(self.wins),
+            "none_accepted": self.none_accepted
+        }
+
+    def format_report(self):
+        if not self.requests:
+            return "No hedged requests were made."
+        wins = ", ".join(f"{model} {count}" for model, count in self.wins.most_common()) or "none"
+        return (f"Hedging: {self.hedges} backup calls fired early over {self.requests} requests, "
+                f"{self.cancelled} abandoned; accepted answers from: {wins}; "
+                f"none accepted: {self.none_accepted}")
+
+    def close(self):
+        # Abandoned calls are left to finish on their own
+        self._executor.shutdown(wait=False, cancel_futures=True)
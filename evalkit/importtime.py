@@ -0,0 +1,142 @@
+"""
+Import-time benchmark for the evaluation entry points.
+
+Runs each entry point's ``--help`` in a fresh interpreter under
+``python -X importtime`` and reports what it imported: the total import time,
+the slowest top-level modules, and whether any module from ``HEAVY_MODULES``
+(g4f, easyocr, PIL, NumPy, ...) was loaded.  None of them is needed to print
+usage, so ``--check`` treats any of them as a regression, and
+``--budget_ms`` / ``--baseline`` also flag entry points that got slower:
+
+    python -m evalkit importtime --check
+    python -m evalkit importtime --save_baseline .cache/importtime.json
+    python -m evalkit importtime --check --baseline .cache/importtime.json --tolerance 0.5
+
+Numbers are the minimum over ``--repeat`` runs, which keeps first-run disk
+cache effects out of the comparison.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points checked by default, as arguments to the interpreter
+ENTRY_POINTS = {
+    "evalkit": ["-m", "evalkit", "--help"],
+    "C_S": ["SAT/Craft_and_Structure/C_S_GPT-4o.py", "--help"],
+    "Geometry": ["SAT/Geometry/Geometry_gpt4o.py", "--help"],
+    "GRE_RC": ["GRE RC/gpt-4o/GRE_RC.py", "--help"],
+    "GRE_Math_Medium": ["GRE Math Medium/GRE_Math_Medium.py", "--help"],
+    "TOFELPARA": ["TOFEL/Reading/TOFELPARA.py", "--help"],
+    "DataSufficiency": ["GMAT/DataInsighnts/DataSufficiency.py", "--help"],
+    "question_type": ["-c", "import sys; sys.path.insert(0, 'GRE Math Medium'); import question_type"],
+}
+
+# Packages no entry point should need before it does real work
+HEAVY_MODULES = ("g4f", "easyocr", "torch", "PIL", "numpy", "pandas", "matplotlib", "aiohttp", "curl_cffi")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+@dataclass
+class ImportProfile:
+    """What one interpreter run imported; times are in milliseconds."""
+    name: str
+    returncode: int = 0
+    wall_ms: float = 0.0
+    import_ms: float = 0.0
+    modules: dict = field(default_factory=dict)
+    top_level: list = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def heavy(self):
+        return sorted({module.split(".")[0] for module in self.modules
+                       if module.split(".")[0] in HEAVY_MODULES})
+
+    def slowest(self, count=5):
+        return sorted(self.top_level, key=lambda pair: -pair[1])[:count]
+
+
+def parse_importtime(stderr):
+    """``({module: cumulative_ms}, [(top_level_module, cumulative_ms)])`` from ``-X importtime`` output."""
+    modules = {}
+    top_level = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1000
+        name = match.group(4)
+        modules[name] = cumulative
+        if len(match.group(3)) == 1:  # nested imports are indented further
+            top_level.append((name, cumulative))
+    return modules, top_level
+
+
+def profile(name, argv, cwd=REPO_ROOT, env=None):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=cwd, env=env,
+                             capture_output=True, text=True)
+    result = ImportProfile(name, process.returncode, (time.perf_counter() - start) * 1000)
+    result.modules, result.top_level = parse_importtime(process.stderr)
+    result.import_ms = sum(ms for _, ms in result.top_level)
+    if process.returncode:
+        result.error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "failed"
+    return result
+
+
+def benchmark(entry_points=None, repeat=3, cwd=REPO_ROOT):
+    """Best-of-``repeat`` profile per entry point."""
+    results = []
+    for name, argv in (entry_points or ENTRY_POINTS).items():
+        runs = [profile(name, argv, cwd=cwd) for _ in range(max(1, repeat))]
+        results.append(min(runs, key=lambda run: run.import_ms))
+    return results
+
+
+def check(results, budget_ms=None, baseline=None, tolerance=0.5):
+    """Problems found in ``results``; an empty list means the check passed."""
+    problems = []
+    for result in results:
+        if result.returncode:
+            problems.append(f"{result.name}: exited with {result.returncode} ({result.error})")
+        if result.heavy:
+            problems.append(f"{result.name}: imports {', '.join(result.heavy)} before doing any work")
+        if budget_ms is not None and result.import_ms > budget_ms:
+            problems.append(f"{result.name}: {result.import_ms:.0f} ms of imports, budget {budget_ms:.0f} ms")
+        if baseline and result.name in baseline:
+            limit = baseline[result.name] * (1 + tolerance)
+            if result.import_ms > limit:
+                problems.append(f"{result.name}: {result.import_ms:.0f} ms of imports, baseline "
+                                f"{baseline[result.name]:.0f} ms (+{tolerance:.0%} allowed)")
+    return problems
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({result.name: round(result.import_ms, 1) for result in results}, f, indent=2)
+
+
+def format_report(results):
+    lines = []
+    for result in results:
+        slowest = ", ".join(f"{module} {ms:.0f}" for module, ms in result.slowest(3))
+        status = f"exit {result.returncode}" if result.returncode else "ok"
+        lines.append(f"{result.name}: {result.import_ms:.0f} ms imports, {result.wall_ms:.0f} ms wall, "
+                     f"{len(result.modules)} modules ({status}); slowest: {slowest}")
+        if result.heavy:
+            lines.append(f"    heavy imports: {', '.join(result.heavy)}")
+    return "\n".join(lines)
@@ -0,0 +1,423 @@
+"""
+Item response theory: calibrate a question bank from past results, then test
+new models adaptively.
+
+A full sweep asks every model every question, although most of them tell us
+little: the easy ones every model gets right, the hard ones only the best get
+right.  The result files already hold per-question correctness for several
+models (``GMAT/Quant/*_result.json`` covers 7 models x 3 strategies on the
+same 102 questions), which is enough to fit a two-parameter logistic model
+
+    P(correct | theta) = 1 / (1 + exp(-a (theta - b)))
+
+with an ability ``theta`` per (model, strategy) and a difficulty ``b`` and
+discrimination ``a`` per question.  The dataset's difficulty labels
+(Easy/Medium/Hard/...) give ``b`` its prior, so questions no run has answered
+still get a sensible place on the scale.
+
+``AdaptiveTest`` then runs a computerized adaptive test: it asks the question
+with the most Fisher information at the current ability estimate, updates
+the estimate (EAP over a grid, standard normal prior), and stops once its
+standard error is below ``target_se``.  The ability maps back to an expected
+accuracy over the whole bank, which is the number a full sweep would report:
+
+    responses = load_responses(glob.glob("GMAT/Quant/*_result.json"), model_from="file")
+    bank = ItemBank.calibrate(responses, labels={q.qid: q.difficulty for q in dataset.all()})
+    bank.save(default_bank_path("GMAT/Quant/ProblemSolving.json"))
+
+    test = AdaptiveTest(bank, target_se=0.3)
+    while (item := test.next_item()) is not None:
+        test.record(item, ask(item))
+    test.result()
+
+    python -m evalkit irt GMAT/Quant/*_result.json --dataset GMAT/Quant/ProblemSolving.json --model_from file
+
+Only calibration needs NumPy; scoring and item selection are plain Python so
+drivers can import this module cheaply.
+"""
+
+import json
+import math
+import os
+from dataclasses import asdict, dataclass
+from statistics import NormalDist
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BANK_DIR = os.environ.get("EVALKIT_IRT_DIR", os.path.join(REPO_ROOT, ".cache", "irt"))
+MODELS = ("1pl", "2pl")
+
+# Prior mean of an item's difficulty by its dataset label (unknown labels sit at 0)
+DIFFICULTY_PRIORS = {
+    "very easy": -2.0, "easy": -1.0, "moderate": 0.0, "medium": 0.0,
+    "hard": 1.0, "challenging": 1.5, "very hard": 2.0
+}
+# Ability grid for EAP scoring
+_GRID = [step / 10 for step in range(-50, 51)]
+_QUESTION_KEYS = ("question_id", "question_number", "number", "id")
+
+
+def default_bank_path(dataset_path):
+    """Where the calibrated bank of a question file is kept."""
+    return os.path.join(DEFAULT_BANK_DIR, os.path.splitext(os.path.basename(dataset_path))[0] + ".json")
+
+
+def difficulty_prior(label):
+    return DIFFICULTY_PRIORS.get(str(label or "").strip().lower(), 0.0)
+
+
+def _item_id(detail):
+    for key in _QUESTION_KEYS:
+        value = detail.get(key)
+        if value not in (None, "", "N/A"):
+            return str(value)
+    return None
+
+
+def _correct(detail):
+    for key in ("is_correct", "correct"):
+        if key in detail:
+            return bool(detail[key])
+    return None
+
+
+def _file_model(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for suffix in ("_results", "_result"):
+        if stem.endswith(suffix):
+            return stem[:-len(suffix)]
+    return stem
+
+
+def load_responses(paths, model_from="key", names=None):
+    """
+    ``{(model, strategy): {item: fraction correct}}`` from result files.
+
+    ``model_from="key"`` reads ``{model: {strategy: {"details": [...]}}}``
+    (the evalkit drivers); ``"file"`` reads ``{group: {strategy: {"details":
+    [...]}}}`` with the model named by the file (``gpt4o_result.json`` ->
+    ``gpt4o``, renamed through ``names``).  Errored answers are skipped and
+    repeated answers averaged.
+    """
+    names = names or {}
+    counts = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            continue
+        for outer, strategies in data.items():
+            if not isinstance(strategies, dict):
+                continue
+            model = names.get(_file_model(path), _file_model(path)) if model_from == "file" else outer
+            for strategy, block in strategies.items():
+                details = block.get("details") if isinstance(block, dict) else None
+                if not isinstance(details, list):
+                    continue
+                for detail in details:
+                    if not isinstance(detail, dict) or detail.get("error"):
+                        continue
+                    item, correct = _item_id(detail), _correct(detail)
+                    if item is None or correct is None:
+                        continue
+                    cell = counts.setdefault((model, strategy), {}).setdefault(item, [0, 0])
+                    cell[0] += correct
+                    cell[1] += 1
+    return {examinee: {item: correct / total for item, (correct, total) in items.items()}
+            for examinee, items in counts.items()}
+
+
+def probability(theta, a, b):
+    return 1.0 / (1.0 + math.exp(-a * (theta - b)))
+
+
+@dataclass
+class ItemParams:
+    """Calibrated parameters of one question; ``answers`` is how many past responses it was fitted on."""
+    item: str
+    a: float = 1.0
+    b: float = 0.0
+    b_se: float = 1.0
+    answers: int = 0
+    label: str = ""
+
+    def probability(self, theta):
+        return probability(theta, self.a, self.b)
+
+    def information(self, theta):
+        p = self.probability(theta)
+        return self.a * self.a * p * (1.0 - p)
+
+
+class ItemBank:
+    def __init__(self, items, abilities=None, model="2pl"):
+        self.items = items
+        # Calibration abilities per "model / strategy", kept for comparison
+        self.abilities = abilities or {}
+        self.model = model
+
+    @classmethod
+    def calibrate(cls, responses, labels=None, model="2pl", iterations=500, tolerance=1e-4,
+                  discrimination_sd=0.5, difficulty_sd=1.0):
+        """
+        Joint MAP fit of abilities and item parameters (``model`` "1pl" fixes
+        every discrimination at 1).  Priors: ability N(0, 1), difficulty
+        N(label prior, ``difficulty_sd``), log discrimination N(0,
+        ``discrimination_sd``).  Items in ``labels`` that no response covers
+        are added with their prior.
+        """
+        import numpy as np
+
+        if model not in MODELS:
+            raise ValueError(f"Unknown IRT model {model!r} (expected one of {', '.join(MODELS)})")
+        labels = labels or {}
+        examinees = list(responses)
+        item_ids = sorted({item for answers in responses.values() for item in answers} | set(labels),
+                          key=lambda item: (not item.isdigit(), int(item) if item.isdigit() else 0, item))
+        column = {item: i for i, item in enumerate(item_ids)}
+        observed = np.zeros((len(examinees), len(item_ids)))
+        mask = np.zeros_like(observed)
+        for row, examinee in enumerate(examinees):
+            for item, correct in responses[examinee].items():
+                observed[row, column[item]] = correct
+                mask[row, column[item]] = 1.0
+        prior_b = np.array([difficulty_prior(labels.get(item)) for item in item_ids])
+        theta = np.zeros(len(examinees))
+        b = prior_b.copy()
+        log_a = np.zeros(len(item_ids))
+
+        def fit(theta, b, log_a):
+            a = np.exp(log_a)
+            p = 1.0 / (1.0 + np.exp(-a * (theta[:, None] - b[None, :])))
+            return a, (observed - p) * mask, p * (1.0 - p) * mask
+
+        for _ in range(iterations):
+            # One damped Newton step per parameter block, each on fresh probabilities
+            a, residual, weight = fit(theta, b, log_a)
+            step = ((a * residual).sum(axis=1) - theta) / ((a * a * weight).sum(axis=1) + 1.0)
+            theta = theta + np.clip(step, -1.0, 1.0)
+            change = np.abs(step).max(initial=0.0)
+            a, residual, weight = fit(theta, b, log_a)
+            step = (-(a * residual).sum(axis=0) - (b - prior_b) / difficulty_sd ** 2) / \
+                ((a * a * weight).sum(axis=0) + 1.0 / difficulty_sd ** 2)
+            b = b + np.clip(step, -1.0, 1.0)
+            change = max(change, np.abs(step).max(initial=0.0))
+            if model == "2pl":
+                a, residual, weight = fit(theta, b, log_a)
+                spread = theta[:, None] - b[None, :]
+                step = (((spread * a) * residual).sum(axis=0) - log_a / discrimination_sd ** 2) / \
+                    (((spread * a) ** 2 * weight).sum(axis=0) + 1.0 / discrimination_sd ** 2)
+                log_a = log_a + np.clip(step, -0.5, 0.5)
+                change = max(change, np.abs(step).max(initial=0.0))
+            if change < tolerance:
+                break
+
+        a, _, weight = fit(theta, b, log_a)
+        b_se = 1.0 / np.sqrt((a * a * weight).sum(axis=0) + 1.0 / difficulty_sd ** 2)
+        answers = mask.sum(axis=0)
+        items = {
+            item: ItemParams(item, round(float(a[i]), 4), round(float(b[i]), 4), round(float(b_se[i]), 4),
+                             int(answers[i]), str(labels.get(item) or ""))
+            for item, i in column.items()
+        }
+        abilities = {f"{examinee[0]} / {examinee[1]}": round(float(theta[row]), 4)
+                     for row, examinee in enumerate(examinees)}
+        return cls(items, abilities, model)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model,
+                "items": [asdict(params) for params in self.items.values()],
+                "abilities": self.abilities
+            }, f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        items = {entry["item"]: ItemParams(**entry) for entry in data["items"]}
+        return cls(items, data.get("abilities", {}), data.get("model", "2pl"))
+
+    def expected_accuracy(self, theta, items=None):
+        """Mean probability of a correct answer over ``items`` (default: the whole bank)."""
+        params = [self.items[item] for item in items] if items is not None else list(self.items.values())
+        return sum(p.probability(theta) for p in params) / len(params) if params else 0.0
+
+    def format_report(self):
+        calibrated = [params for params in self.items.values() if params.answers]
+        lines = [f"Item bank ({self.model}): {len(self.items)} questions, {len(calibrated)} calibrated "
+                 f"from past responses, {len(self.abilities)} examinees"]
+        by_label = {}
+        for params in self.items.values():
+            by_label.setdefault(params.label or "unlabelled", []).append(params)
+        for label, params in sorted(by_label.items(), key=lambda pair: sum(p.b for p in pair[1]) / len(pair[1])):
+            lines.append(f"  {label}: {len(params)} questions, mean difficulty {sum(p.b for p in params) / len(params):+.2f}, "
+                         f"mean discrimination {sum(p.a for p in params) / len(params):.2f}")
+        for examinee, theta in sorted(self.abilities.items(), key=lambda pair: -pair[1]):
+            lines.append(f"  {examinee}: ability {theta:+.2f} (expected accuracy {self.expected_accuracy(theta):.1%})")
+        return "\n".join(lines)
+
+
+def estimate_ability(bank, answers, prior_sd=1.0):
+    """EAP ability and its posterior standard deviation from ``[(item, correct), ...]``."""
+    log_posterior = []
+    for theta in _GRID:
+        log_p = -0.5 * (theta / prior_sd) ** 2
+        for item, correct in answers:
+            p = min(max(bank.items[item].probability(theta), 1e-12), 1 - 1e-12)
+            log_p += math.log(p) if correct else math.log(1.0 - p)
+        log_posterior.append(log_p)
+    peak = max(log_posterior)
+    weights = [math.exp(value - peak) for value in log_posterior]
+    total = sum(weights)
+    mean = sum(theta * weight for theta, weight in zip(_GRID, weights)) / total
+    variance = sum((theta - mean) ** 2 * weight for theta, weight in zip(_GRID, weights)) / total
+    return mean, math.sqrt(variance)
+
+
+class AdaptiveTest:
+    """
+    One computerized adaptive test: maximum-information item selection and
+    EAP scoring until the standard error reaches ``target_se`` (after at least
+    ``min_items`` answers) or ``max_items`` questions have been asked.
+    """
+
+    def __init__(self, bank, items=None, target_se=0.3, min_items=5, max_items=30, confidence=0.95):
+        self.bank = bank
+        self.remaining = [item for item in (items if items is not None else bank.items) if item in bank.items]
+        self.target_se = target_se
+        self.min_items = min_items
+        self.max_items = max_items
+        self.confidence = confidence
+        self.answers = []
+        self.asked = 0
+        self.trace = []
+        self.theta, self.se = estimate_ability(bank, [])
+
+    @property
+    def done(self):
+        if len(self.answers) >= self.min_items and self.se <= self.target_se:
+            return True
+        return self.asked >= self.max_items or not self.remaining
+
+    def stop_reason(self):
+        if len(self.answers) >= self.min_items and self.se <= self.target_se:
+            return f"standard error {self.se:.3f} <= {self.target_se:g}"
+        if self.asked >= self.max_items:
+            return f"reached {self.max_items} questions"
+        return "bank exhausted"
+
+    def next_item(self):
+        """The most informative unasked question at the current estimate, or None when the test is over."""
+        if self.done:
+            return None
+        item = max(self.remaining, key=lambda item: self.bank.items[item].information(self.theta))
+        self.remaining.remove(item)
+        self.asked += 1
+        return item
+
+    def record(self, item, correct):
+        """Score an answer; ``None`` (an errored call) uses up the question without moving the estimate."""
+        if correct is not None:
+            self.answers.append((item, bool(correct)))
+            self.theta, self.se = estimate_ability(self.bank, self.answers)
+        self.trace.append({"item": item, "correct": correct, "theta": round(self.theta, 4), "se": round(self.se, 4)})
+
+    def result(self):
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        return {
+            "theta": round(self.theta, 4),
+            "se": round(self.se, 4),
+            "calls": self.asked,
+            "answered": len(self.answers),
+            "bank_size": len(self.bank.items),
+            "stop_reason": self.stop_reason(),
+            "expected_accuracy": round(self.bank.expected_accuracy(self.theta), 4),
+            "accuracy_low": round(self.bank.expected_accuracy(self.theta - z * self.se), 4),
+            "accuracy_high": round(self.bank.expected_accuracy(self.theta + z * self.se), 4),
+            "trace": self.trace
+        }
+
+
+def run_adaptive(tests, make_item, run_batch, outcome):
+    """
+    Run several adaptive tests side by side.  Each round every open test
+    picks its next question, ``make_item(key, item)`` turns it into a work
+    item, ``run_batch`` runs them together, and ``outcome(completion)`` scores
+    each (True/False, None for an error).  Returns every completion in the
+    order it was run.
+    """
+    completions = []
+    while True:
+        round_items = {}
+        for key, test in tests.items():
+            item = test.next_item()
+            if item is not None:
+                round_items[key] = (item, make_item(key, item))
+        if not round_items:
+            return completions
+        finished = {id(completion.item): completion
+                    for completion in run_batch([work for _, work in round_items.values()])}
+        for key, (item, work) in round_items.items():
+            completion = finished.get(id(work))
+            tests[key].record(item, outcome(completion) if completion is not None else None)
+            if completion is not None:
+                completions.append(completion)
+
+
+def simulate(responses, labels=None, model="2pl", target_se=0.3, min_items=5, max_items=30):
+    """
+    Replay adaptive tests on recorded answers: for each (model, strategy) in
+    ``responses``, ask only the questions it has answered and compare the
+    expected accuracy the test ends with to its accuracy over all of them.
+
+    A bank fitted on the answers it is replayed against already knows them,
+    so each model is tested on a bank calibrated without any of its own
+    cells (leave one model out), as a new model would be.
+    """
+    banks = {}
+    rows = []
+    for (examinee, strategy), answers in responses.items():
+        if examinee not in banks:
+            held_out = {key: value for key, value in responses.items() if key[0] != examinee}
+            # Questions only the held-out model answered still enter the bank, at their prior
+            items = {item: None for key, values in responses.items() if key[0] == examinee for item in values}
+            banks[examinee] = ItemBank.calibrate(held_out, {**items, **(labels or {})}, model=model)
+        bank = banks[examinee]
+        test = AdaptiveTest(bank, items=list(answers), target_se=target_se, min_items=min_items, max_items=max_items)
+        while (item := test.next_item()) is not None:
+            test.record(item, answers[item] >= 0.5)
+        result = test.result()
+        full_accuracy = sum(answers.values()) / len(answers)
+        expected = bank.expected_accuracy(result["theta"], list(answers))
+        rows.append({
+            "model": examinee,
+            "strategy": strategy,
+            "calls": result["calls"],
+            "full_calls": len(answers),
+            "full_accuracy": round(full_accuracy, 4),
+            "expected_accuracy": round(expected, 4),
+            "error": round(abs(expected - full_accuracy), 4),
+            "theta": result["theta"],
+            "se": result["se"]
+        })
+    return rows
+
+
+def format_simulation(rows):
+    if not rows:
+        return "Simulation: no examinees."
+    calls = sum(row["calls"] for row in rows)
+    full = sum(row["full_calls"] for row in rows)
+    error = sum(row["error"] for row in rows) / len(rows)
+    worst = max(rows, key=lambda row: row["error"])
+    lines = [f"Adaptive replay (each model held out of calibration): {calls}/{full} calls "
+             f"({full / calls:.1f}x fewer), |expected - full accuracy| mean {error:.1%}, "
+             f"worst {worst['error']:.1%} ({worst['model']} / {worst['strategy']})"]
+    for row in rows:
+        lines.append(f"  {row['model']} / {row['strategy']}: {row['calls']}/{row['full_calls']} calls, "
+                     f"expected {row['expected_accuracy']:.1%} vs full {row['full_accuracy']:.1%}, "
+                     f"off by {row['error']:.1%} (ability {row['theta']:+.2f} +/- {row['se']:.2f})")
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+"""
+Append-only checkpoint journal for long evaluation runs.
+
+Drivers used to keep ``all_results`` in memory and only ``json.dump`` it at the
+very end, so a crash late in a sweep threw away every paid call.  A journal is
+a JSONL file: an optional header line describing the run (so ``--resume`` can
+rebuild exactly the same question sample), then one line per finished call
+holding the raw response.  Lines are flushed as they are written and fsynced
+in batches; a half-written last line from a crash is dropped on reopen.
+
+Because the journal keeps every raw response in full, it is also what
+``--rescore`` re-grades when an answer extractor changes.  Finished journals
+are compacted with ``compact_journal`` into ``.jsonl.gz`` (superseded retries
+dropped); a compacted journal can still be read, rescored or resumed.
+
+    {"type": "header", "input": "...", "models": [...], ...}
+    {"type": "result", "model": "gpt-4o", "strategy": "zero-shot", "key": "...",
+     "response": "...", "runtime": 1.8, "error": null}
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    """
+    JSONL journal keyed by (model, strategy, key).
+
+    ``fsync_every`` / ``fsync_seconds`` bound how many results (or how much
+    time) can be lost to a power failure; a plain process crash loses nothing
+    because every line is flushed to the OS as soon as it is written.
+    """
+
+    def __init__(self, path, resume=False, read_only=False, fsync_every=20, fsync_seconds=5.0):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_seconds = fsync_seconds
+        self.header = None
+        self.records = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+        if resume or read_only:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No journal at {path}")
+            self._load()
+        if read_only:
+            self._file = None
+            return
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if resume and path.endswith(".gz"):
+            # Resuming a compacted journal: continue in a plain file next to it
+            self.path = path[:-len(".gz")]
+            self._file = open(self.path, "w", encoding="utf-8")
+            for entry in ([self.header] if self.header else []) + list(self.records.values()):
+                self._write(entry, force_sync=entry is self.header)
+            self.sync()
+        elif resume:
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+
+    def _load(self):
+        if self.path.endswith(".gz"):
+            with gzip.open(self.path, "rb") as f:
+                data = f.read()
+        else:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            # Drop a trailing partial line left by a crash mid-write
+            good_end = data.rfind(b"\n") + 1
+            if good_end < len(data):
+                with open(self.path, "r+b") as f:
+                    f.truncate(good_end)
+                data = data[:good_end]
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("type") == "header":
+                self.header = entry
+            elif entry.get("type") == "result":
+                self.records[(entry["model"], entry["strategy"], entry["key"])] = entry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, model, strategy, key):
+        """
+        The entry for a cell.  Entries loaded from disk carry their response;
+        ones recorded by this process do not (see ``record``).
+        """
+        return self.records.get((model, strategy, key))
+
+    def is_done(self, model, strategy, key):
+        """True if the cell already has a successful (error-free) entry."""
+        entry = self.records.get((model, strategy, key))
+        return entry is not None and entry.get("error") is None
+
+    def write_header(self, **fields):
+        self.header = {"type": "header", **fields}
+        self._write(self.header, force_sync=True)
+
+    def record(self, model, strategy, key, response, runtime, error=None, **extra):
+        """Append one finished call; returns the stored entry."""
+        entry = {
+            "type": "result",
+            "model": model,
+            "strategy": strategy,
+            "key": key,
+            "response": response,
+            "runtime": runtime,
+            "error": error,
+            **extra
+        }
+        self._write(entry)
+        # The response is on disk now; only keep what resume bookkeeping needs
+        self.records[(model, strategy, key)] = {k: v for k, v in entry.items() if k != "response"}
+        return entry
+
+    def _write(self, entry, force_sync=False):
+        if self._file is None:
+            raise ValueError(f"Journal {self.path} is open read-only")
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            now = time.monotonic()
+            if force_sync or self._pending >= self.fsync_every or now - self._last_sync >= self.fsync_seconds:
+                os.fsync(self._file.fileno())
+                self._pending = 0
+                self._last_sync = now
+
+    def sync(self):
+        with self._lock:
+            if self._file is None or self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+
+
+def compact_journal(path):
+    """
+    Rewrite a finished journal as ``<path>.gz`` holding only the header and
+    the latest entry per cell, then remove the plain file.  Returns the new
+    path.  The rewrite goes through a temporary file, so a crash part-way
+    leaves the original untouched.
+    """
+    journal = Journal(path, read_only=True)
+    compact_path = path + ".gz"
+    tmp_path = compact_path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for entry in ([journal.header] if journal.header else []) + list(journal.records.values()):
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, compact_path)
+    os.remove(path)
+    return compact_path
@@ -0,0 +1,59 @@
+"""
+Deferred imports for the driver entry points.
+
+``from g4f.client import Client`` at the top of a driver pulls in g4f's whole
+provider tree (aiohttp, curl_cffi, browser-cookie helpers, ...) before
+argparse has even looked at ``sys.argv``, so ``--help``, ``--rescore`` or a
+replay from the cache paid for a client they never use.  ``lazy_import``
+returns a stand-in that performs the import the first time it is called or
+an attribute is read:
+
+    Client = lazy_import("g4f.client", "Client")
+
+    client = Client()          # g4f is imported here, not at module load
+
+``python -m evalkit importtime`` checks that the entry points stay that way.
+"""
+
+import importlib
+import threading
+
+
+class LazyImport:
+    """Stand-in for ``module`` (or ``module.attribute``) that is imported on first use."""
+
+    def __init__(self, module, attribute=None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    target = importlib.import_module(self._module)
+                    if self._attribute:
+                        target = getattr(target, self._attribute)
+                    self._target = target
+        return self._target
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        name = f"{self._module}.{self._attribute}" if self._attribute else self._module
+        return f"<lazy {name}{'' if self.loaded else ' (not imported)'}>"
+
+
+def lazy_import(module, attribute=None):
+    return LazyImport(module, attribute)
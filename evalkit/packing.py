@@ -0,0 +1,213 @@
+"""
+Passage-packed requests: one call per passage with all of its questions.
+
+The reading and listening drivers send the whole passage (or conversation
+transcript) again for every question, so a passage with five questions costs
+five calls and five copies of the same text.  Packing groups a driver's usual
+per-question work items by (model, strategy, passage), sends each group as one
+numbered multi-question prompt, and splits the reply back into one completion
+per original item, so grading and the result files keep their shape:
+
+    packed = pack_items(items, lambda item: item.meta["passage"], build_packed_prompt)
+    completions = unpack_completions(run_items(client, packed))
+
+Each per-question completion's response is just its parsed answer; the whole
+reply (reasoning included) stays on ``packed_response`` and ``packed_fields``
+adds it to the question's result details, so packed runs can be audited and
+rescored.
+
+The prompt ends with ``answer_instructions``, which asks for one
+``<number>: <letter>`` line per question (after a ``Final Answers:`` line when
+the strategy reasons first); ``parse_answers`` reads those lines back.  A
+question the reply does not answer becomes an error for that question only.
+
+Packing changes what the model sees, so ``parity_rows`` compares the per-question
+correctness of a packed and an unpacked run of the same items, and
+``request_savings`` the calls and prompt characters each needed.
+"""
+
+import csv
+import re
+from collections import OrderedDict
+
+from .engine import Completion, WorkItem, user_message
+from .estimate import CHARS_PER_TOKEN, message_size
+
+_FINAL_ANSWERS = re.compile(r"final\s+answers?\s*[:：]?", re.IGNORECASE)
+_ANSWER_LINE = re.compile(
+    r"^[\s>*#-]*(?:q(?:uestion)?\s*)?(\d+)\s*[*]*\s*[:.)\-]\s*[*]*\s*(?:answer\s*[:：]?\s*)?"
+    r"\(?([A-J](?:\s*(?:,|and|&)\s*[A-J])*)\)?(?![A-Za-z])",
+    re.IGNORECASE | re.MULTILINE
+)
+# An answer line with nothing after the letters, for replies without a "Final Answers:" line
+_BARE_ANSWER_LINE = re.compile(_ANSWER_LINE.pattern + r"[\s*_.)]*$", re.IGNORECASE)
+
+
+def format_questions(questions):
+    """Numbered question blocks from ``[(question text, {letter: option}), ...]``."""
+    blocks = []
+    for number, (text, options) in enumerate(questions, start=1):
+        block = f"Question {number}: {text}\nOptions:\n"
+        for letter, option in options.items():
+            block += f"{letter}: {option}\n"
+        blocks.append(block)
+    return "\n".join(blocks) + "\n"
+
+
+def answer_instructions(count, reasoning=False):
+    """The structured answer format ``parse_answers`` expects."""
+    lines = "\n".join(f"{number}: <letter>" for number in range(1, count + 1))
+    if reasoning:
+        return (f"Work through each question step by step. Then finish with a line reading 'Final Answers:' "
+                f"followed by exactly one line per question in this format:\n{lines}")
+    return (f"Answer all {count} questions. Reply with exactly one line per question in this format, "
+            f"and nothing else:\n{lines}")
+
+
+def parse_answers(response, count):
+    """
+    Answers ``["B", "A, C", "", ...]`` for questions 1..count; "" when a
+    question has no answer line.  Only the text after the last ``Final
+    Answers:`` is read when there is one, and a later line for the same
+    number wins.  Without that line only the block of bare answer lines
+    closing the reply is read, so numbered reasoning such as ``1. A is wrong
+    because ...`` is never taken for an answer.
+    """
+    answers = [""] * count
+    text = response or ""
+    finals = list(_FINAL_ANSWERS.finditer(text))
+    if finals:
+        matches = _ANSWER_LINE.finditer(text[finals[-1].end():])
+    else:
+        matches = []
+        for line in reversed(text.strip().splitlines()):
+            match = _BARE_ANSWER_LINE.match(line)
+            if match is None:
+                break
+            matches.insert(0, match)
+    for match in matches:
+        number = int(match.group(1))
+        if 1 <= number <= count:
+            answers[number - 1] = ", ".join(re.findall(r"\b[A-J]\b", match.group(2).upper()))
+    return answers
+
+
+def pack_items(items, group_of, prompt_of):
+    """
+    One work item per (model, strategy, ``group_of(item)``), in the order the
+    groups first appear; ``prompt_of(members)`` builds its prompt from the
+    original items.  The members are kept in ``meta["members"]``.
+    """
+    groups = OrderedDict()
+    for item in items:
+        groups.setdefault((item.model, item.strategy, group_of(item)), []).append(item)
+    return [
+        WorkItem(
+            model=model,
+            strategy=strategy,
+            key="packed:" + "+".join(member.key for member in members),
+            messages=user_message(prompt_of(members)),
+            # A packed response holds several answers, so it is never cut at the first one
+            params={name: value for name, value in members[0].params.items() if name != "stop_at_answer"},
+            meta={"members": members}
+        )
+        for (model, strategy, _), members in groups.items()
+    ]
+
+
+def unpack_completions(completions):
+    """
+    Per-question completions of packed calls, in member order.  Each carries
+    the parsed answer as its response, the packed call's reply as
+    ``packed_response`` and an equal share of its runtime, so per-question and
+    total runtimes stay comparable with an unpacked run.
+    """
+    unpacked = []
+    for completion in completions:
+        members = completion.item.meta["members"]
+        if not completion.ok:
+            unpacked.extend(Completion(member, error=completion.error) for member in members)
+            continue
+        runtime = round(completion.runtime / len(members), 2) if completion.runtime is not None else None
+        for number, (member, answer) in enumerate(zip(members, parse_answers(completion.response, len(members))), 1):
+            if answer:
+                unpacked.append(Completion(member, response=answer, runtime=runtime,
+                                           packed_response=completion.response))
+            else:
+                unpacked.append(Completion(member, error=f"no answer for question {number} in packed response",
+                                           packed_response=completion.response))
+    return unpacked
+
+
+def packed_fields(completion):
+    """The whole reply of the packed call a question was answered in, for result details."""
+    return {} if completion.packed_response is None else {"packed_response": completion.packed_response}
+
+
+def request_savings(unpacked_items, packed_items):
+    """Calls and prompt characters (text only) of the two ways of sending the same questions."""
+    def totals(items):
+        return len(items), sum(message_size(item.messages)[0] for item in items)
+
+    calls, chars = totals(unpacked_items)
+    packed_calls, packed_chars = totals(packed_items)
+    return {
+        "calls": calls,
+        "packed_calls": packed_calls,
+        "input_tokens": int(chars / CHARS_PER_TOKEN),
+        "packed_input_tokens": int(packed_chars / CHARS_PER_TOKEN)
+    }
+
+
+def parity_rows(unpacked, packed):
+    """
+    Per (model, strategy) comparison of two ``{(model, strategy, key):
+    correct}`` maps (None for an error) on the questions both answered.
+    """
+    cells = OrderedDict()
+    for key in unpacked:
+        if key in packed and unpacked[key] is not None and packed[key] is not None:
+            cells.setdefault(key[:2], []).append((bool(unpacked[key]), bool(packed[key])))
+    for key in packed:
+        cells.setdefault(key[:2], [])
+    rows = []
+    for (model, strategy), pairs in cells.items():
+        shared = len(pairs)
+        rows.append({
+            "model": model,
+            "strategy": strategy,
+            "shared": shared,
+            "unpacked_accuracy": sum(a for a, _ in pairs) / shared if shared else 0.0,
+            "packed_accuracy": sum(b for _, b in pairs) / shared if shared else 0.0,
+            "agreement": sum(a == b for a, b in pairs) / shared if shared else 0.0,
+            "only_unpacked": sum(a and not b for a, b in pairs),
+            "only_packed": sum(b and not a for a, b in pairs),
+            "unpacked_errors": sum(1 for key, value in unpacked.items() if key[:2] == (model, strategy) and value is None),
+            "packed_errors": sum(1 for key, value in packed.items() if key[:2] == (model, strategy) and value is None)
+        })
+    return rows
+
+
+def format_parity(rows, savings=None):
+    lines = []
+    if savings:
+        lines.append(f"Packed requests: {savings['packed_calls']} calls instead of {savings['calls']}, "
+                     f"~{savings['packed_input_tokens']:,} input tokens instead of ~{savings['input_tokens']:,}")
+    for row in rows:
+        lines.append(f"  {row['model']} / {row['strategy']}: unpacked {row['unpacked_accuracy']:.1%}, "
+                     f"packed {row['packed_accuracy']:.1%} on {row['shared']} questions, "
+                     f"{row['agreement']:.1%} same grade ({row['only_unpacked']} right only unpacked, "
+                     f"{row['only_packed']} only packed; errors {row['unpacked_errors']}/{row['packed_errors']})")
+    return "\n".join(lines) if lines else "Packed requests: nothing to compare."
+
+
+def write_parity_csv(rows, path):
+    fields = ["model", "strategy", "shared", "unpacked_accuracy", "packed_accuracy", "agreement",
+              "only_unpacked", "only_packed", "unpacked_errors", "packed_errors"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({name: round(value, 4) if isinstance(value, float) else value
+                             for name, value in row.items()})
+    return path
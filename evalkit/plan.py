@@ -0,0 +1,236 @@
+"""
+Plan-driven sweeps: many datasets, models, strategies and sample sizes in one process.
+
+The per-model driver copies (``Geometry_gpt4o.py`` vs ``Geometry_llama.py``,
+``C_S_GPT-4o.py`` vs ``C_S_llama.py``) differ only in their ``--models``
+default, so a sweep used to start one interpreter per model, each importing
+g4f and re-reading the same question file.  A plan names the driver family
+once and lists what to run:
+
+    {
+      "seed": 0,
+      "defaults": {"timeout": 120, "temp": 0.3},
+      "runs": [
+        {"driver": "../SAT/Craft_and_Structure/C_S_GPT-4o.py",
+         "inputs": ["../SAT/Craft_and_Structure/Craft_and_Structure.json"],
+         "models": ["gpt-4o", "gpt-4o-mini", "llama-3.1-70b"],
+         "strategies": ["zero-shot", "chain-of-thought"],
+         "grid": {"questions_per_type": [10, 20]},
+         "output": "../SAT/Craft_and_Structure/results"}
+      ]
+    }
+
+Every run is expanded into cells (driver × input × grid point), each dataset
+is opened once, every driver module is imported once (``main`` is not run),
+and all calls of all cells go through one client, cache, rate limiter and
+engine run.  Runs that share a cell -- within one plan or across several
+plan files -- share its question sample, and calls with identical model,
+messages and parameters are sent once and fanned out to every cell that
+needs them.  Each run then writes its usual result files through the
+driver's own grading and report code.
+
+A driver takes part by defining three functions next to its ``main``:
+
+    select_questions(dataset, args)                   -> selection
+    build_work_items(selection, args)                 -> [WorkItem]
+    report_results(completions, selection, args)      -> writes the result files
+
+and listing the options those hooks read, besides ``DEFAULT_ARGS``, in
+``PLAN_ARGS``.  A run or grid key the driver does not read is a ``PlanError``
+rather than a silently ignored option; ``defaults`` only reach the drivers
+that read them.
+
+Relative paths in a plan are resolved against the plan file's folder, and
+runs with a ``grid`` write each grid point's files to a sub-folder of their
+``output`` (``questions_per_type=10``, ...).
+
+    python -m evalkit plan sweeps/sat.json sweeps/sat_extra.json --concurrency 32
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+from datetime import datetime
+from itertools import product
+
+from .cache import cache_key
+from .datasets import open_dataset
+from .engine import Completion, WorkItem, run_items
+
+# Driver arguments used by the hooks that the plan does not have to spell out
+DEFAULT_ARGS = {"timeout": 120, "temp": 0.3, "verbose": False}
+HOOKS = ("select_questions", "build_work_items", "report_results")
+
+
+class PlanError(ValueError):
+    """Raised for plan files that cannot be run."""
+
+
+def _resolve(path, base):
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base, path))
+
+
+def _freeze(value):
+    return json.dumps(value, sort_keys=True)
+
+
+class Cell:
+    """One question sample: a driver, an input file and the driver arguments shared by its runs."""
+
+    def __init__(self, driver, input_path, options):
+        self.driver = driver
+        self.input = input_path
+        self.options = options
+        self.models = []
+        self.strategies = []
+        self.reports = []
+        self.selection = None
+        self.items = []
+
+    @property
+    def key(self):
+        return (self.driver, self.input, _freeze(self.options))
+
+    def add_run(self, models, strategies, output):
+        for model in models:
+            if model not in self.models:
+                self.models.append(model)
+        for strategy in strategies:
+            if strategy not in self.strategies:
+                self.strategies.append(strategy)
+        report = (output, tuple(models), tuple(strategies))
+        if report not in self.reports:
+            self.reports.append(report)
+
+    def args(self, models=None, strategies=None, output=None):
+        return argparse.Namespace(
+            **{**DEFAULT_ARGS, **self.options},
+            input=self.input,
+            models=list(models or self.models),
+            strategies=list(strategies or self.strategies),
+            output=output
+        )
+
+
+def load_plans(paths):
+    """Expand plan files into cells, merging the runs that share one."""
+    cells = {}
+    seed = None
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            plan = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        if seed is None:
+            seed = plan.get("seed")
+        defaults = plan.get("defaults", {})
+        for number, run in enumerate(plan.get("runs", []), 1):
+            own = set(run)
+            run = {**defaults, **run}
+            missing = [key for key in ("driver", "models", "strategies", "output") if key not in run]
+            if missing or not (run.get("inputs") or run.get("input")):
+                raise PlanError(f"{path}: run {number} needs driver, inputs, models, strategies and output "
+                                f"(missing {', '.join(missing) or 'inputs'})")
+            inputs = run.pop("inputs", None) or [run.pop("input")]
+            grid = run.pop("grid", {})
+            driver = _resolve(run.pop("driver"), base)
+            models, strategies = run.pop("models"), run.pop("strategies")
+            output = _resolve(run.pop("output"), base)
+            known = set(DEFAULT_ARGS) | set(getattr(load_driver(driver), "PLAN_ARGS", ()))
+            unknown = sorted((set(run) & own | set(grid)) - known)
+            if unknown:
+                raise PlanError(f"{path}: run {number} sets {', '.join(unknown)}, which {os.path.basename(driver)} "
+                                f"does not read (it takes {', '.join(sorted(known))})")
+            run = {name: value for name, value in run.items() if name in known}
+            names = sorted(grid)
+            for input_path, values in product(inputs, product(*(grid[name] for name in names))):
+                point = dict(zip(names, values))
+                cell = Cell(driver, _resolve(input_path, base), {**run, **point})
+                cell = cells.setdefault(cell.key, cell)
+                # Each grid point writes to its own folder so their timestamped files cannot collide
+                folder = "_".join(f"{name}={value}" for name, value in point.items())
+                cell.add_run(models, strategies, os.path.join(output, folder) if folder else output)
+    return list(cells.values()), seed
+
+
+def load_driver(path, _modules={}):
+    """Import a driver script as a module (its ``main`` is not run), once per path."""
+    module = _modules.get(path)
+    if module is None:
+        name = "evalkit_driver_" + "".join(c if c.isalnum() else "_" for c in os.path.relpath(path))
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        missing = [hook for hook in HOOKS if not hasattr(module, hook)]
+        if missing:
+            raise PlanError(f"{path} does not define the plan hooks {', '.join(missing)}")
+        _modules[path] = module
+    return module
+
+
+def prepare(cells, seed=None):
+    """
+    Sample every cell and build its work items; returns the distinct calls
+    as ``{digest: WorkItem}`` in first-seen order.
+    """
+    if seed is not None:
+        random.seed(seed)
+    datasets = {}
+    calls = {}
+    for cell in cells:
+        driver = load_driver(cell.driver)
+        dataset = datasets.get(cell.input)
+        if dataset is None:
+            dataset = datasets[cell.input] = open_dataset(cell.input)
+        args = cell.args()
+        cell.selection = driver.select_questions(dataset, args)
+        cell.items = []
+        for item in driver.build_work_items(cell.selection, args):
+            digest = cache_key(item.model, item.messages, item.params)
+            calls.setdefault(digest, WorkItem(item.model, item.strategy, digest, item.messages, item.params))
+            cell.items.append((digest, item))
+    return calls
+
+
+def _display(path):
+    relative = os.path.relpath(path)
+    return path if relative.startswith("..") else relative
+
+
+def format_plan(cells, calls):
+    lines = []
+    for cell in cells:
+        options = ", ".join(f"{name}={value}" for name, value in sorted(cell.options.items()))
+        lines.append(f"{_display(cell.driver)} on {_display(cell.input)}"
+                     f"{f' ({options})' if options else ''}: {len(cell.items)} calls, "
+                     f"{len(cell.models)} models x {len(cell.strategies)} strategies, {len(cell.reports)} reports")
+    requested = sum(len(cell.items) for cell in cells)
+    lines.append(f"{requested} calls requested, {len(calls)} distinct ({requested - len(calls)} shared)")
+    return "\n".join(lines)
+
+
+def run_plan(cells, calls, client, journal, max_in_flight=32, limiter=None, max_retries=1,
+             concurrency=None, on_complete=None):
+    """Run every distinct call once, then write each run's results through its driver."""
+    items = list(calls.values())
+    completions = run_items(client, items, max_in_flight=max_in_flight, on_complete=on_complete,
+                            limiter=limiter, max_retries=max_retries, journal=journal, concurrency=concurrency)
+    by_digest = {completion.item.key: completion for completion in completions}
+    journal.close()
+    for cell in cells:
+        driver = load_driver(cell.driver)
+        for output, models, strategies in cell.reports:
+            os.makedirs(output, exist_ok=True)
+            cell_completions = [
+                Completion(item, by_digest[digest].response, by_digest[digest].runtime, by_digest[digest].error)
+                for digest, item in cell.items if item.model in models and item.strategy in strategies
+            ]
+            driver.report_results(cell_completions, cell.selection, cell.args(models, strategies, output))
+    return by_digest
+
+
+def default_journal_path(plan_path):
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(os.path.dirname(os.path.abspath(plan_path)), f"plan_journal_{stamp}.jsonl")
+
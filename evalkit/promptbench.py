@@ -0,0 +1,181 @@
+"""
+Micro-benchmark of the drivers' prompt builders.
+
+Loads each driver in ``DRIVERS`` as a module (their ``main`` is not run),
+builds the prompt of every question in its dataset under every strategy, and
+reports the cost per prompt: once for the first pass, which includes
+compiling any templates, and as the best of ``repeat`` warm passes.
+
+    python -m evalkit promptbench
+    python -m evalkit promptbench --save_baseline .cache/promptbench.json
+    python -m evalkit promptbench C_S TOFELPARA --baseline .cache/promptbench.json
+
+Prompts are built exactly as the drivers send them (default layout, fixed
+seed for sampled examples), so the check that the output did not change is
+the prompts' digest, which is reported with the timings and compared with
+the baseline.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from .importtime import REPO_ROOT
+
+STRATEGIES = ("zero-shot", "five-shot", "chain-of-thought")
+
+
+def _craft_and_structure(module, path):
+    with open(path, "r", encoding="utf-8") as f:
+        questions = json.load(f)["questions"]
+    return [lambda q=q, s=s: module.build_messages(q, q.get("skill", ""), s)
+            for s in STRATEGIES for q in questions]
+
+
+def _tofel_reading(module, path):
+    with open(path, "r", encoding="utf-8") as f:
+        passages = json.load(f)
+    return [lambda p=p, q=q, s=s: module.build_messages(p.get("PARAGRAPH", ""), q, s)
+            for s in STRATEGIES for p in passages for q in p.get("questions", [])]
+
+
+def _tofel_listening(module, path):
+    with open(path, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+    rng = random.Random(0)
+    builders = []
+    for s in STRATEGIES:
+        for conversation in conversations:
+            for q_idx in range(len(conversation.get("questions", []))):
+                examples = rng.sample(conversations, min(5, len(conversations))) if s == "five-shot" else None
+                builders.append(lambda c=conversation, s=s, i=q_idx, e=examples: module.build_prompt(c, s, i, e))
+    return builders
+
+
+def _gmat_quant(module, path):
+    with open(path, "r", encoding="utf-8") as f:
+        questions = json.load(f)["Allquestions"]
+    return [lambda q=q, s=s: module.build_messages(q, s) for s in STRATEGIES for q in questions]
+
+
+def _geometry(module, path):
+    with open(path, "r", encoding="utf-8") as f:
+        questions = [q for q in json.load(f) if "img" not in q]
+    # One examples sample per cell, as plan_cells draws them
+    examples = random.Random(0).sample(questions, 5)
+    return [lambda q=q, s=s: module.build_prompt(s, q, examples) for s in STRATEGIES for q in questions]
+
+
+# name -> (driver, dataset, function returning one zero-argument builder per prompt)
+DRIVERS = {
+    "C_S": ("SAT/Craft_and_Structure/C_S_GPT-4o.py", "SAT/Craft_and_Structure/Craft_and_Structure.json",
+            _craft_and_structure),
+    "Geometry": ("SAT/Geometry/Geometry_gpt4o.py", "SAT/Geometry/Geometry_and_Trigonometry.json", _geometry),
+    "GMAT_Quant": ("GMAT/Quant/cat.py", "GMAT/Quant/ProblemSolving.json", _gmat_quant),
+    "TOFELPARA": ("TOFEL/Reading/TOFELPARA.py", "TOFEL/Reading/TOFELPARA.json", _tofel_reading),
+    "T_L": ("TOFEL/listening /T_L_gpt4o.py", "TOFEL/listening /TOFELFILELIESTINGWITHOUTMP3.json", _tofel_listening),
+}
+
+
+@dataclass
+class BuildTiming:
+    """Prompt build cost of one driver; times are in microseconds per prompt."""
+    name: str
+    prompts: int = 0
+    first_us: float = 0.0
+    warm_us: float = 0.0
+    chars: int = 0
+    digest: str = ""
+    error: str = ""
+
+
+def load_driver(path):
+    """Import a driver script as a module without running its ``main``."""
+    name = "_promptbench_" + os.path.splitext(os.path.basename(path))[0].replace("-", "_").replace(" ", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _text(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    return "\x00".join(f"{message['role']}\x00{message['content']}" for message in prompt)
+
+
+def time_builders(name, builders, repeat=5):
+    """Cold and best-of-``repeat`` warm cost of calling every builder once."""
+    timing = BuildTiming(name, prompts=len(builders))
+    if not builders:
+        return timing
+    start = time.perf_counter()
+    prompts = [builder() for builder in builders]
+    timing.first_us = (time.perf_counter() - start) * 1e6 / len(builders)
+    best = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        for builder in builders:
+            builder()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    timing.warm_us = best * 1e6 / len(builders)
+    texts = [_text(prompt) for prompt in prompts]
+    timing.chars = sum(len(text) for text in texts)
+    timing.digest = hashlib.sha256("\x01".join(texts).encode("utf-8")).hexdigest()[:16]
+    return timing
+
+
+def benchmark(names=None, repeat=5, root=REPO_ROOT):
+    results = []
+    for name in names or DRIVERS:
+        driver, dataset, cases = DRIVERS[name]
+        try:
+            module = load_driver(os.path.join(root, driver))
+            builders = cases(module, os.path.join(root, dataset))
+        except Exception as e:
+            results.append(BuildTiming(name, error=f"{type(e).__name__}: {e}"))
+            continue
+        results.append(time_builders(name, builders, repeat=repeat))
+    return results
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({result.name: {"warm_us": round(result.warm_us, 2), "first_us": round(result.first_us, 2),
+                                 "digest": result.digest} for result in results if not result.error}, f, indent=2)
+
+
+def format_report(results, baseline=None):
+    lines = []
+    for result in results:
+        if result.error:
+            lines.append(f"{result.name}: failed ({result.error})")
+            continue
+        line = (f"{result.name}: {result.prompts} prompts, {result.warm_us:.1f} us/prompt warm, "
+                f"{result.first_us:.1f} us/prompt first pass, {result.chars / max(1, result.prompts):,.0f} chars/prompt "
+                f"(digest {result.digest})")
+        before = (baseline or {}).get(result.name)
+        if before:
+            speedup = before["warm_us"] / result.warm_us if result.warm_us else 0.0
+            same = "same prompts" if before.get("digest") == result.digest else "PROMPTS CHANGED"
+            line += f"; baseline {before['warm_us']:.1f} us/prompt, {speedup:.1f}x, {same}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def changed(results, baseline):
+    """Drivers whose prompts differ from the baseline's."""
+    return [result.name for result in results
+            if not result.error and result.name in baseline and baseline[result.name].get("digest") != result.digest]
+
@@ -0,0 +1,212 @@
+"""
+Prefix-stable prompt layout, and a harness to measure what it buys.
+
+Providers that cache prompts (OpenAI, Anthropic, Gemini and most vLLM/SGLang
+deployments) reuse the work for the longest prefix a request shares with a
+recent one.  The drivers' prompts start with whatever is specific to the
+question, like the question type in the instructions, so two requests rarely
+share more than a sentence, even though the five-shot block after it is the
+same for every question of a type.  ``PromptParts`` keeps a prompt's segments
+apart and lays them out from most static to most dynamic:
+
+    instructions   same for every question of a strategy
+    examples       few-shot block, same for every question of a type
+    passage        shared by the questions of one passage
+    question       the question and its options
+
+``messages()`` sends the first two as a system message and the rest as the
+user message, so every question of a (model, strategy, type) cell starts with
+the same bytes.  g4f providers that only take a single prompt flatten the
+messages in order, which keeps that property.
+
+``prefix_reuse`` predicts how many input tokens a provider could serve from
+its cache for a list of work items, sent in order.  ``compare_layouts`` sends
+the same questions in the driver's original layout and in the stable one,
+alternating which goes first, and records time to first token (with
+``stream=True``) and total latency for each call:
+
+    rows = compare_layouts(Client(), list(zip(legacy_items, stable_items)))
+    print(format_layout_report(rows))
+
+The answers themselves are not graded; run the driver with ``--layout stable``
+to compare accuracy.
+"""
+
+import bisect
+import csv
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from statistics import median
+
+from .estimate import CHARS_PER_TOKEN, message_size
+
+LAYOUTS = ("legacy", "stable")
+
+# OpenAI caches prompts of at least 1024 tokens, in 128-token steps; the others are similar
+MIN_CACHED_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+def _join(*segments):
+    return "\n\n".join(segment.strip("\n") for segment in segments if segment)
+
+
+@dataclass
+class PromptParts:
+    """The segments of one prompt, from most static to most dynamic."""
+    instructions: str = ""
+    examples: str = ""
+    passage: str = ""
+    question: str = ""
+
+    def messages(self):
+        """System message with the static segments, user message with the rest."""
+        system = _join(self.instructions, self.examples)
+        user = {"role": "user", "content": _join(self.passage, self.question)}
+        return [{"role": "system", "content": system}, user] if system else [user]
+
+
+def _request_text(messages):
+    """Roughly the byte stream a provider sees, for prefix comparisons."""
+    return "".join(f"<{message['role']}>{message.get('content', '')}" for message in messages
+                   if isinstance(message.get("content", ""), str))
+
+
+def _common_prefix(a, b):
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def cacheable_tokens(prefix_chars, min_tokens=MIN_CACHED_TOKENS, block_tokens=CACHE_BLOCK_TOKENS):
+    """Tokens of a shared prefix a provider would serve from cache."""
+    tokens = int(prefix_chars / CHARS_PER_TOKEN)
+    if tokens < min_tokens:
+        return 0
+    return tokens // block_tokens * block_tokens
+
+
+def prefix_reuse(items, min_tokens=MIN_CACHED_TOKENS, block_tokens=CACHE_BLOCK_TOKENS):
+    """
+    ``{model: {"calls", "input_tokens", "shared_tokens", "cacheable_tokens"}}``
+    for ``items`` sent in order.  Each request is compared with every earlier
+    request to the same model (the longest common prefix is with a neighbour
+    in sorted order), so this assumes the provider's cache outlives the run.
+    """
+    seen = {}
+    stats = OrderedDict()
+    for item in items:
+        text = _request_text(item.messages)
+        earlier = seen.setdefault(item.model, [])
+        position = bisect.bisect_left(earlier, text)
+        shared = max([_common_prefix(text, earlier[i]) for i in (position - 1, position) if 0 <= i < len(earlier)],
+                     default=0)
+        bisect.insort(earlier, text, lo=position)
+        row = stats.setdefault(item.model, {"calls": 0, "input_tokens": 0, "shared_tokens": 0, "cacheable_tokens": 0})
+        row["calls"] += 1
+        row["input_tokens"] += int(message_size(item.messages)[0] / CHARS_PER_TOKEN)
+        row["shared_tokens"] += int(shared / CHARS_PER_TOKEN)
+        row["cacheable_tokens"] += cacheable_tokens(shared, min_tokens, block_tokens)
+    return stats
+
+
+def format_prefix_reuse(stats, label=""):
+    lines = [f"Prompt prefix reuse{f' ({label})' if label else ''}:"]
+    for model, row in stats.items():
+        share = row["cacheable_tokens"] / row["input_tokens"] if row["input_tokens"] else 0.0
+        lines.append(f"  {model}: {row['calls']} calls, ~{row['input_tokens']:,} input tokens, "
+                     f"~{row['shared_tokens']:,} in shared prefixes, ~{row['cacheable_tokens']:,} cacheable ({share:.1%})")
+    return "\n".join(lines) if stats else "Prompt prefix reuse: no calls."
+
+
+def _chunk_text(chunk):
+    choice = chunk.choices[0] if getattr(chunk, "choices", None) else None
+    if choice is None:
+        return ""
+    delta = getattr(choice, "delta", None) or getattr(choice, "message", None)
+    return getattr(delta, "content", None) or ""
+
+
+def timed_call(client, item):
+    """
+    One streamed call: ``{"ttft", "latency", "response", "error"}``.  A
+    client that ignores ``stream`` and returns a whole completion gets no
+    time to first token.
+    """
+    start_time = time.perf_counter()
+    ttft = None
+    try:
+        stream = client.chat.completions.create(model=item.model, messages=item.messages, stream=True, **item.params)
+        if hasattr(stream, "choices"):
+            response = _chunk_text(stream)
+        else:
+            parts = []
+            for chunk in stream:
+                text = _chunk_text(chunk)
+                if text and ttft is None:
+                    ttft = time.perf_counter() - start_time
+                parts.append(text)
+            response = "".join(parts)
+    except Exception as e:
+        return {"ttft": None, "latency": time.perf_counter() - start_time, "response": None, "error": str(e)}
+    return {"ttft": ttft, "latency": time.perf_counter() - start_time, "response": response.strip(), "error": None}
+
+
+def compare_layouts(client, pairs, on_call=None):
+    """
+    Send each ``(legacy_item, stable_item)`` pair one call at a time,
+    alternating which layout goes first so neither always gets the warmer
+    connection.  Calls are sequential so they do not slow each other down.
+    Returns one row per call.
+    """
+    rows = []
+    for index, pair in enumerate(pairs):
+        order = (("legacy", pair[0]), ("stable", pair[1]))
+        for layout, item in (order if index % 2 == 0 else order[::-1]):
+            result = timed_call(client, item)
+            row = {
+                "model": item.model,
+                "strategy": item.strategy,
+                "key": item.key,
+                "layout": layout,
+                "input_tokens": int(message_size(item.messages)[0] / CHARS_PER_TOKEN),
+                "ttft": None if result["ttft"] is None else round(result["ttft"], 3),
+                "latency": round(result["latency"], 3),
+                "error": result["error"]
+            }
+            rows.append(row)
+            if on_call:
+                on_call(row)
+    return rows
+
+
+def format_layout_report(rows):
+    """Median time to first token and latency per (model, strategy, layout)."""
+    cells = OrderedDict()
+    for row in rows:
+        cell = cells.setdefault((row["model"], row["strategy"]), {layout: [] for layout in LAYOUTS})
+        if row["error"] is None:
+            cell[row["layout"]].append(row)
+    lines = ["Prompt layout comparison (median over successful calls):"]
+    for (model, strategy), by_layout in cells.items():
+        parts = []
+        for layout in LAYOUTS:
+            calls = by_layout[layout]
+            ttfts = [row["ttft"] for row in calls if row["ttft"] is not None]
+            ttft = f"ttft {median(ttfts):.2f}s, " if ttfts else ""
+            latency = f"latency {median(row['latency'] for row in calls):.2f}s" if calls else "no successful calls"
+            parts.append(f"{layout} {ttft}{latency} ({len(calls)} calls)")
+        lines.append(f"  {model} / {strategy}: " + "; ".join(parts))
+    return "\n".join(lines) if cells else "Prompt layout comparison: no calls."
+
+
+def write_layout_csv(rows, path):
+    fields = ["model", "strategy", "key", "layout", "input_tokens", "ttft", "latency", "error"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
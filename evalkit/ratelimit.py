@@ -0,0 +1,224 @@
+"""
+Per-provider rate limiting for model calls.
+
+The drivers used to detect ``RATE_LIMIT_KEYWORD`` ("限流") in a response and
+then ``time.sleep(120)`` -- blocking every model in the run -- and slept a flat
+5 s after any exception.  ``RateLimiter`` keeps one token bucket and one
+cooldown per key (a model name, or a provider name shared by several models)
+so only the throttled key waits, backs off exponentially with jitter, honours
+``Retry-After`` hints, and records how much time each key lost to throttling.
+
+The core primitive is ``reserve(key)``: it books the next slot and returns how
+long the caller must wait before sending.  Synchronous drivers call
+``acquire(key)`` (which just sleeps for that long); the async engine awaits
+``asyncio.sleep`` instead so waiting never occupies an in-flight slot.
+"""
+
+import random
+import re
+import threading
+import time
+
+RATE_LIMIT_KEYWORD = "限流"  # Rate limit keyword in Chinese
+
+_RETRY_AFTER_PATTERN = re.compile(r"retry[-_ ]after\D{0,5}(\d+(?:\.\d+)?)", re.IGNORECASE)
+_RATE_LIMIT_MARKERS = ("rate limit", "ratelimit", "too many requests", "429", RATE_LIMIT_KEYWORD)
+
+
+class RateLimitError(Exception):
+    """Raised when a call is still throttled after all retries."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limited_response(content):
+    """True if a model *response* is the provider's throttling notice."""
+    return bool(content) and RATE_LIMIT_KEYWORD in content
+
+
+def is_rate_limit_error(error):
+    """True if an exception raised by the client looks like throttling."""
+    if "ratelimit" in type(error).__name__.lower():
+        return True
+    if getattr(error, "status", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _RATE_LIMIT_MARKERS)
+
+
+def retry_after_seconds(error):
+    """Extract a ``Retry-After`` hint (seconds) from an exception, if present."""
+    if isinstance(error, RateLimitError) and error.retry_after is not None:
+        return float(error.retry_after)
+    for source in (error, getattr(error, "response", None)):
+        headers = getattr(source, "headers", None)
+        if headers:
+            try:
+                value = headers.get("Retry-After") or headers.get("retry-after")
+                if value is not None:
+                    return float(value)
+            except (TypeError, ValueError):
+                pass
+    match = _RETRY_AFTER_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt, base, cap):
+    """Exponential backoff with "equal jitter": half fixed, half random."""
+    delay = min(cap, base * (2 ** max(0, attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of blocking.
+
+    ``rate`` is tokens per second (None means unlimited) and ``capacity`` the
+    burst size.  The token count may go negative; a negative balance is the
+    queue of callers that have already been promised a slot.
+    """
+
+    def __init__(self, rate=None, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class _KeyState:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.not_before = 0.0
+        self.rate_limit_failures = 0
+        self.error_failures = 0
+        self.calls = 0
+        self.rate_limit_hits = 0
+        self.errors = 0
+        self.waited = 0.0
+
+
+class RateLimiter:
+    """
+    Token buckets, cooldowns and throttle accounting keyed per provider.
+
+    ``rates`` maps a key to requests per minute; keys without an entry use
+    ``default_rpm`` (0 or None = no steady-state cap, cooldowns still apply).
+    ``providers`` optionally maps model names onto a shared provider key.
+    """
+
+    def __init__(self, default_rpm=None, rates=None, providers=None, burst=1,
+                 rate_limit_base=15.0, rate_limit_cap=300.0,
+                 error_base=1.0, error_cap=60.0):
+        self.default_rpm = default_rpm
+        self.rates = dict(rates or {})
+        self.providers = dict(providers or {})
+        self.burst = burst
+        self.rate_limit_base = rate_limit_base
+        self.rate_limit_cap = rate_limit_cap
+        self.error_base = error_base
+        self.error_cap = error_cap
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def key_for(self, model):
+        return self.providers.get(model, model)
+
+    def _state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            rpm = self.rates.get(key, self.default_rpm)
+            state = _KeyState(TokenBucket(rpm / 60.0 if rpm else None, self.burst))
+            self._states[key] = state
+        return state
+
+    def reserve(self, model):
+        """Book a call slot for ``model`` and return the seconds to wait first."""
+        key = self.key_for(model)
+        with self._lock:
+            state = self._state(key)
+            now = time.monotonic()
+            wait = max(state.bucket.reserve(now), state.not_before - now, 0.0)
+            state.calls += 1
+            state.waited += wait
+            return wait
+
+    def acquire(self, model):
+        """Blocking form of ``reserve`` for the synchronous drivers."""
+        wait = self.reserve(model)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def _cool_down(self, state, delay):
+        state.not_before = max(state.not_before, time.monotonic() + delay)
+
+    def report_rate_limit(self, model, retry_after=None):
+        """Record a throttling signal; returns the cooldown applied to the key."""
+        with self._lock:
+            state = self._state(self.key_for(model))
+            state.rate_limit_hits += 1
+            state.rate_limit_failures += 1
+            delay = backoff_delay(state.rate_limit_failures, self.rate_limit_base, self.rate_limit_cap)
+            if retry_after is not None:
+                delay = max(delay, float(retry_after))
+            self._cool_down(state, delay)
+            return delay
+
+    def report_error(self, model, error=None):
+        """
+        Record a failed call.  Throttling-shaped errors are routed to
+        ``report_rate_limit``; anything else gets a short jittered backoff.
+        """
+        if error is not None and is_rate_limit_error(error):
+            return self.report_rate_limit(model, retry_after_seconds(error))
+        with self._lock:
+            state = self._state(self.key_for(model))
+            state.errors += 1
+            state.error_failures += 1
+            delay = backoff_delay(state.error_failures, self.error_base, self.error_cap)
+            self._cool_down(state, delay)
+            return delay
+
+    def report_success(self, model):
+        with self._lock:
+            state = self._state(self.key_for(model))
+            state.rate_limit_failures = 0
+            state.error_failures = 0
+
+    def throttle_report(self):
+        """Per-key call counts, throttling hits and seconds spent waiting."""
+        with self._lock:
+            return {
+                key: {
+                    "calls": state.calls,
+                    "rate_limit_hits": state.rate_limit_hits,
+                    "errors": state.errors,
+                    "throttled_seconds": round(state.waited, 2)
+                }
+                for key, state in self._states.items()
+            }
+
+    def format_report(self):
+        report = self.throttle_report()
+        if not report:
+            return "No model calls were made."
+        lines = ["Time lost to throttling:"]
+        for key, stats in sorted(report.items()):
+            lines.append(
+                f"  {key}: {stats['throttled_seconds']:.1f}s waited over {stats['calls']} calls "
+                f"({stats['rate_limit_hits']} rate limits, {stats['errors']} errors)"
+            )
+        total = sum(stats["throttled_seconds"] for stats in report.values())
+        lines.append(f"  Total: {total:.1f}s")
+        return "\n".join(lines)
+
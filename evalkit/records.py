@@ -0,0 +1,261 @@
+"""
+Compact result storage for large sweeps.
+
+Drivers used to keep one dict per graded call -- model and strategy names,
+question text, difficulty and the response string repeated in every one --
+inside nested ``all_results[model][strategy]["details"]`` lists until the very
+end of the run.  ``ResultTable`` keeps the same information column-wise:
+repeated strings are interned to small integer ids, correctness and runtime
+live in ``array`` buffers, and response text is stored zlib-compressed.
+``ResultRecord`` is the ``__slots__`` row view handed back when iterating.
+
+Nothing about the output files changes: ``dump_json`` writes exactly what
+``json.dump`` would, but accepts callables and iterators as values so each
+driver can rebuild its own detail dicts one cell at a time while writing.
+"""
+
+import json
+import math
+import zlib
+from array import array
+
+
+class Interner:
+    """Maps repeated values (names, answers, question text) to dense ids."""
+
+    __slots__ = ("_ids", "values")
+
+    def __init__(self):
+        self._ids = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def _key(value):
+        # Type is part of the key so 1 and "1" (or True and 1) stay distinct;
+        # unhashable answers such as multi-blank lists are keyed by their JSON
+        try:
+            hash(value)
+            return type(value), value
+        except TypeError:
+            return type(value), json.dumps(value, sort_keys=True)
+
+    def intern(self, value):
+        key = self._key(value)
+        index = self._ids.get(key)
+        if index is None:
+            index = self._ids[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def id_of(self, value):
+        return self._ids.get(self._key(value))
+
+
+class ResultRecord:
+    """One graded call, as read back from a ``ResultTable``."""
+
+    __slots__ = ("model", "strategy", "question", "skill", "difficulty", "text",
+                 "expected", "answer", "correct", "runtime", "response", "error")
+
+    def __init__(self, model, strategy, question, skill, difficulty, text,
+                 expected, answer, correct, runtime, response, error):
+        self.model = model
+        self.strategy = strategy
+        self.question = question
+        self.skill = skill
+        self.difficulty = difficulty
+        self.text = text
+        self.expected = expected
+        self.answer = answer
+        self.correct = correct
+        self.runtime = runtime
+        self.response = response
+        self.error = error
+
+    def __repr__(self):
+        return (f"ResultRecord({self.model!r}, {self.strategy!r}, {self.question!r}, "
+                f"correct={self.correct}, runtime={self.runtime})")
+
+
+# Interned columns: (name, array typecode).  'H' ids cap at 65535 distinct
+# values, plenty for models/strategies/skills; questions, answers and texts
+# get 32-bit ids.
+_INTERNED = (
+    ("model", "H"), ("strategy", "H"), ("skill", "H"), ("difficulty", "H"),
+    ("question", "I"), ("text", "I"), ("expected", "I"), ("answer", "I"),
+)
+
+
+class ResultTable:
+    """
+    Column-oriented store of graded calls.
+
+    Only ``model``, ``strategy``, ``question`` and ``correct`` are required;
+    every other column is optional and costs an id (or a NaN runtime) when
+    unused.  Rows keep insertion order.
+    """
+
+    def __init__(self, compress_level=6):
+        self.compress_level = compress_level
+        self.interners = {name: Interner() for name, _ in _INTERNED}
+        self.columns = {name: array(code) for name, code in _INTERNED}
+        self.correct = array("b")
+        self.runtime = array("d")
+        self._responses = []
+        self._errors = {}
+
+    def __len__(self):
+        return len(self.correct)
+
+    def append(self, model, strategy, question, correct, runtime=None, response=None,
+               answer=None, expected=None, skill=None, difficulty=None, text=None, error=None):
+        """Add one graded call; returns its row index."""
+        values = {
+            "model": model, "strategy": strategy, "skill": skill, "difficulty": difficulty,
+            "question": question, "text": text, "expected": expected, "answer": answer,
+        }
+        for name, column in self.columns.items():
+            column.append(self.interners[name].intern(values[name]))
+        self.correct.append(1 if correct else 0)
+        self.runtime.append(math.nan if runtime is None else float(runtime))
+        self._responses.append(
+            None if response is None else zlib.compress(response.encode("utf-8"), self.compress_level)
+        )
+        row = len(self.correct) - 1
+        if error is not None:
+            self._errors[row] = error
+        return row
+
+    def value(self, name, row):
+        return self.interners[name].values[self.columns[name][row]]
+
+    def response(self, row):
+        data = self._responses[row]
+        return None if data is None else zlib.decompress(data).decode("utf-8")
+
+    def runtime_of(self, row):
+        runtime = self.runtime[row]
+        return None if math.isnan(runtime) else runtime
+
+    def error(self, row):
+        return self._errors.get(row)
+
+    def record(self, row):
+        return ResultRecord(
+            model=self.value("model", row),
+            strategy=self.value("strategy", row),
+            question=self.value("question", row),
+            skill=self.value("skill", row),
+            difficulty=self.value("difficulty", row),
+            text=self.value("text", row),
+            expected=self.value("expected", row),
+            answer=self.value("answer", row),
+            correct=bool(self.correct[row]),
+            runtime=self.runtime_of(row),
+            response=self.response(row),
+            error=self._errors.get(row)
+        )
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def rows(self, **where):
+        """Row indices whose interned columns equal the given values, in order."""
+        wanted = []
+        for name, value in where.items():
+            ident = self.interners[name].id_of(value)
+            if ident is None:
+                return []
+            wanted.append((self.columns[name], ident))
+        return [row for row in range(len(self)) if all(column[row] == ident for column, ident in wanted)]
+
+    def records(self, **where):
+        for row in self.rows(**where):
+            yield self.record(row)
+
+    def grouped_rows(self, name):
+        """``{value: [row, ...]}`` for an interned column, in first-seen order."""
+        column = self.columns[name]
+        values = self.interners[name].values
+        grouped = {}
+        for row, ident in enumerate(column):
+            grouped.setdefault(ident, []).append(row)
+        return {values[ident]: rows for ident, rows in grouped.items()}
+
+    def groups(self, name, **where):
+        """Distinct values of an interned column, in first-seen order."""
+        column = self.columns[name]
+        seen = []
+        for row in self.rows(**where) if where else range(len(self)):
+            ident = column[row]
+            if ident not in seen:
+                seen.append(ident)
+        return [self.interners[name].values[ident] for ident in seen]
+
+    def nbytes(self):
+        """Approximate payload size: arrays, compressed responses and interned strings."""
+        size = sum(column.itemsize * len(column) for column in self.columns.values())
+        size += self.correct.itemsize * len(self.correct) + self.runtime.itemsize * len(self.runtime)
+        size += sum(len(data) for data in self._responses if data is not None)
+        for interner in self.interners.values():
+            size += sum(len(v) for v in interner.values if isinstance(v, str))
+        return size
+
+
+def _encode_scalar(value, ensure_ascii):
+    return json.dumps(value, ensure_ascii=ensure_ascii)
+
+
+def _encode_key(key):
+    # Same key coercion json.dump applies
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    return json.dumps(key)
+
+
+def _write_value(f, value, indent, ensure_ascii, level):
+    while callable(value):
+        value = value()
+    if isinstance(value, dict):
+        if not value:
+            f.write("{}")
+            return
+        inner = "\n" + " " * (indent * (level + 1))
+        f.write("{")
+        first = True
+        for key, item in value.items():
+            f.write(inner if first else "," + inner)
+            first = False
+            f.write(json.dumps(_encode_key(key), ensure_ascii=ensure_ascii) + ": ")
+            _write_value(f, item, indent, ensure_ascii, level + 1)
+        f.write("\n" + " " * (indent * level) + "}")
+    elif isinstance(value, (list, tuple)) or hasattr(value, "__next__"):
+        inner = "\n" + " " * (indent * (level + 1))
+        first = True
+        for item in value:
+            f.write("[" + inner if first else "," + inner)
+            first = False
+            _write_value(f, item, indent, ensure_ascii, level + 1)
+        f.write("[]" if first else "\n" + " " * (indent * level) + "]")
+    else:
+        f.write(_encode_scalar(value, ensure_ascii))
+
+
+def dump_json(obj, f, indent=2, ensure_ascii=True):
+    """
+    ``json.dump(obj, f, indent=indent, ensure_ascii=ensure_ascii)`` for
+    structures whose values may also be zero-argument callables or
+    iterators; those are expanded only while being written, so a large
+    detail list never has to exist in memory all at once.
+    """
+    _write_value(f, obj, indent, ensure_ascii, 0)
@@ -0,0 +1,229 @@
+"""
+Priority scheduling of the engine's call slots across models and strategies.
+
+The drivers build their work items ``for model: for strategy: for question``
+and the engine hands out its ``max_in_flight`` slots in that order, so one
+slow cell (llama-3.1-405b chain-of-thought takes minutes per question in the
+logs) holds most of the slots while every model after it waits.
+``PriorityScheduler`` decides instead which waiting call gets the next free
+slot:
+
+* ``priority`` in a work item's ``meta`` goes first (higher is sooner);
+* with a ``deadline`` (seconds from the start of the run), calls expected to
+  finish after it are held back until nothing that can still make it is
+  waiting;
+* ``fair`` (the default policy) gives every model an equal share of slot time:
+  the next call goes to the cell with the smallest ``model's expected service
+  so far + expected latency``, so fast cells finish early and a slow model
+  gets its share, then takes over the idle slots once the others are done;
+* ``sjf`` just picks the shortest expected call.
+
+Expected latency per (model, strategy) starts from the runtime statistics
+history (``evalkit.estimate.LatencyHistory``) and moves towards the latencies
+observed in this run; a cell with no history gets one early call to measure
+it.  Every call's queue, start and finish times are kept so the
+completion-time distribution per model can be reported and exported:
+
+    scheduler = PriorityScheduler(LatencyHistory.load(), deadline=3600)
+    completions = run_items(client, items, max_in_flight=32, scheduler=scheduler)
+    print(scheduler.format_report())
+    scheduler.write_csv("results/schedule.csv")
+"""
+
+import asyncio
+import csv
+import itertools
+import time
+from collections import defaultdict, deque
+
+from .concurrency import _percentile
+from .estimate import DEFAULT_LATENCY
+
+POLICIES = ("fair", "sjf")
+
+
+class PriorityScheduler:
+    def __init__(self, history=None, policy="fair", deadline=None, prior_weight=5):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy!r} (expected one of {', '.join(POLICIES)})")
+        self.history = history
+        self.policy = policy
+        self.deadline = deadline
+        # Observed calls count as much as prior_weight calls of history
+        self.prior_weight = prior_weight
+        self._observed = defaultdict(lambda: [0, 0.0])
+        self._service = defaultdict(float)
+        self._dispatches = defaultdict(int)
+        self._start = None
+        self.records = []
+
+    def _now(self):
+        if self._start is None:
+            self._start = time.perf_counter()
+        return time.perf_counter() - self._start
+
+    def expected(self, model, strategy):
+        """Expected seconds per call of a (model, strategy) cell."""
+        count, total = self._observed[(model, strategy)]
+        prior, source = self.history.latency(model, strategy) if self.history is not None else (None, "default")
+        if source != "default":
+            return (prior * self.prior_weight + total) / (self.prior_weight + count)
+        if count:
+            return total / count
+        if not self._dispatches[(model, strategy)]:
+            # Nothing known about the cell: send one call early to measure it
+            return 0.0
+        observed = [cell for cell in self._observed.values() if cell[0]]
+        return (sum(total for _, total in observed) / sum(count for count, _ in observed)
+                if observed else DEFAULT_LATENCY)
+
+    def score(self, priority, model, strategy):
+        expected = self.expected(model, strategy)
+        late = self.deadline is not None and self._now() + expected > self.deadline
+        share = self._service[model] + expected if self.policy == "fair" else 0.0
+        return (-priority, late, share, expected)
+
+    def dispatched(self, model, strategy):
+        self._service[model] += self.expected(model, strategy)
+        self._dispatches[(model, strategy)] += 1
+
+    def finished(self, record):
+        if record["ok"]:
+            cell = self._observed[(record["model"], record["strategy"])]
+            cell[0] += 1
+            cell[1] += record["runtime"]
+        self.records.append(record)
+
+    def gate(self, slots):
+        """The asyncio slot gate the engine uses instead of a plain semaphore."""
+        return SlotGate(self, slots)
+
+    def summary(self):
+        """Completion-time distribution per model (seconds from the start of the run)."""
+        by_model = defaultdict(list)
+        for record in self.records:
+            if record["ok"]:
+                by_model[record["model"]].append(record)
+        summary = {}
+        for model, records in by_model.items():
+            finished = sorted(record["finished"] for record in records)
+            summary[model] = {
+                "calls": len(records),
+                "first_finish": round(finished[0], 2),
+                "median_finish": round(_percentile(finished, 50), 2),
+                "p90_finish": round(_percentile(finished, 90), 2),
+                "last_finish": round(finished[-1], 2),
+                "mean_runtime": round(sum(record["runtime"] for record in records) / len(records), 2),
+                "mean_wait": round(sum(record["started"] - record["queued"] for record in records) / len(records), 2)
+            }
+        return summary
+
+    def format_report(self):
+        summary = self.summary()
+        if not summary:
+            return "Scheduler: no calls finished."
+        lines = [f"Scheduler ({self.policy}{f', deadline {self.deadline:g}s' if self.deadline else ''}), "
+                 f"finish times per model:"]
+        for model, stats in sorted(summary.items(), key=lambda pair: pair[1]["last_finish"]):
+            lines.append(f"  {model}: {stats['calls']} calls, first {stats['first_finish']}s, "
+                         f"median {stats['median_finish']}s, p90 {stats['p90_finish']}s, "
+                         f"last {stats['last_finish']}s (mean runtime {stats['mean_runtime']}s, "
+                         f"mean wait {stats['mean_wait']}s)")
+        if self.deadline:
+            late = sum(1 for record in self.records if record["ok"] and record["finished"] > self.deadline)
+            lines.append(f"  {late} calls finished after the deadline")
+        return "\n".join(lines)
+
+    def write_csv(self, path):
+        """One row per call attempt: model, strategy, key, queue/start/finish times, runtime, ok."""
+        fields = ["model", "strategy", "key", "queued", "started", "finished", "runtime", "ok"]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for record in sorted(self.records, key=lambda record: record["finished"]):
+                writer.writerow({name: round(value, 3) if isinstance(value, float) else value
+                                 for name, value in record.items()})
+        return path
+
+
+class SlotGate:
+    """
+    ``max_in_flight`` slots handed out by the scheduler.  Waiters are grouped
+    per (priority, model, strategy) cell in arrival order; a freed slot goes
+    to the head of the cell the scheduler scores best.  Dispatch runs on the
+    next loop iteration so every call that is ready competes, not just the
+    first ones to arrive.
+    """
+
+    def __init__(self, scheduler, slots):
+        self.scheduler = scheduler
+        self.free = max(1, int(slots))
+        self._waiting = {}
+        self._sequence = itertools.count()
+        self._pending_dispatch = False
+
+    def slot(self, item):
+        return _Slot(self, item)
+
+    def _schedule(self):
+        if not self._pending_dispatch:
+            self._pending_dispatch = True
+            asyncio.get_running_loop().call_soon(self._dispatch)
+
+    def _dispatch(self):
+        self._pending_dispatch = False
+        while self.free > 0 and self._waiting:
+            cell = min(self._waiting, key=lambda cell: (self.scheduler.score(*cell), self._waiting[cell][0][0]))
+            queue = self._waiting[cell]
+            _, future = queue.popleft()
+            if not queue:
+                del self._waiting[cell]
+            if future.cancelled():
+                continue
+            self.free -= 1
+            self.scheduler.dispatched(cell[1], cell[2])
+            future.set_result(None)
+
+    async def acquire(self, item):
+        future = asyncio.get_running_loop().create_future()
+        cell = (item.meta.get("priority", 0), item.model, item.strategy)
+        self._waiting.setdefault(cell, deque()).append((next(self._sequence), future))
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.free += 1
+        self._schedule()
+
+
+class _Slot:
+    def __init__(self, gate, item):
+        self.gate = gate
+        self.item = item
+
+    async def __aenter__(self):
+        scheduler = self.gate.scheduler
+        self.queued = scheduler._now()
+        await self.gate.acquire(self.item)
+        self.started = scheduler._now()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        scheduler = self.gate.scheduler
+        finished = scheduler._now()
+        scheduler.finished({
+            "model": self.item.model,
+            "strategy": self.item.strategy,
+            "key": self.item.key,
+            "queued": self.queued,
+            "started": self.started,
+            "finished": finished,
+            "runtime": finished - self.started,
+            "ok": exc_type is None
+        })
+        self.gate.release()
+        return False
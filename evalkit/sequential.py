@@ -0,0 +1,186 @@
+"""
+Early stopping for accuracy cells: send a cell's questions in rounds and stop
+once its accuracy is pinned down.
+
+``--questions_per_type`` of 20-50 runs every (model, strategy, skill) cell to
+the end, even when the first ten answers already say a model gets a skill
+right 95% of the time.  ``StoppingRule`` looks at a cell's answers in order
+and stops it when either
+
+* ``ci``: the Wilson interval at ``confidence`` is at most ``ci_width`` wide, or
+* ``sprt``: Wald's sequential probability ratio test decides between accuracy
+  ``threshold + delta`` and ``threshold - delta`` with error rates
+  ``1 - confidence`` either way (the usual choice when the question is "does
+  this cell clear the bar", and the one that saves the most calls),
+
+never before ``min_questions`` answers.  Errored calls are not answers and do
+not count.  ``run_sequential`` drives a sweep in rounds: every open cell sends
+its next ``batch`` questions, the answers are graded, and cells whose rule has
+fired send nothing more.  The questions should be in random order (the drivers
+shuffle their sample), so any prefix is itself a random sample.
+
+    rule = StoppingRule("ci", ci_width=0.25)
+    completions = run_sequential(items, run_batch, rule, cell_of, outcome, batch=5)
+    decisions = sequential_decisions(completions, rule, planned, cell_of, outcome)
+
+Each decision records where and why the cell stopped, the accuracy and
+interval over every answer received, and the calls it saved.
+"""
+
+import math
+from collections import OrderedDict
+from statistics import NormalDist
+
+METHODS = ("ci", "sprt")
+
+
+def wilson_interval(correct, total, confidence=0.95):
+    """Wilson score interval for ``correct`` out of ``total``; (0, 1) for no answers."""
+    if not total:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = correct / total
+    denominator = 1 + z * z / total
+    centre = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class StoppingRule:
+    def __init__(self, method="ci", ci_width=0.25, confidence=0.95, min_questions=5, threshold=0.5, delta=0.1):
+        if method not in METHODS:
+            raise ValueError(f"Unknown stopping rule {method!r} (expected one of {', '.join(METHODS)})")
+        self.method = method
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.min_questions = min_questions
+        self.threshold = threshold
+        self.delta = delta
+
+    def settings(self):
+        """Constructor arguments, for run headers."""
+        return {
+            "method": self.method,
+            "ci_width": self.ci_width,
+            "confidence": self.confidence,
+            "min_questions": self.min_questions,
+            "threshold": self.threshold,
+            "delta": self.delta
+        }
+
+    def _sprt(self, correct, total):
+        low = min(max(self.threshold - self.delta, 1e-6), 1 - 1e-6)
+        high = min(max(self.threshold + self.delta, 1e-6), 1 - 1e-6)
+        error = 1 - self.confidence
+        llr = correct * math.log(high / low) + (total - correct) * math.log((1 - high) / (1 - low))
+        if llr >= math.log((1 - error) / error):
+            return f"sprt: accuracy above {self.threshold:g}"
+        if llr <= math.log(error / (1 - error)):
+            return f"sprt: accuracy below {self.threshold:g}"
+        return None
+
+    def check(self, correct, total):
+        """Why the cell can stop after ``correct``/``total``, or None to keep going."""
+        if total < self.min_questions:
+            return None
+        if self.method == "sprt":
+            return self._sprt(correct, total)
+        low, high = wilson_interval(correct, total, self.confidence)
+        if high - low <= self.ci_width:
+            return f"ci width {high - low:.3f} <= {self.ci_width:g}"
+        return None
+
+    def first_stop(self, outcomes):
+        """``(answers, reason)`` at the first answer where the rule fires, or None."""
+        correct = total = 0
+        for outcome in outcomes:
+            if outcome is None:
+                continue
+            total += 1
+            correct += bool(outcome)
+            reason = self.check(correct, total)
+            if reason:
+                return total, reason
+        return None
+
+    def decision(self, outcomes, planned):
+        """Stopping record for one cell's outcomes (True/False, None for errors) in question order."""
+        answers = [bool(outcome) for outcome in outcomes if outcome is not None]
+        low, high = wilson_interval(sum(answers), len(answers), self.confidence)
+        stop = self.first_stop(outcomes)
+        return {
+            "method": self.method,
+            "stopped": stop is not None,
+            "reason": stop[1] if stop else "all questions used",
+            "stopped_after": stop[0] if stop else len(answers),
+            "calls": len(outcomes),
+            "planned": planned,
+            "calls_saved": max(0, planned - len(outcomes)),
+            "accuracy": sum(answers) / len(answers) if answers else 0.0,
+            "ci_low": round(low, 4),
+            "ci_high": round(high, 4),
+            "confidence": self.confidence
+        }
+
+
+def _group(items, cell_of):
+    cells = OrderedDict()
+    for item in items:
+        cells.setdefault(cell_of(item), []).append(item)
+    return cells
+
+
+def run_sequential(items, run_batch, rule, cell_of, outcome, batch=5):
+    """
+    Run ``items`` in rounds of up to ``batch`` questions per open cell.
+
+    ``run_batch(items)`` runs a list of work items and returns their
+    completions (it may leave out items it cannot run, as rescoring does for
+    calls that were never made).  ``outcome(completion)`` grades one:
+    True/False, or None for an error.  Returns the completions of every item
+    that was run, in the order of ``items``.
+    """
+    cells = _group(items, cell_of)
+    sent = {key: 0 for key in cells}
+    outcomes = {key: [] for key in cells}
+    finished = {}
+    open_cells = [key for key in cells if cells[key]]
+    while open_cells:
+        round_items = []
+        for key in open_cells:
+            round_items.extend(cells[key][sent[key]:sent[key] + max(1, batch)])
+            sent[key] = min(len(cells[key]), sent[key] + max(1, batch))
+        for completion in run_batch(round_items):
+            finished[id(completion.item)] = completion
+        for key in open_cells:
+            outcomes[key] = [outcome(finished[id(item)]) for item in cells[key][:sent[key]]
+                             if id(item) in finished]
+        open_cells = [key for key in open_cells
+                      if sent[key] < len(cells[key]) and rule.first_stop(outcomes[key]) is None]
+    return [finished[id(item)] for item in items if id(item) in finished]
+
+
+def sequential_decisions(completions, rule, planned, cell_of, outcome):
+    """``{cell: decision}`` for the completions of a sequential run; ``planned`` maps cell -> questions."""
+    outcomes = OrderedDict((key, []) for key in planned)
+    for completion in completions:
+        outcomes.setdefault(cell_of(completion.item), []).append(outcome(completion))
+    return {key: rule.decision(cell_outcomes, planned.get(key, len(cell_outcomes)))
+            for key, cell_outcomes in outcomes.items()}
+
+
+def format_decisions(decisions):
+    if not decisions:
+        return "Sequential evaluation: no cells."
+    calls = sum(decision["calls"] for decision in decisions.values())
+    planned = sum(decision["planned"] for decision in decisions.values())
+    stopped = sum(1 for decision in decisions.values() if decision["calls_saved"])
+    lines = [f"Sequential evaluation: {stopped}/{len(decisions)} cells stopped early, "
+             f"{calls}/{planned} calls made ({planned - calls} saved"
+             f"{f', {planned / calls:.1f}x fewer' if calls else ''})"]
+    for key, decision in decisions.items():
+        name = " / ".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        lines.append(f"  {name}: {decision['calls']}/{decision['planned']} calls, "
+                     f"{decision['accuracy']:.1%} [{decision['ci_low']:.1%}, {decision['ci_high']:.1%}] "
+                     f"({decision['reason']})")
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+"""
+Process-pool sharding for the CPU-bound part of a sweep.
+
+Prompt building, answer extraction and JSON handling are pure Python, so one
+driver process tops out at one core however many calls the engine keeps in
+flight.  ``run_sharded`` splits a list of work items into ``shards`` groups
+by a stable hash of each item's question id, runs every group in its own
+process (each worker builds its own client, limiter and so on) and hands the
+results back in the original item order.  Every (model, strategy) cell of a
+question lands in the same shard, the split does not depend on
+``PYTHONHASHSEED``, and with the same inputs the merged output is identical to
+a serial run whatever the shard count:
+
+    def evaluate_shard(shard, items, args):
+        client = Client()
+        return [evaluate(client, item, args) for item in items]
+
+    details = run_sharded(evaluate_shard, items, args.shards, key=lambda item: item.qid, args=(args,))
+
+``worker`` and ``args`` must be picklable (module-level functions); scripts
+using it need the usual ``if __name__ == "__main__":`` guard.
+"""
+
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def stable_hash(key):
+    """A 64-bit hash of ``str(key)`` that is the same in every process and run."""
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_of(key, shards):
+    return stable_hash(key) % shards if shards > 1 else 0
+
+
+def split(items, shards, key):
+    """``[(positions, items), ...]`` per shard; items keep their relative order."""
+    groups = [([], []) for _ in range(max(1, shards))]
+    for position, item in enumerate(items):
+        positions, members = groups[shard_of(key(item), shards)]
+        positions.append(position)
+        members.append(item)
+    return groups
+
+
+def run_sharded(worker, items, shards, key, args=()):
+    """
+    Run ``worker(shard, shard_items, *args)`` once per non-empty shard, each
+    in its own process, and return the per-item results in input order.
+
+    ``worker`` must return one result per item it was given.  With
+    ``shards <= 1`` it runs in this process, exactly like a serial loop.
+    """
+    items = list(items)
+    if shards <= 1:
+        results = list(worker(0, items, *args)) if items else []
+        if len(results) != len(items):
+            raise ValueError(f"worker returned {len(results)} results for {len(items)} items")
+        return results
+
+    groups = split(items, shards, key)
+    merged = [None] * len(items)
+    # Spawned workers do not inherit the parent's threads, locks or open clients
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+        futures = [
+            (positions, executor.submit(worker, shard, members, *args))
+            for shard, (positions, members) in enumerate(groups) if members
+        ]
+        for positions, future in futures:
+            results = list(future.result())
+            if len(results) != len(positions):
+                raise ValueError(f"worker returned {len(results)} results for {len(positions)} items")
+            for position, result in zip(positions, results):
+                merged[position] = result
+    return merged
@@ -0,0 +1,265 @@
+"""
+Uncertainty for accuracy numbers: bootstrap intervals and paired tests.
+
+The summary CSVs report bare percentages over 20-50 questions per skill, where
+a few questions either way move a cell by ten points.  This module attaches a
+bootstrap confidence interval to every (model, strategy, skill) accuracy and
+compares models (or strategies) on the questions both answered: McNemar's
+exact test on the discordant pairs plus a paired bootstrap interval for the
+accuracy difference.
+
+Resampling a 0/1 vector with replacement and taking the mean is the same as
+drawing Binomial(n, p_hat) / n, and resampling aligned pairs is a
+Multinomial(n, [p11, p10, p01, p00]) draw, so every replicate of every cell is
+generated in a couple of NumPy calls instead of looping over cells and
+replicates; cells with identical counts share their replicates.
+
+    outcomes = Outcomes.from_result_files(glob.glob("SAT/results/*_results_*.json"))
+    outcomes.intervals(by=("model", "strategy", "skill"))
+    outcomes.compare("model", within=("strategy",))
+
+    python -m evalkit significance SAT/results/reading_comp_results_*.json --compare model --within strategy
+"""
+
+import csv
+import json
+from itertools import combinations
+
+import numpy as np
+
+DEFAULT_REPLICATES = 2000
+_FIELDS = ("model", "strategy", "skill", "difficulty")
+_QUESTION_KEYS = ("question_number", "number", "question_id", "id")
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def _percentile_bounds(replicates, confidence):
+    tail = (1.0 - confidence) / 2.0 * 100.0
+    return np.percentile(replicates, [tail, 100.0 - tail], axis=-1)
+
+
+def bootstrap_accuracy(correct, total, replicates=DEFAULT_REPLICATES, confidence=0.95, seed=0):
+    """
+    Percentile bootstrap intervals for many accuracies at once.
+
+    ``correct`` and ``total`` are per-cell counts; returns
+    ``(accuracy, low, high)`` arrays.  Empty cells come back as NaN.  The
+    interval only depends on ``(correct, total)``, so cells sharing those
+    counts share one set of replicates.
+    """
+    correct = np.asarray(correct, dtype=np.int64)
+    total = np.asarray(total, dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        accuracy = correct / total
+    if total.size == 0:
+        return accuracy, accuracy.copy(), accuracy.copy()
+    distinct, inverse = np.unique(np.stack([correct, total], axis=1), axis=0, return_inverse=True)
+    k, n = distinct[:, 0], np.maximum(distinct[:, 1], 1)
+    draws = _rng(seed).binomial(n[:, None], (k / n)[:, None], size=(len(n), replicates))
+    low, high = _percentile_bounds(draws / n[:, None], confidence)
+    inverse = inverse.reshape(-1)
+    empty = total == 0
+    return accuracy, np.where(empty, np.nan, low[inverse]), np.where(empty, np.nan, high[inverse])
+
+
+def paired_bootstrap(both, only_a, only_b, neither, replicates=DEFAULT_REPLICATES, confidence=0.95, seed=0):
+    """
+    Bootstrap intervals for ``accuracy(a) - accuracy(b)`` over aligned
+    questions, for many pairs at once; returns ``(difference, low, high)``.
+
+    Only the discordant counts move the difference, so each replicate draws
+    them as Binomial(n, p10) and then Binomial(n - x10, p01 / (1 - p10)),
+    which is the marginal of the full multinomial resample.
+    """
+    counts = np.stack([np.asarray(c, dtype=np.int64) for c in (both, only_a, only_b, neither)], axis=1)
+    total = counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difference = (counts[:, 1] - counts[:, 2]) / total
+    if total.size == 0:
+        return difference, difference.copy(), difference.copy()
+    distinct, inverse = np.unique(np.stack([counts[:, 1], counts[:, 2], total], axis=1), axis=0,
+                                  return_inverse=True)
+    b, c, n = distinct[:, 0], distinct[:, 1], np.maximum(distinct[:, 2], 1)
+    rng = _rng(seed)
+    shape = (len(n), replicates)
+    x10 = rng.binomial(n[:, None], (b / n)[:, None], size=shape)
+    rest = np.maximum(n - b, 1)
+    x01 = rng.binomial(n[:, None] - x10, np.minimum(c / rest, 1.0)[:, None], size=shape)
+    low, high = _percentile_bounds((x10 - x01) / n[:, None], confidence)
+    inverse = inverse.reshape(-1)
+    empty = total == 0
+    return difference, np.where(empty, np.nan, low[inverse]), np.where(empty, np.nan, high[inverse])
+
+
+def mcnemar_exact(only_a, only_b):
+    """
+    Two-sided exact McNemar p-values from the discordant counts (questions
+    only ``a`` got right, only ``b`` got right), vectorized over pairs.
+    """
+    b = np.asarray(only_a, dtype=np.int64)
+    c = np.asarray(only_b, dtype=np.int64)
+    m = b + c
+    k = np.minimum(b, c)
+    top = int(m.max()) if m.size else 0
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, top + 1)))])
+    # P(X <= k) for X ~ Binomial(m, 1/2), summed over a (pairs x k) grid
+    j = np.arange(int(k.max()) + 1 if k.size else 1)
+    log_pmf = (log_factorial[m][:, None] - log_factorial[np.minimum(j[None, :], m[:, None])]
+               - log_factorial[np.maximum(m[:, None] - j[None, :], 0)] - m[:, None] * np.log(2.0))
+    tail = np.where(j[None, :] <= k[:, None], np.exp(log_pmf), 0.0).sum(axis=1)
+    return np.where(m > 0, np.minimum(1.0, 2.0 * tail), 1.0)
+
+
+def _question_key(detail, position):
+    for key in _QUESTION_KEYS:
+        value = detail.get(key)
+        if value not in (None, "", "N/A"):
+            return str(value)
+    text = detail.get("question_text") or detail.get("question")
+    return text if text else f"#{position}"
+
+
+def _is_correct(detail):
+    if "is_correct" in detail:
+        return bool(detail["is_correct"])
+    if "correct" in detail:
+        return bool(detail["correct"])
+    expected = detail.get("correct_answer", detail.get("expected"))
+    return expected is not None and expected == detail.get("model_answer")
+
+
+class Outcomes:
+    """
+    Per-question correctness keyed by (model, strategy, skill, difficulty).
+
+    A question answered more than once in the same cell (several runs over
+    the same sample) keeps each answer, paired by occurrence.
+    """
+
+    def __init__(self):
+        self.cells = {}
+
+    def add(self, model, strategy, question, correct, skill=None, difficulty=None):
+        answers = self.cells.setdefault((model, strategy, skill, difficulty), {})
+        occurrence = 0
+        while (question, occurrence) in answers:
+            occurrence += 1
+        answers[(question, occurrence)] = bool(correct)
+
+    @classmethod
+    def from_result_files(cls, paths):
+        """Read ``{model: {strategy: {"details": [...]}}}`` result files."""
+        outcomes = cls()
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                continue
+            for model, strategies in data.items():
+                if not isinstance(strategies, dict):
+                    continue
+                for strategy, block in strategies.items():
+                    details = block.get("details") if isinstance(block, dict) else None
+                    if not isinstance(details, list):
+                        continue
+                    for position, detail in enumerate(details):
+                        if isinstance(detail, dict):
+                            outcomes.add(model, strategy, _question_key(detail, position), _is_correct(detail),
+                                         detail.get("skill"), detail.get("difficulty"))
+        return outcomes
+
+    @classmethod
+    def from_table(cls, table):
+        """Read an ``evalkit.records.ResultTable``."""
+        outcomes = cls()
+        for row in range(len(table)):
+            outcomes.add(table.value("model", row), table.value("strategy", row), str(table.value("question", row)),
+                         table.correct[row], table.value("skill", row), table.value("difficulty", row))
+        return outcomes
+
+    def _grouped(self, by):
+        """
+        ``{group key: {(other fields, question): correct}}`` with cells merged
+        over the other fields; keeping those fields in the answer key stops
+        question numbers that repeat across skills or difficulties colliding.
+        """
+        index = [_FIELDS.index(name) for name in by]
+        rest = [i for i in range(len(_FIELDS)) if i not in index]
+        groups = {}
+        for cell, answers in self.cells.items():
+            key = tuple(cell[i] for i in index)
+            merged = groups.setdefault(key, {})
+            other = tuple(cell[i] for i in rest)
+            for question, correct in answers.items():
+                merged[(other, question)] = correct
+        return groups
+
+    def intervals(self, by=("model", "strategy", "skill"), replicates=DEFAULT_REPLICATES,
+                  confidence=0.95, seed=0):
+        """One dict per group: accuracy with its bootstrap interval."""
+        groups = self._grouped(by)
+        keys = list(groups)
+        correct = [sum(answers.values()) for answers in groups.values()]
+        total = [len(answers) for answers in groups.values()]
+        accuracy, low, high = bootstrap_accuracy(correct, total, replicates, confidence, seed)
+        return [
+            dict(zip(by, key), correct=correct[i], total=total[i], accuracy=float(accuracy[i]),
+                 low=float(low[i]), high=float(high[i]))
+            for i, key in enumerate(keys)
+        ]
+
+    def compare(self, field="model", within=("strategy",), replicates=DEFAULT_REPLICATES,
+                confidence=0.95, seed=0):
+        """
+        Every pair of ``field`` values (models, or strategies) within each
+        ``within`` group, on the questions both answered: the 2x2 counts,
+        accuracy difference with a paired bootstrap interval, and McNemar's
+        exact p-value.
+        """
+        groups = self._grouped(tuple(within) + (field,))
+        by_context = {}
+        for key, answers in groups.items():
+            by_context.setdefault(key[:-1], {})[key[-1]] = answers
+        pairs, counts = [], []
+        for context, members in by_context.items():
+            for a, b in combinations(members, 2):
+                shared = members[a].keys() & members[b].keys()
+                table = [0, 0, 0, 0]
+                for question in shared:
+                    table[(not members[a][question]) * 2 + (not members[b][question])] += 1
+                pairs.append((context, a, b))
+                counts.append(table)
+        if not pairs:
+            return []
+        counts = np.array(counts, dtype=np.int64)
+        both, only_a, only_b, neither = counts.T
+        difference, low, high = paired_bootstrap(both, only_a, only_b, neither, replicates, confidence, seed)
+        p_values = mcnemar_exact(only_a, only_b)
+        n = counts.sum(axis=1)
+        rows = []
+        for i, (context, a, b) in enumerate(pairs):
+            row = dict(zip(within, context))
+            row.update({
+                "a": a, "b": b, "shared": int(n[i]),
+                "accuracy_a": float((both[i] + only_a[i]) / n[i]) if n[i] else float("nan"),
+                "accuracy_b": float((both[i] + only_b[i]) / n[i]) if n[i] else float("nan"),
+                "only_a": int(only_a[i]), "only_b": int(only_b[i]),
+                "difference": float(difference[i]), "low": float(low[i]), "high": float(high[i]),
+                "p_value": float(p_values[i])
+            })
+            rows.append(row)
+        return rows
+
+
+def write_rows(rows, path):
+    """Write the dicts from ``intervals``/``compare`` as a CSV."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if not rows:
+            return
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()})
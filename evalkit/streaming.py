@@ -0,0 +1,182 @@
+"""
+Streamed calls that stop once the answer can be read.
+
+Chain-of-thought replies often keep explaining after their ``Final Answer``
+line, and the engine waits for the whole completion before grading, so the
+explanation is billed to ``runtime``.  ``StreamingClient``
+wraps the synchronous g4f ``Client``, asks for a stream and feeds the chunks
+to the driver's ``AnswerWatcher``.  With ``stop_at_answer`` the stream is
+closed as soon as the watcher is sure of the answer and the response is cut
+right after it:
+
+    client = CachedClient(StreamingClient(Client(), watcher=answer_watcher), cache)
+    params = {"timeout": 120, "temperature": 0.3, "stop_at_answer": True}
+
+A cut must not change the grade, so the watcher only stops at a whole
+``Final Answer: X`` line (the letter followed by a non-word character) and
+only if the driver's own ``extract_answer`` already gives ``X`` on the text
+received so far.  The drivers' extractors return the first match of their
+final-answer pattern before trying any fallback, and the line pattern is
+that pattern anchored to a line start, so once the check passes the rest of
+the response cannot change what ``extract_answer`` returns.  A reply with no
+such line, or whose extractor settled on another answer earlier (like
+``the final answer explains ...``), is read to the end and graded as before.
+That includes every reply to a letter-only prompt, whose output is bounded
+with ``max_tokens`` and a stop sequence instead (see ``budgets``).
+
+Every completion carries ``stream_timing``: time to first token, time until
+the answer could be read (None if it never could), total latency and whether
+the stream was cut.  The engine keeps it on ``Completion.timing`` and the
+journal.  ``stop_at_answer`` is a request parameter rather than a client
+option so that cut responses get their own cache entries.  A client that
+ignores ``stream`` and returns a whole completion is passed through.
+"""
+
+import re
+import threading
+import time
+from statistics import median
+from types import SimpleNamespace
+
+from .prompts import _chunk_text
+
+# The final-answer pattern of the TOEFL reading and GMAT Quant extract_answer, as a whole line
+FINAL_ANSWER_LINE = re.compile(r"^[ \t*_#>]*final\s*answer\s*[:：]?\s*([A-Ea-e])(?=\W)",
+                               flags=re.IGNORECASE | re.MULTILINE)
+
+
+class AnswerWatcher:
+    """
+    Incremental ``extract(response)``: ``feed`` each chunk and read
+    ``answer`` once the text received so far fixes it; ``end`` is where the
+    response can be cut without changing what ``extract`` returns.
+    ``pattern`` is ``extract``'s own final-answer pattern anchored to a line
+    start, with the letter in group 1.
+    """
+
+    def __init__(self, extract, pattern=FINAL_ANSWER_LINE):
+        self.extract = extract
+        self.pattern = pattern
+        self.text = ""
+        self.answer = None
+        self.end = None
+        self._unsure = False
+
+    def feed(self, chunk):
+        """Add a chunk; returns the answer once it is known."""
+        self.text += chunk
+        if self.answer is not None or self._unsure or not chunk:
+            return self.answer
+        match = self.pattern.search(self.text)
+        if match:
+            letter = match.group(1).upper()
+            if self.extract(self.text[:match.end()]) == letter:
+                self.answer, self.end = letter, match.end()
+            else:
+                # extract settled on something else first; only the whole response can be graded
+                self._unsure = True
+        return self.answer
+
+
+class _StreamingCompletions:
+    def __init__(self, completions, owner):
+        self._completions = completions
+        self._owner = owner
+
+    def create(self, model, messages, stop_at_answer=False, **params):
+        params.pop("stream", None)
+        start_time = time.perf_counter()
+        stream = self._completions.create(model=model, messages=messages, stream=True, **params)
+        if hasattr(stream, "choices"):
+            return stream
+        watcher = self._owner.watcher()
+        ttft = answered = None
+        cut_off = False
+        try:
+            for chunk in stream:
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start_time
+                known = watcher.answer is not None
+                if watcher.feed(text) is not None and not known:
+                    answered = time.perf_counter() - start_time
+                    if stop_at_answer:
+                        cut_off = True
+                        break
+        finally:
+            if cut_off and hasattr(stream, "close"):
+                # Drops the connection instead of reading the rest of the completion
+                stream.close()
+        latency = time.perf_counter() - start_time
+        content = watcher.text[:watcher.end] if cut_off else watcher.text
+        timing = {
+            "ttft": None if ttft is None else round(ttft, 2),
+            "time_to_answer": None if answered is None else round(answered, 2),
+            "latency": round(latency, 2),
+            "cut_off": cut_off
+        }
+        self._owner.record(timing)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            stream_timing=timing
+        )
+
+
+class StreamingClient:
+    """
+    Wrapper around a synchronous g4f client that streams every call and
+    records its timings; see the module docstring.  ``watcher`` builds a
+    fresh ``AnswerWatcher`` for the driver's ``extract_answer`` per call.
+    """
+
+    def __init__(self, client, watcher):
+        self.client = client
+        self.watcher = watcher
+        self.timings = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_StreamingCompletions(client.chat.completions, self))
+
+    def record(self, timing):
+        with self._lock:
+            self.timings.append(timing)
+
+    def summary(self):
+        with self._lock:
+            timings = list(self.timings)
+
+        def middle(key, rows=timings):
+            values = [row[key] for row in rows if row[key] is not None]
+            return round(median(values), 2) if values else None
+
+        cut = [row for row in timings if row["cut_off"]]
+        return {
+            "calls": len(timings),
+            "cut_off": len(cut),
+            "answered": sum(row["time_to_answer"] is not None for row in timings),
+            "median_ttft": middle("ttft"),
+            "median_time_to_answer": middle("time_to_answer"),
+            "median_latency": middle("latency"),
+            "median_latency_full": middle("latency", [row for row in timings if not row["cut_off"]])
+        }
+
+    def format_report(self):
+        stats = self.summary()
+        if not stats["calls"]:
+            return "Streaming: no calls were streamed."
+
+        def seconds(value):
+            return "n/a" if value is None else f"{value:.2f}s"
+
+        return (f"Streaming: {stats['calls']} calls, {stats['cut_off']} closed at the answer, "
+                f"{stats['answered']} with a readable answer; median time to first token "
+                f"{seconds(stats['median_ttft'])}, to answer {seconds(stats['median_time_to_answer'])}, "
+                f"total {seconds(stats['median_latency'])} "
+                f"({seconds(stats['median_latency_full'])} for streams read to the end)")
+
+
+def timing_fields(completion):
+    """Time to first token, time to answer and cut-off of a streamed completion, for result details."""
+    timing = completion.timing or {}
+    return {key: timing[key] for key in ("ttft", "time_to_answer", "cut_off") if key in timing}
@@ -0,0 +1,446 @@
+"""
+SQLite work queue for running one sweep on several machines.
+
+Sweeps used to be split by hand and coordinated by copying ``results/``
+folders between boxes.  ``WorkQueue`` keeps one task per (dataset, model,
+strategy, question) call in a SQLite file that every node can open -- on a
+shared mount, or on local disk when all workers run on one box.  A driver
+started with ``--queue`` submits its work items and waits; any number of
+``python -m evalkit queue work`` processes on any node lease tasks, make the
+calls and push the responses back, and the driver grades them as usual.
+
+Leases expire: a worker renews the leases it holds with heartbeats, and a
+task whose worker died is handed to someone else after ``lease_seconds``.
+Each task is tried at most ``max_attempts`` times before it is marked
+failed.  A worker that lost its lease cannot overwrite the result of the
+worker that took over.  Who ran what, where and how fast is kept in the same
+file, so per-node throughput can be queried at any time:
+
+    python SAT/Craft_and_Structure/C_S_GPT-4o.py --queue /shared/sweep.sqlite   # submit and wait
+    python -m evalkit queue work /shared/sweep.sqlite --node box-2 --threads 8  # on every node
+    python -m evalkit queue status /shared/sweep.sqlite
+
+The file uses SQLite's rollback journal rather than WAL, because WAL needs
+shared memory that network filesystems do not provide.  Lease times use the
+nodes' wall clocks, so they should be NTP-synced.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from .engine import Completion, WorkItem, call_model
+from .ratelimit import is_rate_limited_response
+
+DEFAULT_QUEUE_PATH = os.environ.get(
+    "EVALKIT_QUEUE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "work_queue.sqlite")
+)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    question TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    payload_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    node TEXT,
+    lease_expires REAL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    response TEXT,
+    runtime REAL,
+    error TEXT,
+    UNIQUE (dataset, model, strategy, question)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE INDEX IF NOT EXISTS tasks_dataset ON tasks (dataset, status);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    node TEXT NOT NULL,
+    pid INTEGER,
+    started REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+def _payload(item):
+    payload = json.dumps({"messages": item.messages, "params": item.params},
+                         sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return payload, hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Task:
+    """A leased call; ``item`` carries the model, messages and parameters."""
+    id: int
+    dataset: str
+    item: WorkItem
+    attempts: int
+    max_attempts: int
+
+
+class WorkQueue:
+    """
+    Tasks, leases and results in one SQLite file; see the module docstring.
+
+    Safe to share between threads; every process (driver or worker) opens its
+    own ``WorkQueue`` on the same path.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, timeout=60.0):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=DELETE")
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self, body, *args):
+        # BEGIN IMMEDIATE takes the write lock up front, so two nodes never lease the same row
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = body(*args)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    # -- driver side -----------------------------------------------------------
+
+    def submit(self, dataset, items, max_attempts=3):
+        """
+        Queue one task per item; returns how many need running.  Tasks that
+        already exist keep their result unless the item's messages or
+        parameters changed, in which case they are reset.
+        """
+        now = time.time()
+        rows = []
+        for item in items:
+            payload, digest = _payload(item)
+            rows.append((dataset, item.model, item.strategy, str(item.key), payload, digest, PENDING,
+                         max(1, max_attempts), now))
+
+        def insert():
+            self._db.executemany(
+                "INSERT INTO tasks (dataset, model, strategy, question, payload, payload_hash, status, "
+                "max_attempts, submitted) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (dataset, model, strategy, question) DO UPDATE SET "
+                "payload = excluded.payload, payload_hash = excluded.payload_hash, status = excluded.status, "
+                "attempts = 0, max_attempts = excluded.max_attempts, worker = NULL, node = NULL, "
+                "lease_expires = NULL, submitted = excluded.submitted, started = NULL, finished = NULL, "
+                "response = NULL, runtime = NULL, error = NULL "
+                "WHERE tasks.payload_hash != excluded.payload_hash OR tasks.status = 'failed'",
+                rows
+            )
+            return self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE dataset = ? AND status IN (?, ?)", (dataset, PENDING, LEASED)
+            ).fetchone()[0]
+
+        return self._transaction(insert)
+
+    def finished(self, dataset):
+        """``{(model, strategy, question): (response, runtime, error)}`` for done or failed tasks."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT model, strategy, question, status, response, runtime, error FROM tasks "
+                "WHERE dataset = ? AND status IN (?, ?)", (dataset, DONE, FAILED)
+            ).fetchall()
+        return {
+            (model, strategy, question): (response, runtime, error if status == FAILED else None)
+            for model, strategy, question, status, response, runtime, error in rows
+        }
+
+    def collect(self, dataset, items, poll_seconds=5.0, timeout=None):
+        """
+        Yield a ``Completion`` for each item as its task finishes (failed
+        tasks come back with their last error).  Stops after ``timeout``
+        seconds without progress, leaving the rest unyielded.
+        """
+        waiting = {(item.model, item.strategy, str(item.key)): item for item in items}
+        last_progress = time.monotonic()
+        while waiting:
+            finished = self.finished(dataset)
+            ready = [key for key in waiting if key in finished]
+            for key in ready:
+                response, runtime, error = finished[key]
+                yield Completion(waiting.pop(key), None if error else response, runtime, error)
+            if ready:
+                last_progress = time.monotonic()
+            elif timeout is not None and time.monotonic() - last_progress > timeout:
+                return
+            if waiting:
+                time.sleep(poll_seconds)
+
+    # -- worker side -----------------------------------------------------------
+
+    def register(self, worker, node):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workers (worker, node, pid, started, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (worker, node, os.getpid(), now, now)
+            )
+
+    def _expire(self, now):
+        """Hand expired leases back out, or fail them once out of attempts."""
+        self._db.execute(
+            "UPDATE tasks SET status = ?, error = 'lease expired', finished = ?, worker = NULL "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+            (FAILED, now, LEASED, now)
+        )
+        self._db.execute(
+            "UPDATE tasks SET status = ?, error = 'lease expired', worker = NULL "
+            "WHERE status = ? AND lease_expires < ?",
+            (PENDING, LEASED, now)
+        )
+
+    def lease(self, worker, node, count=1, lease_seconds=300.0):
+        """Take up to ``count`` pending tasks (oldest first) for ``lease_seconds``."""
+        def take():
+            now = time.time()
+            self._expire(now)
+            rows = self._db.execute(
+                "SELECT id, dataset, model, strategy, question, payload, attempts, max_attempts FROM tasks "
+                "WHERE status = ? ORDER BY id LIMIT ?", (PENDING, count)
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, worker = ?, node = ?, "
+                "lease_expires = ?, started = ? WHERE id = ?",
+                [(LEASED, worker, node, now + lease_seconds, now, row[0]) for row in rows]
+            )
+            self._db.execute("UPDATE workers SET last_seen = ? WHERE worker = ?", (now, worker))
+            return rows
+
+        tasks = []
+        for task_id, dataset, model, strategy, question, payload, attempts, max_attempts in self._transaction(take):
+            data = json.loads(payload)
+            item = WorkItem(model, strategy, question, data["messages"], data["params"])
+            tasks.append(Task(task_id, dataset, item, attempts + 1, max_attempts))
+        return tasks
+
+    def heartbeat(self, worker, task_ids, lease_seconds=300.0):
+        """Extend the leases ``worker`` still holds; returns the ids it still owns."""
+        now = time.time()
+        task_ids = list(task_ids)
+
+        def renew():
+            self._db.execute("UPDATE workers SET last_seen = ? WHERE worker = ?", (now, worker))
+            held = set()
+            for task_id in task_ids:
+                cursor = self._db.execute(
+                    "UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = ? AND worker = ?",
+                    (now + lease_seconds, task_id, LEASED, worker)
+                )
+                if cursor.rowcount:
+                    held.add(task_id)
+            return held
+
+        return self._transaction(renew)
+
+    def complete(self, task, worker, response, runtime):
+        """Store a result; False if the lease was lost and someone else owns the task now."""
+        def finish():
+            return self._db.execute(
+                "UPDATE tasks SET status = ?, response = ?, runtime = ?, error = NULL, finished = ?, "
+                "lease_expires = NULL WHERE id = ? AND status = ? AND worker = ?",
+                (DONE, response, runtime, time.time(), task.id, LEASED, worker)
+            ).rowcount == 1
+
+        return self._transaction(finish)
+
+    def fail(self, task, worker, error):
+        """Record a failed attempt; the task goes back to pending while attempts remain."""
+        def record():
+            return self._db.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+                "error = ?, finished = ?, lease_expires = NULL, "
+                "worker = CASE WHEN attempts >= max_attempts THEN worker ELSE NULL END "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (FAILED, PENDING, error, time.time(), task.id, LEASED, worker)
+            ).rowcount == 1
+
+        return self._transaction(record)
+
+    def requeue(self, dataset=None):
+        """Give failed tasks a fresh set of attempts; returns how many."""
+        def reset():
+            where, args = "status = ?", [FAILED]
+            if dataset is not None:
+                where += " AND dataset = ?"
+                args.append(dataset)
+            return self._db.execute(
+                f"UPDATE tasks SET status = ?, attempts = 0, error = NULL, finished = NULL WHERE {where}",
+                [PENDING] + args
+            ).rowcount
+
+        return self._transaction(reset)
+
+    # -- reporting -------------------------------------------------------------
+
+    def counts(self, dataset=None):
+        """``{dataset: {status: count}}``."""
+        query = "SELECT dataset, status, COUNT(*) FROM tasks"
+        args = ()
+        if dataset is not None:
+            query += " WHERE dataset = ?"
+            args = (dataset,)
+        with self._lock:
+            rows = self._db.execute(query + " GROUP BY dataset, status", args).fetchall()
+        counts = {}
+        for name, status, count in rows:
+            counts.setdefault(name, {})[status] = count
+        return counts
+
+    def node_stats(self, since=None):
+        """
+        Per node: workers seen, tasks done and failed, mean call runtime and
+        throughput (done tasks per minute between its first lease and last
+        result).  ``since`` limits it to tasks finished after that timestamp.
+        """
+        where, args = "node IS NOT NULL AND status IN (?, ?)", [DONE, FAILED]
+        if since is not None:
+            where += " AND finished >= ?"
+            args.append(since)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT node, SUM(status = 'done'), SUM(status = 'failed'), AVG(CASE WHEN status = 'done' "
+                f"THEN runtime END), MIN(started), MAX(finished) FROM tasks WHERE {where} GROUP BY node", args
+            ).fetchall()
+            workers = dict(self._db.execute(
+                "SELECT node, COUNT(*) FROM workers GROUP BY node"
+            ).fetchall())
+            active = dict(self._db.execute(
+                "SELECT node, COUNT(*) FROM workers WHERE last_seen >= ? GROUP BY node", (time.time() - 600,)
+            ).fetchall())
+        stats = {}
+        for node, done, failed, runtime, first, last in rows:
+            span = (last - first) if first is not None and last is not None else 0.0
+            stats[node] = {
+                "workers": workers.get(node, 0),
+                "active_workers": active.get(node, 0),
+                "done": done or 0,
+                "failed": failed or 0,
+                "mean_runtime": round(runtime, 2) if runtime is not None else None,
+                "per_minute": round((done or 0) * 60.0 / span, 2) if span > 0 else None
+            }
+        return stats
+
+    def format_report(self):
+        lines = []
+        for dataset, counts in sorted(self.counts().items()):
+            parts = ", ".join(f"{counts.get(status, 0)} {status}" for status in (PENDING, LEASED, DONE, FAILED))
+            lines.append(f"{dataset}: {parts}")
+        stats = self.node_stats()
+        if stats:
+            lines.append("Per node:")
+        for node, row in sorted(stats.items()):
+            runtime = f"{row['mean_runtime']:.1f}s" if row["mean_runtime"] is not None else "n/a"
+            rate = f"{row['per_minute']:.1f}/min" if row["per_minute"] is not None else "n/a"
+            lines.append(f"  {node}: {row['done']} done, {row['failed']} failed, {rate}, mean call {runtime}, "
+                         f"{row['active_workers']}/{row['workers']} workers active")
+        return "\n".join(lines) if lines else f"No tasks in {self.path}"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def run_worker(queue, client, node=None, threads=4, lease_seconds=300.0, limiter=None,
+               idle_exit=60.0, on_complete=None):
+    """
+    Lease and run tasks with ``threads`` concurrent calls until the queue has
+    been empty for ``idle_exit`` seconds (None = keep polling forever).
+    Returns the number of tasks this worker completed.
+    """
+    node = node or socket.gethostname()
+    worker = f"{node}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    queue.register(worker, node)
+    held = set()
+    held_lock = threading.Lock()
+    stop = threading.Event()
+    completed = [0]
+
+    def beat():
+        # Renew well before expiry; a task we no longer own is simply dropped on completion
+        while not stop.wait(lease_seconds / 3.0):
+            with held_lock:
+                ids = list(held)
+            queue.heartbeat(worker, ids, lease_seconds)
+
+    def work():
+        idle_since = time.monotonic()
+        while not stop.is_set():
+            tasks = queue.lease(worker, node, 1, lease_seconds)
+            if not tasks:
+                if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                    return
+                time.sleep(min(5.0, lease_seconds / 10.0))
+                continue
+            idle_since = time.monotonic()
+            task = tasks[0]
+            with held_lock:
+                held.add(task.id)
+            try:
+                if limiter is not None:
+                    limiter.acquire(task.item.model)
+                response, runtime = call_model(client, task.item)
+                if is_rate_limited_response(response):
+                    if limiter is not None:
+                        limiter.report_rate_limit(task.item.model)
+                    queue.fail(task, worker, "rate_limited")
+                    continue
+                if limiter is not None:
+                    limiter.report_success(task.item.model)
+                if queue.complete(task, worker, response, runtime):
+                    completed[0] += 1
+                    if on_complete:
+                        on_complete(task, runtime, None)
+            except Exception as e:
+                if limiter is not None:
+                    limiter.report_error(task.item.model, e)
+                queue.fail(task, worker, str(e))
+                if on_complete:
+                    on_complete(task, None, str(e))
+            finally:
+                with held_lock:
+                    held.discard(task.id)
+
+    heart = threading.Thread(target=beat, daemon=True)
+    heart.start()
+    pool = [threading.Thread(target=work, name=f"queue-worker-{i}") for i in range(max(1, threads))]
+    for thread in pool:
+        thread.start()
+    try:
+        for thread in pool:
+            thread.join()
+    finally:
+        stop.set()
+    return completed[0]